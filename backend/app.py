@@ -1,53 +1,114 @@
 import os
-from datetime import timedelta
+from collections.abc import Mapping
 
-from flask import Flask
+import click
+from flask import Flask, make_response, request
 from flask_restful import Api
-from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
-from dotenv import load_dotenv
 
-load_dotenv()
+from config import PROFILES
+from database import LAST_WRITE_HEADER, db, expire_overdue_consents, init_migrate, jobs, last_login_writes, login_count_writes, registry_mirror, replica_binds, replica_router, shard_binds, shared_directory, upgrade_schema, Sharding
+from routes import STREAM_ENDPOINTS, admission_classes, register_resources
+from utils import AdmissionControl, FastJSONProvider, Compress
 
-from database import db
-from routes import LoginRoute, RegisterRoute, RefreshRoute
-from routes import NewConsent, GetConsents, RevokeConsent, GetConsentByID, GetFacilityConsents
-from routes import Facilities, PatientAccessLogs, AdminAccessLogs
 
-app = Flask(__name__)
+class MigrateCommands(click.Group):
+    """`flask db`, importing Flask-Migrate and Alembic only when it is run."""
 
-app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("MARIADB_URI")
-app.config["SECRET_KEY"] = os.getenv("FLASK_SECRET_KEY")
+    def __init__(self, app):
+        super().__init__("db", help="Perform database migrations.")
+        self.app = app
 
-# JWT config
-app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY")
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(minutes=15)
-app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(days=7)
+    def make_context(self, info_name, args, parent=None, **extra):
+        # hand the command line over to Flask-Migrate's own group
+        from flask_migrate import cli
+        init_migrate(self.app)
+        return cli.db.make_context(info_name, args, parent=parent, **extra)
 
-db.init_app(app)
 
-Migrate(app, db, directory="database/migrations")
-CORS(app)
+def create_app(config=None):
+    """Build the app.
 
-api = Api(app)
+    `config` is a profile name from config.PROFILES ("production" or "test"),
+    a config object or a mapping; it defaults to the APP_CONFIG environment
+    variable, then "production". `flask run` and `flask db` find this factory
+    on their own.
+    """
+    config = config or os.getenv("APP_CONFIG", "production")
+    if isinstance(config, str):
+        config = PROFILES[config]()
 
-jwt = JWTManager(app)
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    if isinstance(config, Mapping):
+        app.config.update(config)
+    else:
+        app.config.from_object(config)
 
-api.add_resource(LoginRoute, "/login")
-api.add_resource(RegisterRoute, "/register")
-api.add_resource(RefreshRoute, "/auth/token-refresh")
+    # Read replicas for endpoints marked @replica_reads, the databases
+    # patients, consents and access logs are sharded across, and where
+    # background jobs are queued when not in the main database
+    app.config["SQLALCHEMY_BINDS"] = {
+        **replica_binds(app.config.get("MARIADB_REPLICA_URIS")),
+        **shard_binds(app.config.get("SHARD_URIS")),
+        **({"jobs": app.config["JOBS_DATABASE_URI"]} if app.config.get("JOBS_DATABASE_URI") else {}),
+        **app.config.get("SQLALCHEMY_BINDS", {}),
+    }
 
-api.add_resource(NewConsent, "/api/consents")
-api.add_resource(GetConsents, "/api/consents/patient/<url_id>")
-api.add_resource(RevokeConsent, "/api/consents/<consent_id>/revoke")
-api.add_resource(GetConsentByID, "/api/consents/check")
-api.add_resource(GetFacilityConsents, "/api/consents/facility")
-api.add_resource(Facilities, "/facilities")
-api.add_resource(PatientAccessLogs, "/api/access-logs/user/<user_id>")
-api.add_resource(AdminAccessLogs, "/api/admin/access-logs")
+    db.init_app(app)
+    replica_router.init_app(app)
+    Sharding(app)
+    registry_mirror.init_app(app)
+    last_login_writes.init_app(app)
+    login_count_writes.init_app(app)
+    jobs.init_app(app)
+    shared_directory.init_app(app)
 
+    # Alembic is only needed by `flask db`; serving requests doesn't pay for it
+    app.cli.add_command(MigrateCommands(app))
 
-@app.errorhandler(404)
-def resource_not_found(error):
-    return {"error": "bad resource"}, 404
+    # the frontend reads X-Last-Write to send it back on its next requests
+    CORS(app, expose_headers=[LAST_WRITE_HEADER])
+    Compress(app)
+    AdmissionControl(app, admission_classes())
+
+    api = Api(app)
+
+    # Resources that return plain dicts go through the same provider as jsonify
+    @api.representation("application/json")
+    def output_json(data, code, headers=None):
+        response = make_response(app.json.response(data), code)
+        response.headers.extend(headers or {})
+        return response
+
+    jwt = JWTManager(app)
+
+    # Stream tickets travel in URLs, so they open event streams and nothing else
+    @jwt.token_verification_loader
+    def stream_tickets_only_open_streams(jwt_header, jwt_data):
+        return not jwt_data.get("stream") or request.endpoint in STREAM_ENDPOINTS
+
+    register_resources(api, app, eager=app.config.get("EAGER_ROUTES", False))
+
+    @app.errorhandler(404)
+    def resource_not_found(error):
+        return {"error": "bad resource"}, 404
+
+    # Run periodically (e.g. from cron) so expiries show up in the consent change feed
+    @app.cli.command("expire-consents")
+    def expire_consents():
+        """Mark active consents past their expiry date as expired."""
+        print(f"Expired {expire_overdue_consents()} consents")
+
+    # Container start: cheap when the schema and demo data are already current
+    @app.cli.command("bootstrap")
+    @click.option("--seed/--no-seed", default=True, help="Load the demo accounts if they are missing.")
+    def bootstrap(seed):
+        """Upgrade the schema and seed the demo data, skipping whatever is current."""
+        print("Upgraded the schema" if upgrade_schema() else "Schema is current")
+        if seed:
+            from seed import seed as seed_demo_data
+            print("Seeded the demo data" if seed_demo_data() else "Demo data is present")
+
+    return app
@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from sqlalchemy import Column, MetaData, Table, Text, create_engine, inspect, select
+
+from database import db
+from bulk_seed import (
+    ADMINS, PASSWORD, seed_population,
+    admin_email, patient_email, worker_email, national_id_for, worker_facility,
+)
+
+REGISTRY_DIR = Path(__file__).resolve().parent.parent.parent / "mock-registry"
+
+# Population presets; any value can be overridden from the command line.
+SCALES = {
+    "smoke": {"patients": 1_000, "workers": 50, "consents": 5_000, "access_logs": 50_000},
+    "medium": {"patients": 100_000, "workers": 1_000, "consents": 500_000, "access_logs": 5_000_000},
+    "national": {"patients": 1_000_000, "workers": 10_000, "consents": 5_000_000, "access_logs": 50_000_000},
+}
+
+
+# The sizes and seed a backend database was seeded with, kept apart from the app's own tables
+_population = Table("loadtest_population", MetaData(), Column("population", Text, nullable=False))
+
+
+def seeded_population(backend_uri):
+    engine = create_engine(backend_uri)
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(_population.name):
+            return None
+        value = conn.execute(select(_population.c.population)).scalar()
+    return json.loads(value) if value else None
+
+
+def seed_backend(backend_uri, sizes, seed=0, reset=False):
+    seed_population(backend_uri, sizes, seed=seed, reset=reset)
+    engine = create_engine(backend_uri)
+    with engine.begin() as conn:
+        _population.create(conn, checkfirst=True)
+        conn.execute(_population.delete())
+        conn.execute(_population.insert().values(population=json.dumps({"sizes": sizes, "seed": seed})))
+
+
+def seed_registry(registry_uri, sizes, seed=0):
+    # The registry owns its schema and loader, so run them in its own tree
+    env = dict(os.environ, REGISTRY_DATABASE_URI=registry_uri)
+    subprocess.run([sys.executable, "-m", "flask", "--app", "main", "db", "upgrade"],
+                   cwd=REGISTRY_DIR, env=env, check=True, capture_output=True)
+    subprocess.run([sys.executable, "bulk_seed.py", "--patients", str(sizes["patients"]), "--seed", str(seed)],
+                   cwd=REGISTRY_DIR, env=env, check=True)
+
+
+def sample_consents(backend_uri, facility, limit=50):
+    engine = create_engine(backend_uri)
+    consents = db.metadata.tables["consent_records"]
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(consents.c.patient_id).where(consents.c.facility_id == facility).limit(limit)
+        ).all()
+    return [row.patient_id for row in rows]
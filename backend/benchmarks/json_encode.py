@@ -0,0 +1,85 @@
+"""Encode-time benchmark for AdminAccessLogs-sized payloads.
+
+Builds the same structure AdminAccessLogs returns (AccessLog.to_dict() with
+patient and worker nested) and times response encoding with Flask's default
+provider, FastJSONProvider's stdlib fallback and FastJSONProvider on orjson.
+
+    python -m benchmarks.json_encode --rows 1000 10000 100000
+"""
+import argparse
+import json
+import time
+from datetime import date, datetime, timedelta
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from database import AccessLog, EventAction, HealthCareFacility, HealthCareWorker, Patient, User, UserRole
+from utils import json_provider
+from utils.json_provider import FastJSONProvider
+
+
+def build_payload(rows):
+    facility = HealthCareFacility(facility_id="FAC-001", name="HealthHub Clinic", location="Nairobi")
+    workers = [
+        HealthCareWorker(worker_id=i, license_number=f"W-{i}", job_title="Physician",
+                         healthcare_facility=facility,
+                         user=User(user_id=100 + i, email=f"w{i}@test.com", role=UserRole.HEALTHCARE_WORKER))
+        for i in range(20)
+    ]
+    patients = [
+        Patient(patient_id=f"PAT-{i:06d}", first_name="Sarah", last_name="Ochieng",
+                date_of_birth=date(1992, 7, 25), national_id_encrypted="gAAAA" + "x" * 95,
+                user=User(user_id=1000 + i, email=f"p{i}@test.com", role=UserRole.PATIENT))
+        for i in range(200)
+    ]
+    now = datetime.now()
+    logs = [
+        AccessLog(log_id=i, action=EventAction.VIEW, result="ALLOWED", reason="Consent Check",
+                  timestamp=now - timedelta(minutes=i), ip_address="192.168.1.1",
+                  patient=patients[i % len(patients)], healthcare_worker=workers[i % len(workers)])
+        for i in range(rows)
+    ]
+    started = time.perf_counter()
+    data = [log.to_dict() for log in logs]
+    return {"success": True, "data": data}, time.perf_counter() - started
+
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, body
+
+
+def run(rows, repeat):
+    payload, to_dict_s = build_payload(rows)
+    app = Flask(__name__)
+    default, fast = DefaultJSONProvider(app), FastJSONProvider(app)
+    orjson = json_provider.orjson
+
+    results = {"rows": rows, "to_dict_ms": round(to_dict_s * 1000, 2), "encode_ms": {}}
+    with app.app_context():
+        encoders = {"flask_default": lambda: default.response(payload).get_data()}
+        json_provider.orjson = None
+        seconds, body = _time(lambda: fast.response(payload).get_data(), repeat)
+        results["encode_ms"]["fast_stdlib"] = round(seconds * 1000, 2)
+        json_provider.orjson = orjson
+        if orjson is not None:
+            encoders["fast_orjson"] = lambda: fast.response(payload).get_data()
+        for name, fn in encoders.items():
+            seconds, body = _time(fn, repeat)
+            results["encode_ms"][name] = round(seconds * 1000, 2)
+    results["bytes"] = len(body)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time JSON encoding of access-log payloads.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5, help="best of N runs per encoder")
+    args = parser.parse_args()
+    for rows in args.rows:
+        print(json.dumps(run(rows, args.repeat)))
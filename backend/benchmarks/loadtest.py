@@ -0,0 +1,370 @@
+"""Load-test harness for the backend and the mock registry.
+
+Boots both services locally against SQLite (default) or the given database
+URIs, seeds a synthetic population and drives a weighted mix of requests.
+Per-endpoint latency percentiles and throughput are written to a JSON file
+that can be compared between commits.
+
+Run from backend/:
+
+    python -m benchmarks.loadtest --scale smoke --duration 60 --concurrency 16
+    python -m benchmarks.loadtest --baseline benchmarks/results/<previous>.json
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Services and seeding must share these; fall back to throwaway values so the
+# harness runs without a .env file.
+os.environ.setdefault("CRYPTOGRAPHY_KEY", "MsR9a6TF293SVhAzWjESVEY3W3XZvyYTNw67XWjNrjk=")
+os.environ.setdefault("JWT_SECRET_KEY", "loadtest-jwt-secret-key-loadtest-jwt-secret")
+os.environ.setdefault("FLASK_SECRET_KEY", "loadtest-flask-secret-key")
+os.environ.setdefault("REGISTRY_API_KEY", "loadtest-registry-key")
+
+import requests
+
+from benchmarks import dataset
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+REGISTRY_DIR = BACKEND_DIR.parent / "mock-registry"
+WORK_DIR = BACKEND_DIR / "benchmarks" / ".work"
+RESULTS_DIR = BACKEND_DIR / "benchmarks" / "results"
+
+DEFAULT_MIX = {
+    "login": 10,
+    "consent_check": 40,
+    "patient_consents": 15,
+    "facility_consents": 15,
+    "patient_access_logs": 15,
+    "admin_access_logs": 5,
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=2)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError(f"service at {url} did not come up within {timeout}s")
+
+
+def _flask(app_module, cwd, port, env):
+    return subprocess.Popen(
+        [sys.executable, "-m", "flask", "--app", app_module, "run",
+         "--port", str(port), "--with-threads", "--no-reload", "--no-debugger"],
+        cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+@contextmanager
+def services(backend_uri, registry_uri, registry_faults=None, seed=0):
+    registry_port, backend_port = _free_port(), _free_port()
+    registry_url = f"http://127.0.0.1:{registry_port}"
+    backend_url = f"http://127.0.0.1:{backend_port}"
+
+    registry_env = dict(os.environ, REGISTRY_DATABASE_URI=registry_uri,
+                        AUTHORIZED_API_KEY=os.environ["REGISTRY_API_KEY"])
+    if registry_faults:
+        # the registry's fault injection profiles (see mock-registry/faults.py)
+        registry_env.update(REGISTRY_FAULTS=json.dumps(registry_faults), REGISTRY_FAULTS_SEED=str(seed))
+    backend_env = dict(os.environ, MARIADB_URI=backend_uri, MOCK_REGISTRY_URL=registry_url)
+
+    processes = [_flask("main", REGISTRY_DIR, registry_port, registry_env),
+                 _flask("app", BACKEND_DIR, backend_port, backend_env)]
+    try:
+        _wait_until_up(f"{registry_url}/api/registry/patients")
+        _wait_until_up(f"{backend_url}/facilities")
+        yield backend_url
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.status_codes = defaultdict(Counter)
+        self.errors = Counter()
+
+    def record(self, name, elapsed, status):
+        with self._lock:
+            self.latencies[name].append(elapsed)
+            self.status_codes[name][str(status)] += 1
+            if status == "error" or status >= 500:
+                self.errors[name] += 1
+
+
+def _percentile(ordered, pct):
+    # nearest-rank percentile on an already sorted list
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(recorder, elapsed):
+    endpoints = {}
+    for name, samples in sorted(recorder.latencies.items()):
+        ordered = sorted(samples)
+        endpoints[name] = {
+            "requests": len(ordered),
+            "errors": recorder.errors[name],
+            "status_codes": dict(recorder.status_codes[name]),
+            "throughput_rps": round(len(ordered) / elapsed, 2),
+            "latency_ms": {
+                "p50": round(_percentile(ordered, 50) * 1000, 2),
+                "p95": round(_percentile(ordered, 95) * 1000, 2),
+                "p99": round(_percentile(ordered, 99) * 1000, 2),
+                "mean": round(sum(ordered) / len(ordered) * 1000, 2),
+                "max": round(ordered[-1] * 1000, 2),
+            },
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    return endpoints, {
+        "requests": total,
+        "errors": sum(e["errors"] for e in endpoints.values()),
+        "throughput_rps": round(total / elapsed, 2),
+    }
+
+
+class LoadTest:
+    def __init__(self, base_url, backend_uri, sizes, mix, users_per_role, timeout, seed):
+        self.base_url = base_url
+        self.backend_uri = backend_uri
+        self.sizes = sizes
+        self.mix = mix
+        self.users_per_role = users_per_role
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.recorder = Recorder()
+        self._local = threading.local()
+
+    @property
+    def http(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _login(self, email):
+        response = requests.post(f"{self.base_url}/login",
+                                 json={"email": email, "password": dataset.PASSWORD}, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()["data"]
+        return {"Authorization": f"Bearer {data['access_token']}"}, data["user"]
+
+    def prepare(self):
+        # Tokens are issued up front so only the "login" scenario pays for bcrypt
+        rng = self.rng
+        n = self.users_per_role
+        self.admins = [self._login(dataset.admin_email(i))[0]
+                       for i in range(min(n, dataset.ADMINS))]
+
+        self.patients = []
+        for i in rng.sample(range(self.sizes["patients"]), min(n, self.sizes["patients"])):
+            headers, user = self._login(dataset.patient_email(i))
+            self.patients.append((headers, user["user_id"], user["patient"]["patient_id"]))
+
+        self.workers = []
+        for i in rng.sample(range(self.sizes["workers"]), min(n, self.sizes["workers"])):
+            headers, _ = self._login(dataset.worker_email(i))
+            targets = dataset.sample_consents(self.backend_uri, dataset.worker_facility(i, self.sizes))
+            self.workers.append((headers, [dataset.national_id_for(p) for p in targets]))
+
+        self.login_emails = ([dataset.patient_email(i) for i in range(min(1000, self.sizes["patients"]))]
+                             + [dataset.worker_email(i) for i in range(min(100, self.sizes["workers"]))])
+
+    def _request(self, name, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            status = "error"
+        self.recorder.record(name, time.perf_counter() - start, status)
+
+    def login(self, rng):
+        email = rng.choice(self.login_emails)
+        self._request("login", "POST", "/login", json={"email": email, "password": dataset.PASSWORD})
+
+    def consent_check(self, rng):
+        headers, national_ids = rng.choice(self.workers)
+        if not national_ids:
+            return
+        self._request("consent_check", "GET", "/api/consents/check", headers=headers,
+                      params={"national_id": rng.choice(national_ids)})
+
+    def patient_consents(self, rng):
+        headers, _, patient_id = rng.choice(self.patients)
+        self._request("patient_consents", "GET", f"/api/consents/patient/{patient_id}", headers=headers)
+
+    def facility_consents(self, rng):
+        headers, _ = rng.choice(self.workers)
+        self._request("facility_consents", "GET", "/api/consents/facility", headers=headers)
+
+    def patient_access_logs(self, rng):
+        headers, user_id, _ = rng.choice(self.patients)
+        self._request("patient_access_logs", "GET", f"/api/access-logs/user/{user_id}", headers=headers)
+
+    def admin_access_logs(self, rng):
+        self._request("admin_access_logs", "GET", "/api/admin/access-logs", headers=rng.choice(self.admins))
+
+    def _worker(self, deadline, seed):
+        rng = random.Random(seed)
+        names = [name for name, weight in self.mix.items() if weight > 0]
+        weights = [self.mix[name] for name in names]
+        while time.monotonic() < deadline:
+            getattr(self, rng.choices(names, weights=weights)[0])(rng)
+
+    def run(self, duration, concurrency):
+        deadline = time.monotonic() + duration
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(self._worker, deadline, self.rng.random()) for _ in range(concurrency)]
+            # re-raise anything a worker died of instead of reporting a quietly short run
+            for future in futures:
+                future.result()
+        return time.perf_counter() - start
+
+
+def _git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain"], cwd=BACKEND_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def compare(result, baseline):
+    print(f"{'endpoint':<22}{'p50 ms':>16}{'p95 ms':>16}{'p99 ms':>16}{'rps':>16}")
+    for name, current in result["endpoints"].items():
+        previous = baseline["endpoints"].get(name)
+        if not previous:
+            continue
+        cells = []
+        for key in ("p50", "p95", "p99"):
+            old, new = previous["latency_ms"][key], current["latency_ms"][key]
+            cells.append(f"{new:>8} ({(new - old) / old * 100 if old else 0:+.0f}%)")
+        old, new = previous["throughput_rps"], current["throughput_rps"]
+        cells.append(f"{new:>8} ({(new - old) / old * 100 if old else 0:+.0f}%)")
+        print(f"{name:<22}" + "".join(f"{cell:>16}" for cell in cells))
+
+
+def _parse_mix(value):
+    mix = dict(DEFAULT_MIX)
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}")
+        mix[name] = float(weight)
+    return mix
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the backend and mock registry.")
+    parser.add_argument("--scale", choices=dataset.SCALES, default="smoke")
+    for key in ("patients", "workers", "consents", "access_logs"):
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, dest=key,
+                            help=f"override the number of {key.replace('_', ' ')} for the scale")
+    parser.add_argument("--backend-db", help="backend database URI (default: SQLite file in the work dir)")
+    parser.add_argument("--registry-db", help="registry database URI (default: SQLite file in the work dir)")
+    parser.add_argument("--reseed", action="store_true", help="drop and reseed even if data is present")
+    parser.add_argument("--duration", type=float, default=60, help="measurement window in seconds")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", type=_parse_mix, default=DEFAULT_MIX,
+                        help="scenario weights, e.g. consent_check=50,admin_access_logs=0")
+    parser.add_argument("--users-per-role", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--registry-faults", type=json.loads, default=None,
+                        help='registry latency/failure profiles as JSON, e.g. \'{"*": {"latency": {"dist": "longtail", '
+                             '"median_ms": 40, "p99_ms": 2000}, "error_rate": 0.02}}\'')
+    parser.add_argument("--output", type=Path, help="result file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--baseline", type=Path, help="previous result file to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = {key: getattr(args, key) or value for key, value in dataset.SCALES[args.scale].items()}
+
+    WORK_DIR.mkdir(parents=True, exist_ok=True)
+    backend_uri = args.backend_db or f"sqlite:///{WORK_DIR / f'backend-{args.scale}.db'}"
+    registry_uri = args.registry_db or f"sqlite:///{WORK_DIR / f'registry-{args.scale}.db'}"
+
+    # Reuse a seeded database only if it holds exactly the population asked for
+    seeded = dataset.seeded_population(backend_uri)
+    if args.reseed or seeded != {"sizes": sizes, "seed": args.seed}:
+        if seeded and not args.reseed:
+            print(f"{backend_uri} holds {seeded['sizes']} (seed {seeded['seed']}); reseeding")
+        print(f"Seeding {sizes} ...")
+        started = time.perf_counter()
+        dataset.seed_registry(registry_uri, sizes, seed=args.seed)
+        dataset.seed_backend(backend_uri, sizes, seed=args.seed, reset=True)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    commit, dirty = _git_revision()
+    started_at = datetime.now(timezone.utc).isoformat()
+    with services(backend_uri, registry_uri, args.registry_faults, args.seed) as base_url:
+        test = LoadTest(base_url, backend_uri, sizes, args.mix, args.users_per_role, args.timeout, args.seed)
+        test.prepare()
+        print(f"Running {args.duration:.0f}s at concurrency {args.concurrency} ...")
+        elapsed = test.run(args.duration, args.concurrency)
+
+    endpoints, total = summarize(test.recorder, elapsed)
+    result = {
+        "commit": commit,
+        "dirty": dirty,
+        "started_at": started_at,
+        "duration_s": round(elapsed, 2),
+        "concurrency": args.concurrency,
+        "database": {"backend": backend_uri.split(":", 1)[0], "registry": registry_uri.split(":", 1)[0]},
+        "dataset": sizes,
+        "mix": args.mix,
+        "registry_faults": args.registry_faults,
+        "endpoints": endpoints,
+        "total": total,
+    }
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = RESULTS_DIR / f"{stamp}-{(commit or 'unknown')[:8]}.json"
+    output.write_text(json.dumps(result, indent=2))
+    print(json.dumps(total))
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        compare(result, json.loads(args.baseline.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Cold-start benchmark for the backend.
+
+Each run starts a fresh interpreter and times importing app, create_app("test")
+and the first requests against the in-memory test profile. The first /login
+includes importing the auth routes (pydantic, bcrypt, requests), which
+create_app defers until a route is used. Results are written to a JSON file
+that can be compared between commits, like the load test's.
+
+Run from backend/:
+
+    python -m benchmarks.startup --runs 20
+    python -m benchmarks.startup --importtime 15
+    python -m benchmarks.startup --baseline benchmarks/results/<previous>.json
+"""
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = BACKEND_DIR / "benchmarks" / "results"
+
+PHASES = ("import_app", "create_app", "create_all", "first_request", "first_login")
+
+# Runs in the child interpreter and prints one JSON line of phase timings
+PROBE = """
+import json, time
+started = time.perf_counter()
+timings = {}
+
+def mark(phase):
+    global started
+    now = time.perf_counter()
+    timings[phase] = (now - started) * 1000
+    started = now
+
+from app import create_app
+mark("import_app")
+app = create_app("test")
+mark("create_app")
+from database import db
+with app.app_context():
+    db.create_all()
+mark("create_all")
+client = app.test_client()
+assert client.get("/facilities").status_code == 200
+mark("first_request")
+assert client.post("/login", json={}).status_code == 400
+mark("first_login")
+print(json.dumps(timings))
+"""
+
+
+def run_once(python):
+    started = time.perf_counter()
+    out = subprocess.run([python, "-c", PROBE], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    timings = json.loads(out.stdout.strip().splitlines()[-1])
+    timings["process"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def import_profile(python, top):
+    # -X importtime reports every module's self and cumulative import time in µs on stderr
+    out = subprocess.run([python, "-X", "importtime", "-c", "from app import create_app; create_app('test')"],
+                         cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    modules = []
+    for line in out.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)", line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            # app and the modules it imports directly, so nothing is counted twice
+            if len(indent) <= 2:
+                modules.append({"module": name, "cumulative_ms": round(int(cumulative_us) / 1000, 1)})
+    return sorted(modules, key=lambda m: m["cumulative_ms"], reverse=True)[:top]
+
+
+def summarize(runs):
+    summary = {}
+    for phase in (*PHASES, "process"):
+        values = sorted(run[phase] for run in runs)
+        summary[phase] = {
+            "median": round(statistics.median(values), 1),
+            "min": round(values[0], 1),
+            "max": round(values[-1], 1),
+        }
+    return summary
+
+
+def _git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain"], cwd=BACKEND_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def compare(result, baseline):
+    print(f"{'phase':<16}{'median ms':>20}")
+    for phase, current in result["phases"].items():
+        previous = baseline["phases"].get(phase)
+        if not previous:
+            continue
+        old, new = previous["median"], current["median"]
+        print(f"{phase:<16}{f'{new:>8} ({(new - old) / old * 100 if old else 0:+.0f}%)':>20}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure backend cold-start time.")
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters to time")
+    parser.add_argument("--python", default=sys.executable, help="interpreter to benchmark")
+    parser.add_argument("--importtime", type=int, metavar="N", default=0,
+                        help="also report the N slowest top-level imports")
+    parser.add_argument("--output", type=Path, help="result file (default: benchmarks/results/startup-<time>-<commit>.json)")
+    parser.add_argument("--baseline", type=Path, help="previous result file to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    commit, dirty = _git_revision()
+    started_at = datetime.now(timezone.utc).isoformat()
+
+    # the first run warms the OS file cache and .pyc files, so it isn't counted
+    run_once(args.python)
+    runs = [run_once(args.python) for _ in range(args.runs)]
+
+    result = {
+        "commit": commit,
+        "dirty": dirty,
+        "started_at": started_at,
+        "python": subprocess.run([args.python, "--version"], capture_output=True, text=True).stdout.strip(),
+        "runs": args.runs,
+        "phases": summarize(runs),
+    }
+    if args.importtime:
+        result["slowest_imports"] = import_profile(args.python, args.importtime)
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = RESULTS_DIR / f"startup-{stamp}-{(commit or 'unknown')[:8]}.json"
+    output.write_text(json.dumps(result, indent=2))
+    print(json.dumps(result["phases"]))
+    for module in result.get("slowest_imports", []):
+        print(f"{module['cumulative_ms']:>10} ms  {module['module']}")
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        compare(result, json.loads(args.baseline.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Per-query Python overhead of the hot-path lookups, before and after database.statements.
+
+Each lookup runs as the routes used to write it (a new ORM query per call)
+and through its pre-built statement, against the in-memory test profile.
+Time spent inside the driver's cursor.execute is measured separately and
+subtracted, leaving what SQLAlchemy and the ORM cost in Python per query.
+
+    python -m benchmarks.statements --calls 20000
+"""
+import argparse
+import json
+import time
+
+from sqlalchemy import event
+
+from app import create_app
+from database import (
+    ConsentRecord, ConsentType, HealthCareFacility, HealthCareWorker, Patient, User, UserRole, db,
+    consent_by_id, patient_by_id, patient_consent, statement_cache_stats, user_by_email, user_by_id, worker_by_user,
+)
+
+# name: (as the routes wrote it, through database.statements)
+LOOKUPS = {
+    "user_by_id": (
+        lambda: db.session.query(User).filter_by(user_id=1).first(),
+        lambda: user_by_id(1),
+    ),
+    "user_by_email": (
+        lambda: db.session.query(User).filter_by(email="doctor@test.com").first(),
+        lambda: user_by_email("doctor@test.com"),
+    ),
+    "worker_by_user": (
+        lambda: db.session.query(HealthCareWorker).filter_by(user_id=1).first(),
+        lambda: worker_by_user(1),
+    ),
+    "consent_by_id": (
+        lambda: db.session.query(ConsentRecord).filter_by(consent_id=1).first(),
+        lambda: consent_by_id(1),
+    ),
+    "patient_consent": (
+        lambda: db.session.query(ConsentRecord).filter(
+            ConsentRecord.patient_id == "PAT-000001", ConsentRecord.facility_id == "FAC-001"
+        ).first(),
+        lambda: patient_consent("PAT-000001", "FAC-001"),
+    ),
+    "patient_by_id": (
+        lambda: db.session.query(Patient).filter_by(patient_id="PAT-000001").first(),
+        lambda: patient_by_id("PAT-000001"),
+    ),
+}
+
+
+def seed():
+    facility = HealthCareFacility(facility_id="FAC-001", name="HealthHub Clinic", location="Nairobi")
+    doctor = User(user_id=1, email="doctor@test.com", password_hash="x", role=UserRole.HEALTHCARE_WORKER)
+    patient_user = User(user_id=2, email="patient@test.com", password_hash="x", role=UserRole.PATIENT)
+    db.session.add_all([
+        facility, doctor, patient_user,
+        HealthCareWorker(worker_id=1, user=doctor, healthcare_facility=facility,
+                         license_number="W-1", job_title="Physician"),
+        Patient(patient_id="PAT-000001", user=patient_user, first_name="Sarah", last_name="Ochieng",
+                national_id_encrypted="x"),
+        ConsentRecord(consent_id=1, patient_id="PAT-000001", facility_id="FAC-001", granted_by=2,
+                      consent_type=ConsentType.VIEW, purpose="Treatment"),
+    ])
+    db.session.commit()
+
+
+def _time(fn, calls, driver):
+    # objects stay in the identity map, as they would within one request
+    fn()
+    driver["seconds"] = 0.0
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    total = time.perf_counter() - started
+    return (total - driver["seconds"]) / calls * 1e6, total / calls * 1e6
+
+
+def run(calls):
+    app = create_app("test")
+    driver = {"seconds": 0.0}
+    results = {"calls": calls, "python_us": {}, "total_us": {}}
+    with app.app_context():
+        db.create_all()
+        seed()
+
+        engine = db.engine
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _started(conn, cursor, statement, parameters, context, executemany):
+            conn.info["cursor_started"] = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _finished(conn, cursor, statement, parameters, context, executemany):
+            driver["seconds"] += time.perf_counter() - conn.info.pop("cursor_started")
+
+        for name, (before, after) in LOOKUPS.items():
+            python_before, total_before = _time(before, calls, driver)
+            python_after, total_after = _time(after, calls, driver)
+            results["python_us"][name] = {"before": round(python_before, 1), "after": round(python_after, 1)}
+            results["total_us"][name] = {"before": round(total_before, 1), "after": round(total_after, 1)}
+        results["statement_cache"] = statement_cache_stats()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time hot-path lookups as ORM queries and as pre-built statements.")
+    parser.add_argument("--calls", type=int, default=10_000, help="calls per lookup and variant")
+    args = parser.parse_args()
+    print(json.dumps(run(args.calls), indent=2))
@@ -0,0 +1,316 @@
+"""Bulk loader for large synthetic populations.
+
+seed.py creates the handful of demo accounts through the ORM. This script
+streams generated rows into the tables with Core executemany batches and
+spreads hashing, encryption and row generation over a process pool, so tens
+of millions of rows load in minutes.
+
+    python bulk_seed.py --patients 1000000 --workers 10000 --consents 5000000 --access-logs 50000000
+
+Synthetic identities are derived from a row index (see patient_id and
+national_id), which mock-registry/bulk_seed.py mirrors for the registry side.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+from multiprocessing import Pool, cpu_count
+
+import bcrypt
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event, insert
+
+load_dotenv()
+
+from database import db, upgrade_database
+from utils import encrypt_id
+
+PASSWORD = "Test123!"
+ADMINS = 5
+BATCH_SIZE = 10_000
+
+FIRST_NAMES = ["Sarah", "Samuel", "Musa", "Faith", "David", "Mercy", "Kevin", "Beatrice", "Isaac", "Lydia"]
+LAST_NAMES = ["Ochieng", "Muchiri", "Hassan", "Wanjiku", "Njoroge", "Chelagat", "Otieno", "Mutua", "Kiprono", "Achieng"]
+COUNTIES = ["Nairobi", "Kisumu", "Mombasa", "Kiambu", "Nakuru", "Machakos", "Kericho", "Siaya"]
+
+
+def facility_count(sizes):
+    return max(3, sizes["workers"] // 20)
+
+
+def facility_id(i):
+    return f"FAC-{i:06d}"
+
+
+def patient_id(i):
+    return f"PAT-{i:09d}"
+
+
+def national_id(i):
+    return str(10_000_000 + i)
+
+
+def national_id_for(pat_id):
+    return national_id(int(pat_id.split("-")[1]))
+
+
+def admin_email(i):
+    return f"admin{i}@lt.io"
+
+
+def patient_email(i):
+    return f"p{i}@lt.io"
+
+
+def worker_email(i):
+    return f"w{i}@lt.io"
+
+
+def patient_user_id(i):
+    return ADMINS + i + 1
+
+
+def worker_user_id(i, sizes):
+    return ADMINS + sizes["patients"] + i + 1
+
+
+def worker_facility(i, sizes):
+    return facility_id(i % facility_count(sizes))
+
+
+def _birth_date(rng):
+    return date(1940, 1, 1) + timedelta(days=rng.randrange(365 * 65))
+
+
+# Row generators. Each one produces a contiguous slice [start, stop) so the
+# expensive tables can be generated in parallel, one slice per pool task.
+def _facilities(task):
+    sizes, start, stop, _ = task
+    kinds = ["HOSPITAL", "CLINIC", "PHARMACY"]
+    return [{
+        "facility_id": facility_id(i),
+        "name": f"LT Facility {i:06d}",
+        "facility_type": kinds[i % len(kinds)],
+        "license_number": f"LT-LIC-{i}",
+        "location": COUNTIES[i % len(COUNTIES)],
+    } for i in range(start, stop)]
+
+
+def _feed_heads(task):
+    # one consent change-feed counter per facility, see database.consent_events
+    sizes, start, stop, _ = task
+    return [{"facility_id": facility_id(i), "seq": 0} for i in range(start, stop)]
+
+
+def _hash_password(password):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(10)).decode("utf-8")
+
+
+def _users(task):
+    sizes, start, stop, pw_hash = task
+    rows = []
+    for i in range(start, stop):
+        if i < ADMINS:
+            user_id, email, role = i + 1, admin_email(i), "ADMIN"
+        elif i < ADMINS + sizes["patients"]:
+            user_id, email, role = i + 1, patient_email(i - ADMINS), "PATIENT"
+        else:
+            user_id, email, role = i + 1, worker_email(i - ADMINS - sizes["patients"]), "HEALTHCARE_WORKER"
+        rows.append({
+            "user_id": user_id,
+            "email": email,
+            # every account gets its own salt unless one shared hash was supplied
+            "password_hash": pw_hash or _hash_password(PASSWORD),
+            "role": role,
+        })
+    return rows
+
+
+def _patients(task):
+    sizes, start, stop, seed = task
+    rng = random.Random(f"patients-{seed}-{start}")
+    return [{
+        "patient_id": patient_id(i),
+        "national_id_encrypted": encrypt_id(national_id(i)),
+        "first_name": rng.choice(FIRST_NAMES),
+        "last_name": rng.choice(LAST_NAMES),
+        "date_of_birth": _birth_date(rng),
+        "user_id": patient_user_id(i),
+    } for i in range(start, stop)]
+
+
+def _workers(task):
+    sizes, start, stop, _ = task
+    return [{
+        "worker_id": i + 1,
+        "license_number": f"LT-W-{i}",
+        "job_title": "Physician",
+        "user_id": worker_user_id(i, sizes),
+        "facility_id": worker_facility(i, sizes),
+    } for i in range(start, stop)]
+
+
+def _consents(task):
+    sizes, start, stop, seed = task
+    rng = random.Random(f"consents-{seed}-{start}")
+    now = datetime.now()
+    facilities = facility_count(sizes)
+    rows = []
+    for _ in range(start, stop):
+        i = rng.randrange(sizes["patients"])
+        granted_at = now - timedelta(days=rng.randrange(365))
+        status = rng.choices(["ACTIVE", "REVOKED", "EXPIRED"], weights=[70, 20, 10])[0]
+        expires_at = granted_at + timedelta(days=rng.randrange(1, 730))
+        if status == "EXPIRED":
+            expires_at = now - timedelta(days=rng.randrange(1, 30))
+        rows.append({
+            "consent_type": rng.choice(["VIEW", "EDIT", "SHARE"]),
+            "granted_at": granted_at,
+            "expires_at": expires_at,
+            "purpose": "Load test",
+            "status": status,
+            "patient_id": patient_id(i),
+            "facility_id": facility_id(rng.randrange(facilities)),
+            "granted_by": patient_user_id(i),
+        })
+    return rows
+
+
+def _access_logs(task):
+    sizes, start, stop, seed = task
+    rng = random.Random(f"access_logs-{seed}-{start}")
+    now = datetime.now()
+    rows = []
+    for _ in range(start, stop):
+        allowed = rng.random() < 0.8
+        rows.append({
+            "action": rng.choice(["VIEW", "EDIT", "SHARE"]),
+            "result": "ALLOWED" if allowed else "DENIED",
+            "reason": "Consent Check" if allowed else "No Active Consent",
+            "timestamp": now - timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+            "ip_address": "192.168.1.1",
+            "patient_id": patient_id(rng.randrange(sizes["patients"])),
+            "accessed_by": rng.randrange(sizes["workers"]) + 1,
+        })
+    return rows
+
+
+_dialects = {}
+
+
+def _render(job):
+    # Runs in the pool: generate one slice and apply the column bind processors
+    # for the target dialect, leaving the parent only the driver executemany.
+    fn, table_name, uri, task = job
+    if uri not in _dialects:
+        _dialects[uri] = create_engine(uri).dialect
+    dialect = _dialects[uri]
+    table = db.metadata.tables[table_name]
+    rows = fn(task)
+    if not rows:
+        return [], []
+    columns = [column for column in table.columns if column.key in rows[0]]
+    processors = [column.type._cached_bind_processor(dialect) for column in columns]
+    return [column.key for column in columns], [
+        tuple(process(row[column.key]) if process else row[column.key]
+              for column, process in zip(columns, processors))
+        for row in rows
+    ]
+
+
+def _jobs(fn, table_name, uri, sizes, total, extra, batch_size=BATCH_SIZE):
+    for start in range(0, total, batch_size):
+        yield fn, table_name, uri, (sizes, start, min(start + batch_size, total), extra)
+
+
+def bulk_insert(engine, table, batches):
+    count = 0
+    for columns, rows in batches:
+        if not rows:
+            continue
+        compiled = insert(table).compile(dialect=engine.dialect, column_keys=columns)
+        if compiled.positional:
+            order = [columns.index(key) for key in compiled.positiontup]
+            params = [tuple(row[i] for i in order) for row in rows]
+        else:
+            params = [dict(zip(columns, row)) for row in rows]
+        # one executemany per batch, committed so MariaDB never holds a huge transaction
+        with engine.begin() as conn:
+            conn.exec_driver_sql(str(compiled), params)
+        count += len(rows)
+    return count
+
+
+def make_engine(uri):
+    engine = create_engine(uri)
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def _fast_sqlite(dbapi_connection, connection_record):
+            # throwaway bulk loads don't need crash safety
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA synchronous=OFF")
+            cursor.execute("PRAGMA journal_mode=MEMORY")
+            cursor.close()
+    return engine
+
+
+def seed_population(uri, sizes, processes=None, seed=0, reset=False, unique_passwords=False, log=print):
+    engine = make_engine(uri)
+    if reset:
+        db.metadata.drop_all(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE IF EXISTS alembic_version")
+    # the migrations create the tables and record their revision, so the app
+    # and `flask db upgrade` find the schema current
+    upgrade_database(uri)
+
+    users = ADMINS + sizes["patients"] + sizes["workers"]
+    pw_hash = None if unique_passwords else _hash_password(PASSWORD)
+    steps = [
+        ("healthcare_facilities", _facilities, facility_count(sizes), None, BATCH_SIZE),
+        ("consent_feed_heads", _feed_heads, facility_count(sizes), None, BATCH_SIZE),
+        # bcrypt is ~50ms per hash, so unique hashes go out in small tasks
+        ("users", _users, users, pw_hash, 100 if unique_passwords else BATCH_SIZE),
+        ("patients", _patients, sizes["patients"], seed, BATCH_SIZE),
+        ("healthcare_workers", _workers, sizes["workers"], None, BATCH_SIZE),
+        ("consent_records", _consents, sizes["consents"], seed, BATCH_SIZE),
+        ("access_logs", _access_logs, sizes["access_logs"], seed, BATCH_SIZE),
+    ]
+
+    # Generation runs in the pool while the parent process inserts, so the
+    # database is the only serial step. imap keeps a bounded number of
+    # batches in flight, which bounds memory for any population size.
+    with Pool(processes or cpu_count()) as pool:
+        for name, fn, total, extra, batch_size in steps:
+            started = time.perf_counter()
+            batches = pool.imap(_render, _jobs(fn, name, uri, sizes, total, extra, batch_size))
+            count = bulk_insert(engine, db.metadata.tables[name], batches)
+            elapsed = time.perf_counter() - started
+            log(f"{name}: {count} rows in {elapsed:.1f}s ({count / elapsed if elapsed else 0:,.0f} rows/s)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-load a synthetic population into the backend database.")
+    parser.add_argument("--database-uri", default=os.getenv("MARIADB_URI"))
+    parser.add_argument("--patients", type=int, default=1_000)
+    parser.add_argument("--workers", type=int, default=50)
+    parser.add_argument("--consents", type=int, default=5_000)
+    parser.add_argument("--access-logs", type=int, default=50_000)
+    parser.add_argument("--processes", type=int, help="pool size (default: number of CPUs)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    parser.add_argument("--unique-passwords", action="store_true",
+                        help="hash every password with its own salt instead of sharing one hash")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sizes = {"patients": args.patients, "workers": args.workers,
+             "consents": args.consents, "access_logs": args.access_logs}
+    started = time.perf_counter()
+    seed_population(args.database_uri, sizes, processes=args.processes, seed=args.seed,
+                    reset=args.reset, unique_passwords=args.unique_passwords)
+    print(json.dumps({"sizes": sizes, "seconds": round(time.perf_counter() - started, 1)}))
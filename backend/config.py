@@ -0,0 +1,79 @@
+import base64
+import os
+import secrets
+from datetime import timedelta
+
+from dotenv import load_dotenv
+
+
+class Config:
+    """Production settings: MariaDB and secrets from the environment or .env."""
+
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=15)
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=7)
+    # Import every route module at startup instead of on its first request
+    EAGER_ROUTES = False
+    CONSENT_SNAPSHOT = False
+    REGISTRY_MIRROR = False
+    WRITE_BEHIND = False
+    EXPORT_JOBS = False
+    SHARED_CACHE = False
+    ADMISSION_CONTROL = False
+    STATEMENT_TIMEOUTS = True
+
+    def __init__(self):
+        load_dotenv()
+        self.SQLALCHEMY_DATABASE_URI = os.getenv("MARIADB_URI")
+        self.SECRET_KEY = os.getenv("FLASK_SECRET_KEY")
+        self.JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+        self.CRYPTOGRAPHY_KEY = os.getenv("CRYPTOGRAPHY_KEY")
+        self.CRYPTOGRAPHY_PREVIOUS_KEYS = os.getenv("CRYPTOGRAPHY_PREVIOUS_KEYS", "")
+        # Comma-separated read replicas for endpoints marked @replica_reads
+        self.MARIADB_REPLICA_URIS = os.getenv("MARIADB_REPLICA_URIS", "")
+        # Comma-separated databases that patients, consents and access logs are sharded across
+        self.SHARD_URIS = os.getenv("SHARD_URIS", "")
+        self.EAGER_ROUTES = os.getenv("EAGER_ROUTES", "").lower() in ("1", "true", "yes")
+        # Answer consent summaries from an in-memory NumPy copy of consent_records
+        self.CONSENT_SNAPSHOT = os.getenv("CONSENT_SNAPSHOT", "").lower() in ("1", "true", "yes")
+        # Read registry demographics from a local mirror kept in sync with the registry's change feed
+        self.REGISTRY_MIRROR = os.getenv("REGISTRY_MIRROR", "").lower() in ("1", "true", "yes")
+        # Share facilities and worker assignments between worker processes through shared memory
+        self.SHARED_CACHE = os.getenv("SHARED_CACHE", "").lower() in ("1", "true", "yes")
+        # Buffer last_login updates in memory and write them in periodic bulk updates
+        self.WRITE_BEHIND = os.getenv("WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+        # Where access-log exports are written; defaults to instance/exports
+        self.EXPORT_DIR = os.getenv("EXPORT_DIR")
+        # Run exports on `flask jobs worker` processes instead of threads of the web process
+        self.EXPORT_JOBS = os.getenv("EXPORT_JOBS", "").lower() in ("1", "true", "yes")
+        # Database for the background job queue; defaults to MARIADB_URI
+        self.JOBS_DATABASE_URI = os.getenv("JOBS_DATABASE_URI")
+        # Abort queries that run past their resource's statement timeout
+        self.STATEMENT_TIMEOUTS = os.getenv("STATEMENT_TIMEOUTS", "1").lower() in ("1", "true", "yes")
+        # Cap concurrent requests per route class, serving clinical requests first
+        self.ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "").lower() in ("1", "true", "yes")
+        # Response compression and admission limits can be tuned from the environment
+        for key in ("COMPRESS_MIN_SIZE", "COMPRESS_GZIP_LEVEL", "COMPRESS_BR_LEVEL", "COMPRESS_ZSTD_LEVEL",
+                    "ADMISSION_MAX_ACTIVE", "ADMISSION_AUTH_LIMIT", "ADMISSION_BULK_LIMIT"):
+            if os.getenv(key):
+                setattr(self, key, int(os.getenv(key)))
+
+
+class TestConfig(Config):
+    """In-memory SQLite and throwaway secrets; ignores the environment."""
+
+    TESTING = True
+
+    def __init__(self):
+        self.SQLALCHEMY_DATABASE_URI = "sqlite://"
+        self.SECRET_KEY = secrets.token_hex(16)
+        self.JWT_SECRET_KEY = secrets.token_hex(32)
+        self.CRYPTOGRAPHY_KEY = base64.urlsafe_b64encode(os.urandom(32)).decode()
+        self.CRYPTOGRAPHY_PREVIOUS_KEYS = ""
+        self.MARIADB_REPLICA_URIS = ""
+        self.SHARD_URIS = ""
+
+
+PROFILES = {
+    "production": Config,
+    "test": TestConfig,
+}
@@ -1,4 +1,20 @@
 from .models import (
     User, Patient, HealthCareFacility,
-    HealthCareWorker, ConsentRecord, AccessLog, db,
-    UserRole, Status, EventAction, ConsentType)
+    HealthCareWorker, ConsentRecord, AccessLog, ConsentEvent, ConsentFeedHead, ExportJob,
+    RegistryDemographic, RegistrySyncState, Job, db,
+    UserRole, Status, EventAction, ConsentType, ConsentEventType, ExportStatus, JobStatus)
+from .routing import LAST_WRITE_HEADER, replica_binds, replica_reads, replica_router
+from .timeouts import QueryTimeout, statement_timeout
+from .facility_directory import facility_directory
+from .shared_directory import shared_directory, worker_facility
+from .access_events import access_log_events
+from .consent_events import consent_change_events, expire_overdue_consents
+from .sharding import Sharding, fan_out, shard_binds, shard_for
+from .schema import init_migrate, schema_is_current, upgrade_database, upgrade_schema
+from .exports import EXPORT_FORMATS, export_path, parse_filters, start_export
+from .consent_snapshot import consent_snapshot, consent_summary, expiring_consents
+from .registry_mirror import registry_demographics, registry_mirror
+from .write_behind import WriteBehind, last_login_writes, login_count_writes
+from .statements import (
+    consent_by_id, patient_by_id, patient_consent, statement_cache_stats, user_by_email, user_by_id, worker_by_user)
+from .jobs import jobs
@@ -0,0 +1,27 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from utils.pubsub import Broker
+
+from .models import AccessLog
+
+# Topic is the patient_id; messages are the log_id of each committed AccessLog
+access_log_events = Broker()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_access_logs(session, flush_context):
+    new_logs = [(obj.patient_id, obj.log_id) for obj in session.new if isinstance(obj, AccessLog)]
+    if new_logs:
+        session.info.setdefault("new_access_logs", []).extend(new_logs)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_access_logs(session):
+    for patient_id, log_id in session.info.pop("new_access_logs", ()):
+        access_log_events.publish(patient_id, log_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_access_logs(session):
+    session.info.pop("new_access_logs", None)
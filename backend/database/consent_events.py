@@ -0,0 +1,135 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import event, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from utils.pubsub import Broker
+
+from .jobs import jobs
+from .models import ConsentEvent, ConsentEventType, ConsentFeedHead, ConsentRecord, HealthCareFacility, Status, db
+
+logger = logging.getLogger(__name__)
+
+# Topic and message are both the facility_id; messages are only wake-ups, readers
+# fetch the events themselves from the feed
+consent_change_events = Broker()
+
+_EVENT_FOR_STATUS = {
+    Status.REVOKED: ConsentEventType.REVOKED,
+    Status.EXPIRED: ConsentEventType.EXPIRED,
+}
+
+
+def _status_event(record):
+    history = inspect(record).attrs.status.history
+    if not history.added:
+        return None
+    return _EVENT_FOR_STATUS.get(history.added[0])
+
+
+def _reserve_seqs(connection, facility_id, count):
+    # Returns the first of `count` consecutive seqs for the facility. The UPDATE
+    # holds the head row lock until commit, so a later seq can't commit first.
+    bump = (
+        update(ConsentFeedHead)
+        .where(ConsentFeedHead.facility_id == facility_id)
+        .values(seq=ConsentFeedHead.seq + count)
+    )
+    if not connection.execute(bump).rowcount:
+        # facility predates the feed (e.g. bulk-loaded). Another transaction
+        # may be adding its head row too, so only one insert takes and both
+        # then bump it in turn.
+        connection.execute(
+            insert(ConsentFeedHead)
+            .prefix_with("IGNORE", dialect="mysql")
+            .prefix_with("IGNORE", dialect="mariadb")
+            .prefix_with("OR IGNORE", dialect="sqlite")
+            .values(facility_id=facility_id, seq=0)
+        )
+        connection.execute(bump)
+    head = connection.execute(
+        select(ConsentFeedHead.seq).where(ConsentFeedHead.facility_id == facility_id)
+    ).scalar_one()
+    return head - count + 1
+
+
+# Events are written in the same transaction as the consent change, so the
+# feed never shows a change that was rolled back and never misses one that
+# was committed.
+@event.listens_for(Session, "after_flush")
+def _record_consent_events(session, flush_context):
+    connection = None
+    new_facilities = [obj.facility_id for obj in session.new if isinstance(obj, HealthCareFacility)]
+    if new_facilities:
+        connection = session.connection()
+        connection.execute(insert(ConsentFeedHead), [{"facility_id": f, "seq": 0} for f in new_facilities])
+
+    changes = defaultdict(list)
+    for obj in session.new:
+        if isinstance(obj, ConsentRecord):
+            changes[obj.facility_id].append((obj, ConsentEventType.CREATED))
+    for obj in session.dirty:
+        if isinstance(obj, ConsentRecord):
+            event_type = _status_event(obj)
+            if event_type is not None:
+                changes[obj.facility_id].append((obj, event_type))
+    if not changes:
+        return
+
+    connection = connection or session.connection()
+    now = datetime.now()
+    rows = []
+    # fixed lock order, so two transactions touching the same facilities can't deadlock
+    for facility_id in sorted(changes):
+        first = _reserve_seqs(connection, facility_id, len(changes[facility_id]))
+        for seq, (obj, event_type) in enumerate(changes[facility_id], start=first):
+            rows.append({
+                "facility_id": facility_id,
+                "seq": seq,
+                "event_type": event_type,
+                "status": obj.status or Status.ACTIVE,
+                "occurred_at": now,
+                "consent_id": obj.consent_id,
+                "patient_id": obj.patient_id,
+            })
+    connection.execute(insert(ConsentEvent), rows)
+    session.info.setdefault("changed_consent_facilities", set()).update(changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_consent_events(session):
+    for facility_id in session.info.pop("changed_consent_facilities", ()):
+        consent_change_events.publish(facility_id, facility_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_consent_events(session):
+    session.info.pop("changed_consent_facilities", None)
+
+
+def expire_overdue_consents(now=None, batch_size=1000):
+    """Mark active consents past expires_at as expired, recording an event for each.
+
+    Returns the number of consents expired.
+    """
+    now = now or datetime.now()
+    expired = 0
+    while True:
+        consents = db.session.execute(
+            select(ConsentRecord)
+            .where(ConsentRecord.status == Status.ACTIVE, ConsentRecord.expires_at < now)
+            .limit(batch_size)
+        ).scalars().all()
+        if not consents:
+            return expired
+        for consent in consents:
+            consent.status = Status.EXPIRED
+        db.session.commit()
+        expired += len(consents)
+
+
+@jobs.task("expire_consents", every=3600, concurrency=1)
+def expire_consents_job():
+    logger.info("Expired %s consents", expire_overdue_consents())
@@ -0,0 +1,485 @@
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import String, event, func, select, type_coerce
+from sqlalchemy.orm import Session
+
+from .models import ConsentEvent, ConsentFeedHead, ConsentRecord, ConsentType, Status, db
+from .sharding import shard_ids
+from .timeouts import without_statement_timeout
+
+try:
+    import numpy as np
+except ImportError:  # optional, see the "analytics" extra
+    np = None
+
+logger = logging.getLogger(__name__)
+
+TYPES = list(ConsentType)
+STATUSES = list(Status)
+# keyed by member and by name, since the ORM accepts either; None is the column default
+_TYPE_CODES = {**{t: code for code, t in enumerate(TYPES)}, **{t.name: code for code, t in enumerate(TYPES)}}
+_TYPE_CODES[None] = _TYPE_CODES[ConsentType.VIEW]
+_STATUS_CODES = {**{s: code for code, s in enumerate(STATUSES)}, **{s.name: code for code, s in enumerate(STATUSES)}}
+_STATUS_CODES[None] = _STATUS_CODES[Status.ACTIVE]
+_ACTIVE = _STATUS_CODES[Status.ACTIVE]
+# expiry stored for consents without an expires_at
+NO_EXPIRY = 2 ** 63 - 1
+# Rows read per round trip when loading, and consent ids per IN (...) when catching up
+LOAD_BATCH_SIZE = 50_000
+CATCH_UP_BATCH_SIZE = 500
+
+_COLUMNS = (
+    ConsentRecord.consent_id, ConsentRecord.patient_id, ConsentRecord.facility_id,
+    ConsentRecord.consent_type, ConsentRecord.status, ConsentRecord.expires_at,
+)
+# The same as table columns with enums read as their names, for loading
+# through Core without ORM rows or enum conversion
+_TABLE_COLUMNS = tuple(
+    type_coerce(column.expression, String).label(column.key) if column.key in ("consent_type", "status")
+    else column.expression
+    for column in _COLUMNS
+)
+
+
+def _epoch(expires_at):
+    # microseconds, the resolution of the DATETIME columns
+    return NO_EXPIRY if expires_at is None else round(expires_at.timestamp() * 1_000_000)
+
+
+class ConsentSnapshot:
+    """Per-process columnar copy of consent_records for facility-wide aggregates.
+
+    Each consent is one position across parallel NumPy arrays kept in
+    consent_id order: patient and facility as indexes into interned id lists,
+    type and status as enum codes, and expiry as epoch microseconds. Two
+    indexes are kept up to date alongside: counts per facility, status and
+    type, and the active consents that have an expiry, sorted by it. A
+    summary reads the counts and corrects them with a slice of the expiry
+    index, so its cost doesn't grow with the number of consents.
+
+    The first query loads every consent. Commits made through this process
+    are applied as they happen; changes from other workers are read off the
+    consent change feed at most every `poll` seconds. The whole copy is
+    rebuilt after `ttl` seconds, which also drops consents deleted behind
+    the session's back. A rebuild reads into a new copy without holding the
+    lock and swaps it in when done; until then queries use the old copy, and
+    commits are applied to it and replayed onto the new one.
+    """
+
+    # attributes making up one copy, swapped in together after a rebuild
+    _STATE = (
+        "size", "_consent", "_patient", "_facility", "_type", "_status", "_expires",
+        "_due", "_due_consent", "_due_facility", "_due_type", "_counts",
+        "_patients", "_patient_index", "_facilities", "_facility_index",
+        "_cursors", "_loaded_at", "_synced_at",
+    )
+
+    def __init__(self, poll=None, ttl=None):
+        self.poll = poll if poll is not None else float(os.getenv("CONSENT_SNAPSHOT_POLL", "5"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("CONSENT_SNAPSHOT_TTL", "3600"))
+        self._lock = threading.Lock()
+        # held for the whole of a load, so only one runs at a time
+        self._load_lock = threading.Lock()
+        self._loaded_at = None
+        self._synced_at = None
+        # commits applied while a load runs, replayed onto its copy
+        self._pending = None
+
+    def enabled(self):
+        if not current_app.config.get("CONSENT_SNAPSHOT"):
+            return False
+        if np is None:
+            logger.warning("CONSENT_SNAPSHOT is set but numpy is not installed; querying the database")
+            return False
+        return True
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def _reset(self, capacity):
+        self.size = 0
+        self._consent = np.empty(capacity, np.int64)
+        self._patient = np.empty(capacity, np.int32)
+        self._facility = np.empty(capacity, np.int32)
+        self._type = np.empty(capacity, np.int8)
+        self._status = np.empty(capacity, np.int8)
+        self._expires = np.empty(capacity, np.int64)
+        # active consents with an expiry, ordered by (expiry, consent_id)
+        self._due = np.empty(0, np.int64)
+        self._due_consent = np.empty(0, np.int64)
+        self._due_facility = np.empty(0, np.int32)
+        self._due_type = np.empty(0, np.int8)
+        self._counts = np.zeros((0, len(STATUSES), len(TYPES)), np.int64)
+        self._patients, self._patient_index = [], {}
+        self._facilities, self._facility_index = [], {}
+        self._cursors = {}
+
+    def _arrays(self):
+        return (self._consent, self._patient, self._facility, self._type, self._status, self._expires)
+
+    def _grow(self, needed):
+        capacity = len(self._consent)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        (self._consent, self._patient, self._facility, self._type, self._status, self._expires) = (
+            np.resize(array, capacity) for array in self._arrays()
+        )
+
+    def _intern(self, ids, index, value):
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(ids)
+            ids.append(value)
+        return code
+
+    def _encode(self, row):
+        consent_id, patient_id, facility_id, consent_type, status, expires_at = row
+        return (
+            consent_id,
+            self._intern(self._patients, self._patient_index, patient_id),
+            self._intern(self._facilities, self._facility_index, facility_id),
+            _TYPE_CODES[consent_type],
+            _STATUS_CODES[status],
+            _epoch(expires_at),
+        )
+
+    def _count(self, facility, status, consent_type, delta):
+        if facility >= len(self._counts):
+            self._counts = np.concatenate([self._counts, np.zeros((len(self._facilities) - len(self._counts),)
+                                                                  + self._counts.shape[1:], np.int64)])
+        self._counts[facility, status, consent_type] += delta
+
+    def _position(self, consent_id):
+        n = self.size
+        i = int(np.searchsorted(self._consent[:n], consent_id))
+        return i, i < n and self._consent[i] == consent_id
+
+    def _due_entry(self, i):
+        # the expiry index entry for position i, if it has one
+        if self._status[i] == _ACTIVE and self._expires[i] != NO_EXPIRY:
+            return int(self._expires[i]), int(self._consent[i]), int(self._facility[i]), int(self._type[i])
+        return None
+
+    def _due_arrays(self):
+        return (self._due, self._due_consent, self._due_facility, self._due_type)
+
+    def _due_position(self, due, consent_id, *_):
+        lo = int(np.searchsorted(self._due, due, "left"))
+        hi = int(np.searchsorted(self._due, due, "right"))
+        return lo + int(np.searchsorted(self._due_consent[lo:hi], consent_id))
+
+    def _reindex_due(self, dropped, added):
+        # one pass over the expiry index per batch of changes
+        if dropped:
+            positions = [self._due_position(*entry) for entry in dropped]
+            self._due, self._due_consent, self._due_facility, self._due_type = (
+                np.delete(array, positions) for array in self._due_arrays()
+            )
+        if added:
+            added.sort()
+            positions = [self._due_position(*entry) for entry in added]
+            self._due, self._due_consent, self._due_facility, self._due_type = (
+                np.insert(array, positions, values) for array, values in zip(self._due_arrays(), zip(*added))
+            )
+
+    def _upsert(self, rows):
+        dropped, added = [], []
+        for row in rows:
+            values = self._encode(row)
+            i, found = self._position(values[0])
+            if found:
+                self._count(self._facility[i], self._status[i], self._type[i], -1)
+                entry = self._due_entry(i)
+                if entry:
+                    dropped.append(entry)
+            else:
+                n = self.size
+                self._grow(n + 1)
+                if i < n:
+                    # ids from different shards can arrive out of order; shift the tail up one
+                    for array in self._arrays():
+                        array[i + 1:n + 1] = array[i:n]
+                self.size = n + 1
+            for array, value in zip(self._arrays(), values):
+                array[i] = value
+            self._count(values[2], values[4], values[3], 1)
+            entry = self._due_entry(i)
+            if entry:
+                added.append(entry)
+        # a consent changed twice in one batch is dropped for its old expiry and added for the last
+        self._reindex_due([e for e in dropped if e not in added] if added else dropped,
+                          [e for e in added if e not in dropped] if dropped else added)
+
+    def _remove(self, consent_ids):
+        positions = [i for i, found in map(self._position, consent_ids) if found]
+        if not positions:
+            return
+        for i in positions:
+            self._count(self._facility[i], self._status[i], self._type[i], -1)
+        self._reindex_due([entry for entry in map(self._due_entry, positions) if entry], [])
+        n, keep = self.size, self.size - len(positions)
+        for array in self._arrays():
+            array[:keep] = np.delete(array[:n], positions)
+        self.size = keep
+
+    def _feed_heads(self):
+        return dict(db.session.execute(select(ConsentFeedHead.facility_id, ConsentFeedHead.seq)).all())
+
+    def _load(self):
+        started = time.monotonic()
+        # heads first: anything committed while the table is read is replayed by the next catch-up
+        cursors = self._feed_heads()
+        engines = [db.engines[shard] for shard in shard_ids()] or [db.engine]
+        self._reset(1024)
+        n = 0
+        for engine in engines:
+            with engine.connect() as conn:
+                self._grow(n + conn.execute(select(func.count()).select_from(ConsentRecord)).scalar())
+                result = conn.execution_options(yield_per=LOAD_BATCH_SIZE).execute(select(*_TABLE_COLUMNS))
+                for rows in result.partitions():
+                    block = np.array([self._encode(row) for row in rows], dtype=np.int64)
+                    self._grow(n + len(block))
+                    for array, column in zip(self._arrays(), block.T):
+                        array[n:n + len(block)] = column
+                    n += len(block)
+        # shards come back one after another, each in its own order
+        order = np.argsort(self._consent[:n], kind="stable")
+        for array in self._arrays():
+            array[:n] = array[:n][order]
+        self.size = n
+        shape = (len(self._facilities), len(STATUSES), len(TYPES))
+        key = (self._facility[:n].astype(np.int64) * len(STATUSES) + self._status[:n]) * len(TYPES) + self._type[:n]
+        self._counts = np.bincount(key, minlength=shape[0] * shape[1] * shape[2]).reshape(shape)
+        due = np.flatnonzero((self._status[:n] == _ACTIVE) & (self._expires[:n] != NO_EXPIRY))
+        due = due[np.argsort(self._expires[due], kind="stable")]
+        self._due, self._due_consent = self._expires[due], self._consent[due]
+        self._due_facility, self._due_type = self._facility[due], self._type[due]
+        self._cursors = cursors
+        self._loaded_at = self._synced_at = time.monotonic()
+        logger.info("Loaded %d consents into the snapshot in %.2fs", self.size, self._loaded_at - started)
+
+    def _catch_up(self):
+        heads = self._feed_heads()
+        changed = {}
+        for facility_id, head in heads.items():
+            cursor = self._cursors.get(facility_id, 0)
+            if head <= cursor:
+                continue
+            changed.update(db.session.execute(
+                select(ConsentEvent.consent_id, ConsentEvent.patient_id)
+                .where(ConsentEvent.facility_id == facility_id, ConsentEvent.seq > cursor, ConsentEvent.seq <= head)
+            ).all())
+
+        consent_ids = list(changed)
+        for start in range(0, len(consent_ids), CATCH_UP_BATCH_SIZE):
+            batch = consent_ids[start:start + CATCH_UP_BATCH_SIZE]
+            # patient_id lets a sharded session go straight to the owning shards
+            rows = db.session.execute(select(*_TABLE_COLUMNS).where(
+                ConsentRecord.patient_id.in_({changed[c] for c in batch}),
+                ConsentRecord.consent_id.in_(batch),
+            )).all()
+            self._upsert(rows)
+            self._remove(set(batch) - {row.consent_id for row in rows})
+        self._cursors = heads
+        self._synced_at = time.monotonic()
+
+    def _reload(self):
+        # call without the lock held
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at <= self.ttl:
+            return
+        # only queries with no copy to read wait for a load; the rest carry on
+        # with the old copy while another thread rebuilds it
+        if not self._load_lock.acquire(blocking=loaded_at is None):
+            return
+        try:
+            if self._loaded_at != loaded_at:
+                # loaded by the thread we waited on
+                return
+            with self._lock:
+                self._pending = []
+            copy = ConsentSnapshot(self.poll, self.ttl)
+            # a full read of consent_records, bounded by nothing but its size
+            with without_statement_timeout():
+                copy._load()
+            with self._lock:
+                for name in self._STATE:
+                    setattr(self, name, getattr(copy, name))
+                for rows, deleted in self._pending:
+                    self._upsert(rows)
+                    self._remove(deleted)
+        finally:
+            with self._lock:
+                self._pending = None
+            self._load_lock.release()
+
+    def _fresh(self):
+        # call with the lock held, after _reload
+        if time.monotonic() - self._synced_at > self.poll:
+            self._catch_up()
+
+    def apply(self, rows=(), deleted=()):
+        """Apply committed consent rows (see _COLUMNS) and deletions to a loaded snapshot."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((rows, deleted))
+            if self._loaded_at is None:
+                return
+            self._upsert(rows)
+            self._remove(deleted)
+
+    def _lapsing(self, now, soon):
+        # expiry index slices: active consents already past expires_at, and those expiring by `soon`
+        overdue = int(np.searchsorted(self._due, now, "right"))
+        return slice(0, overdue), slice(overdue, int(np.searchsorted(self._due, soon, "right")))
+
+    def summary(self, facility_id=None, now=None, expiring_within=timedelta(days=7)):
+        """Per-facility counts: active consents by type, all consents by status, and active consents expiring soon.
+
+        A consent counts as active while its status is active and expires_at
+        has not passed, whether or not the expiry sweep has caught up with it.
+        """
+        now = _epoch(now or datetime.now())
+        soon = now + expiring_within // timedelta(microseconds=1)
+        self._reload()
+        with self._lock:
+            self._fresh()
+            code = None
+            if facility_id is not None:
+                code = self._facility_index.get(facility_id)
+                if code is None:
+                    return {}
+            counts = self._counts.copy()
+            facilities = self._facilities
+            overdue, expiring = self._lapsing(now, soon)
+            overdue_facility, overdue_type = self._due_facility[overdue], self._due_type[overdue]
+            expiring_facility = self._due_facility[expiring]
+
+        f = len(counts)
+        lapsed = np.bincount(overdue_facility.astype(np.int64) * len(TYPES) + overdue_type,
+                             minlength=f * len(TYPES)).reshape(f, len(TYPES))
+        active = counts[:, _ACTIVE, :] - lapsed
+        expiring = np.bincount(expiring_facility, minlength=f)
+        by_status = counts.sum(axis=2)
+        codes = np.flatnonzero(by_status.sum(axis=1)) if code is None else [code] if by_status[code].any() else []
+        return {
+            facilities[code]: {
+                "active": {t.value: int(count) for t, count in zip(TYPES, active[code])},
+                "by_status": {s.value: int(count) for s, count in zip(STATUSES, by_status[code])},
+                "expiring": int(expiring[code]),
+            }
+            for code in codes
+        }
+
+    def expiring(self, facility_id=None, now=None, within=timedelta(days=7), limit=None):
+        """Ids of active consents whose expires_at falls within `within` of `now`, soonest first."""
+        now = _epoch(now or datetime.now())
+        soon = now + within // timedelta(microseconds=1)
+        self._reload()
+        with self._lock:
+            self._fresh()
+            expiring = self._lapsing(now, soon)[1]
+            consent_ids = self._due_consent[expiring]
+            if facility_id is not None:
+                code = self._facility_index.get(facility_id)
+                if code is None:
+                    return []
+                consent_ids = consent_ids[self._due_facility[expiring] == code]
+            return consent_ids[:limit].tolist()
+
+
+consent_snapshot = ConsentSnapshot()
+
+
+# Database fallbacks for when the snapshot is off
+
+def _sql_summary(facility_id, now, expiring_within):
+    criteria = [ConsentRecord.facility_id == facility_id] if facility_id is not None else []
+    active = [ConsentRecord.status == Status.ACTIVE,
+              (ConsentRecord.expires_at > now) | ConsentRecord.expires_at.is_(None)]
+    summary = defaultdict(lambda: {
+        "active": {t.value: 0 for t in TYPES},
+        "by_status": {s.value: 0 for s in STATUSES},
+        "expiring": 0,
+    })
+    # a sharded session runs these on every shard and returns each shard's groups, hence +=
+    for f, status, count in db.session.execute(
+        select(ConsentRecord.facility_id, ConsentRecord.status, func.count())
+        .where(*criteria).group_by(ConsentRecord.facility_id, ConsentRecord.status)
+    ):
+        summary[f]["by_status"][status.value] += count
+    for f, consent_type, count in db.session.execute(
+        select(ConsentRecord.facility_id, ConsentRecord.consent_type, func.count())
+        .where(*criteria, *active).group_by(ConsentRecord.facility_id, ConsentRecord.consent_type)
+    ):
+        summary[f]["active"][consent_type.value] += count
+    for f, count in db.session.execute(
+        select(ConsentRecord.facility_id, func.count())
+        .where(*criteria, *active, ConsentRecord.expires_at <= now + expiring_within)
+        .group_by(ConsentRecord.facility_id)
+    ):
+        summary[f]["expiring"] += count
+    return dict(summary)
+
+
+def _sql_expiring(facility_id, now, within, limit):
+    criteria = [ConsentRecord.facility_id == facility_id] if facility_id is not None else []
+    rows = db.session.execute(
+        select(ConsentRecord.consent_id, ConsentRecord.expires_at)
+        .where(*criteria, ConsentRecord.status == Status.ACTIVE,
+               ConsentRecord.expires_at > now, ConsentRecord.expires_at <= now + within)
+        .order_by(ConsentRecord.expires_at, ConsentRecord.consent_id).limit(limit)
+    ).all()
+    # shards each return their own ordered rows
+    return [consent_id for consent_id, _ in sorted(rows, key=lambda row: (row[1], row[0]))][:limit]
+
+
+def consent_summary(facility_id=None, expiring_within=timedelta(days=7)):
+    """ConsentSnapshot.summary, from the snapshot when it is enabled and the database otherwise."""
+    if consent_snapshot.enabled():
+        return consent_snapshot.summary(facility_id, expiring_within=expiring_within)
+    return _sql_summary(facility_id, datetime.now(), expiring_within)
+
+
+def expiring_consents(facility_id=None, within=timedelta(days=7), limit=None):
+    """ConsentSnapshot.expiring, from the snapshot when it is enabled and the database otherwise."""
+    if consent_snapshot.enabled():
+        return consent_snapshot.expiring(facility_id, within=within, limit=limit)
+    return _sql_expiring(facility_id, datetime.now(), within, limit)
+
+
+# Apply this process's consent writes once they commit
+@event.listens_for(Session, "after_flush")
+def _collect_consent_rows(session, flush_context):
+    rows = [
+        tuple(getattr(obj, column.key) for column in _COLUMNS)
+        for obj in session.new | session.dirty if isinstance(obj, ConsentRecord)
+    ]
+    deleted = [obj.consent_id for obj in session.deleted if isinstance(obj, ConsentRecord)]
+    if rows or deleted:
+        pending = session.info.setdefault("snapshot_consents", ([], []))
+        pending[0].extend(rows)
+        pending[1].extend(deleted)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_consent_rows(session):
+    pending = session.info.pop("snapshot_consents", None)
+    if pending is None:
+        return
+    rows, deleted = pending
+    # expires_at may still be a SQL expression; the feed brings the stored value later
+    rows = [row for row in rows if row[5] is None or isinstance(row[5], datetime)]
+    consent_snapshot.apply(rows, deleted)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_consent_rows(session):
+    session.info.pop("snapshot_consents", None)
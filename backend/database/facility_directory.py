@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from .models import FacilityType, HealthCareFacility, db
+from .shared_directory import shared_directory
+
+Facility = namedtuple("Facility", ["facility_id", "name", "facility_type", "license_number", "location"])
+
+_Snapshot = namedtuple("_Snapshot", ["version", "loaded_at", "by_id", "by_name", "listing", "etag"])
+
+
+class FacilityDirectory:
+    """Per-process, read-mostly copy of the healthcare_facilities table.
+
+    The first lookup loads every facility; later lookups are dictionary hits.
+    The copy is reloaded after this process commits a facility change, or
+    after `ttl` seconds so changes made by other workers are picked up.
+    With SHARED_CACHE on, get() and by_name() read the copy all worker
+    processes share instead, once it is loaded.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl if ttl is not None else float(os.getenv("FACILITY_DIRECTORY_TTL", "300"))
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = 0
+
+    def _load(self):
+        rows = db.session.execute(
+            select(
+                HealthCareFacility.facility_id,
+                HealthCareFacility.name,
+                HealthCareFacility.facility_type,
+                HealthCareFacility.license_number,
+                HealthCareFacility.location,
+            ).order_by(HealthCareFacility.facility_id)
+        ).all()
+        facilities = [Facility(*row) for row in rows]
+        listing = [{"id": f.facility_id, "name": f.name} for f in facilities]
+        # Content hash rather than the version counter, so every worker serving
+        # the same data hands out the same ETag
+        etag = hashlib.sha1(json.dumps(listing, sort_keys=True).encode("utf-8")).hexdigest()
+        self._version += 1
+        return _Snapshot(
+            version=self._version,
+            loaded_at=time.monotonic(),
+            by_id={f.facility_id: f for f in facilities},
+            by_name={f.name: f for f in facilities},
+            listing=listing,
+            etag=etag,
+        )
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() - snapshot.loaded_at > self.ttl:
+            with self._lock:
+                # another thread may have reloaded while we waited
+                snapshot = self._snapshot
+                if snapshot is None or time.monotonic() - snapshot.loaded_at > self.ttl:
+                    snapshot = self._snapshot = self._load()
+        return snapshot
+
+    def invalidate(self):
+        self._snapshot = None
+
+    def get(self, facility_id):
+        if shared_directory.ready():
+            return _shared_facility(shared_directory.facility(facility_id))
+        return self.snapshot().by_id.get(facility_id)
+
+    def by_name(self, name):
+        if shared_directory.ready():
+            return _shared_facility(shared_directory.facility_by_name(name))
+        return self.snapshot().by_name.get(name)
+
+
+def _shared_facility(value):
+    if value is None:
+        return None
+    facility_id, name, facility_type, license_number, location = value
+    return Facility(facility_id, name, FacilityType(facility_type) if facility_type else None, license_number, location)
+
+
+facility_directory = FacilityDirectory()
+
+
+# Reload after any committed insert/update/delete of a facility in this process
+@event.listens_for(Session, "after_flush")
+def _track_facility_changes(session, flush_context):
+    changed = session.new | session.dirty | session.deleted
+    if any(isinstance(obj, HealthCareFacility) for obj in changed):
+        session.info["facilities_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_facility_directory(session):
+    if session.info.pop("facilities_changed", False):
+        facility_directory.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_facility_changes(session):
+    session.info.pop("facilities_changed", None)
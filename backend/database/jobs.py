@@ -0,0 +1,312 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, g
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .models import Job, JobStatus, db
+
+logger = logging.getLogger(__name__)
+
+# Bind that holds the jobs table when JOBS_DATABASE_URI is set
+JOBS_BIND = "jobs"
+# Seconds between polls of the queue when there is nothing to run
+POLL_INTERVAL = 1.0
+# Seconds between checks for jobs abandoned by a worker that died
+RECOVER_INTERVAL = 60
+# Seconds before a failed job's first retry; doubled for each attempt after it
+RETRY_BACKOFF = 30
+# Finished jobs are deleted after this many days by the purge_jobs task
+KEEP_FINISHED_DAYS = 7
+
+
+# every: seconds between scheduled runs, or None to run only when enqueued.
+# concurrency: jobs of the kind running at once across all workers, or None.
+# timeout: seconds a running job may go without finishing before it counts as abandoned.
+Task = namedtuple("Task", ["name", "fn", "every", "concurrency", "max_attempts", "timeout"])
+
+
+class JobQueue:
+    """Durable background jobs, stored in the jobs table.
+
+    Tasks are registered with `@jobs.task(name, ...)` and run by
+    `flask jobs worker` processes, which claim due jobs from the table, run
+    each on a thread with its own app context, and record the outcome. A job
+    that raises is retried `max_attempts` times in all, RETRY_BACKOFF
+    seconds later and twice as long after each further failure. A worker
+    that dies mid-job leaves the job running; once the task's `timeout` has
+    passed, another worker takes it up again.
+
+    Tasks with `every` are also enqueued by the workers on that interval.
+    Each run gets a dedupe key for its time slot, so however many workers
+    are up, a slot is only enqueued once. `concurrency` is checked when a
+    job is claimed; workers claiming at the same moment can briefly go over.
+
+    The jobs table lives in the main database, or in the database given by
+    JOBS_DATABASE_URI (e.g. a local SQLite file), where it is created on
+    first use. Tasks read and write the main database through db.session
+    either way.
+    """
+
+    def __init__(self):
+        self.tasks = {}
+        self._created = set()
+        # time slot each task was last enqueued for by this process
+        self._scheduled = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.cli.add_command(jobs_cli)
+
+    def task(self, name, every=None, concurrency=None, max_attempts=3, timeout=3600):
+        """Register the decorated function as the task `name`; the job's payload is passed as keyword arguments."""
+        def decorator(fn):
+            self.tasks[name] = Task(name, fn, every, concurrency, max_attempts, timeout)
+            return fn
+        return decorator
+
+    def engine(self):
+        engine = db.engines.get(JOBS_BIND) or db.engine
+        if JOBS_BIND in db.engines and engine.url not in self._created:
+            with self._lock:
+                Job.__table__.create(engine, checkfirst=True)
+                self._created.add(engine.url)
+        return engine
+
+    def enqueue(self, kind, payload=None, delay=0, dedupe_key=None):
+        """Queue a run of the task `kind` in `delay` seconds; returns the job_id, or None if `dedupe_key` is taken."""
+        task = self.tasks[kind]
+        values = {
+            "kind": kind,
+            "payload": payload,
+            "status": JobStatus.QUEUED,
+            "attempts": 0,
+            "max_attempts": task.max_attempts,
+            "run_at": datetime.now() + timedelta(seconds=delay),
+            "dedupe_key": dedupe_key,
+        }
+        try:
+            with self.engine().begin() as conn:
+                return conn.execute(insert(Job).values(values)).inserted_primary_key[0]
+        except IntegrityError:
+            if dedupe_key is None:
+                raise
+            return None
+
+    def schedule(self, now=None):
+        """Enqueue the current run of every task with an interval, unless it already is; returns how many were."""
+        now = now or time.time()
+        enqueued = 0
+        for task in self.tasks.values():
+            if task.every is None:
+                continue
+            slot = int(now // task.every)
+            if self._scheduled.get(task.name) == slot:
+                continue
+            self._scheduled[task.name] = slot
+            if self.enqueue(task.name, delay=slot * task.every - now, dedupe_key=f"{task.name}@{slot}") is not None:
+                enqueued += 1
+        return enqueued
+
+    def recover(self):
+        """Requeue running jobs whose worker has gone quiet past the task's timeout; returns how many were."""
+        recovered = 0
+        now = datetime.now()
+        with self.engine().begin() as conn:
+            for task in self.tasks.values():
+                stale = (Job.kind == task.name) & (Job.status == JobStatus.RUNNING) \
+                    & (Job.locked_at < now - timedelta(seconds=task.timeout))
+                recovered += conn.execute(update(Job).where(stale, Job.attempts < Job.max_attempts).values(
+                    status=JobStatus.QUEUED, locked_by=None, locked_at=None, last_error="abandoned by its worker",
+                )).rowcount
+                conn.execute(update(Job).where(stale).values(
+                    status=JobStatus.FAILED, last_error="abandoned by its worker", finished_at=now,
+                ))
+        return recovered
+
+    def claim(self, worker_id, limit):
+        """Mark up to `limit` due jobs as running for this worker and return them as
+        (job_id, kind, payload, attempt, max_attempts) rows."""
+        now = datetime.now()
+        with self.engine().begin() as conn:
+            due = conn.execute(
+                select(Job.job_id, Job.kind, Job.payload, (Job.attempts + 1).label("attempt"), Job.max_attempts)
+                .where(Job.status == JobStatus.QUEUED, Job.run_at <= now, Job.kind.in_(self.tasks))
+                .order_by(Job.run_at, Job.job_id).limit(limit * 4)
+            ).all()
+            if not due:
+                return []
+            running = dict(conn.execute(
+                select(Job.kind, func.count()).where(Job.status == JobStatus.RUNNING).group_by(Job.kind)
+            ).all())
+
+        claimed = []
+        for job in due:
+            limit_for_kind = self.tasks[job.kind].concurrency
+            if len(claimed) == limit or (limit_for_kind is not None and running.get(job.kind, 0) >= limit_for_kind):
+                continue
+            # another worker may have claimed it since it was read
+            with self.engine().begin() as conn:
+                taken = conn.execute(
+                    update(Job).where(Job.job_id == job.job_id, Job.status == JobStatus.QUEUED).values(
+                        status=JobStatus.RUNNING, locked_by=worker_id, locked_at=now, attempts=Job.attempts + 1,
+                    )
+                ).rowcount
+            if taken:
+                running[job.kind] = running.get(job.kind, 0) + 1
+                claimed.append(job)
+        return claimed
+
+    def run(self, job, worker_id):
+        """Run a claimed job and record whether it succeeded. Needs an app context."""
+        task = self.tasks[job.kind]
+        g.job = job
+        try:
+            task.fn(**(job.payload or {}))
+        except Exception as exc:
+            # the task's own session may be mid-transaction
+            db.session.rollback()
+            logger.exception("Job %s (%s) failed", job.job_id, job.kind)
+            self._failed(job, worker_id, f"{type(exc).__name__}: {exc}")
+            return False
+        self._finish(job, worker_id, status=JobStatus.DONE, last_error=None)
+        return True
+
+    def last_attempt(self):
+        """Whether the job being run in this app context won't be retried if it raises (True outside a job)."""
+        job = g.get("job")
+        return job is None or job.attempt >= job.max_attempts
+
+    def _finish(self, job, worker_id, **values):
+        with self.engine().begin() as conn:
+            conn.execute(update(Job).where(Job.job_id == job.job_id, Job.locked_by == worker_id).values(
+                locked_by=None, locked_at=None, finished_at=datetime.now(), **values,
+            ))
+
+    def _failed(self, job, worker_id, error):
+        with self.engine().begin() as conn:
+            attempts, max_attempts = conn.execute(
+                select(Job.attempts, Job.max_attempts).where(Job.job_id == job.job_id)
+            ).one()
+        if attempts >= max_attempts:
+            self._finish(job, worker_id, status=JobStatus.FAILED, last_error=error)
+            return
+        retry_at = datetime.now() + timedelta(seconds=RETRY_BACKOFF * 2 ** (attempts - 1))
+        with self.engine().begin() as conn:
+            conn.execute(update(Job).where(Job.job_id == job.job_id, Job.locked_by == worker_id).values(
+                status=JobStatus.QUEUED, locked_by=None, locked_at=None, run_at=retry_at, last_error=error,
+            ))
+
+    def work(self, threads=2, once=False):
+        """Claim and run jobs until interrupted (or, with `once`, until none are due). Needs an app context."""
+        app = current_app._get_current_object()
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        busy = set()
+        busy_lock = threading.Lock()
+        # set when a job finishes, so its thread is filled again without waiting out the poll
+        finished = threading.Event()
+        recovered_at = 0
+
+        def run(job):
+            try:
+                with app.app_context():
+                    self.run(job, worker_id)
+            finally:
+                with busy_lock:
+                    busy.discard(job.job_id)
+                finished.set()
+
+        logger.info("Job worker %s started with %s threads for %s", worker_id, threads, ", ".join(sorted(self.tasks)))
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="job") as executor:
+            while True:
+                finished.clear()
+                with busy_lock:
+                    running = len(busy)
+                try:
+                    self.schedule()
+                    if time.monotonic() - recovered_at > RECOVER_INTERVAL:
+                        self.recover()
+                        recovered_at = time.monotonic()
+                    claimed = self.claim(worker_id, threads - running) if running < threads else []
+                except Exception:
+                    logger.exception("Polling the job queue failed; retrying in %ss", POLL_INTERVAL)
+                    claimed = []
+                for job in claimed:
+                    with busy_lock:
+                        busy.add(job.job_id)
+                    executor.submit(run, job)
+                # a job still running when the queue was read may yet queue a retry
+                if once and not claimed and not running:
+                    return
+                if not claimed:
+                    finished.wait(POLL_INTERVAL)
+
+jobs = JobQueue()
+
+
+@jobs.task("purge_jobs", every=86400, concurrency=1)
+def purge_jobs_job(days=KEEP_FINISHED_DAYS):
+    with jobs.engine().begin() as conn:
+        purged = conn.execute(delete(Job).where(
+            Job.status.in_([JobStatus.DONE, JobStatus.FAILED]),
+            Job.finished_at < datetime.now() - timedelta(days=days),
+        )).rowcount
+    logger.info("Purged %s finished jobs", purged)
+
+
+jobs_cli = AppGroup("jobs", help="Run and inspect background jobs.")
+
+
+@jobs_cli.command("worker")
+@click.option("--threads", default=2, show_default=True, help="Jobs run at once by this process.")
+@click.option("--once", is_flag=True, help="Exit once no jobs are due instead of polling.")
+def run_worker(threads, once):
+    """Run queued and scheduled jobs until interrupted."""
+    jobs.work(threads=threads, once=once)
+
+
+@jobs_cli.command("enqueue")
+@click.argument("kind")
+@click.option("--payload", default=None, help="JSON object passed to the task as keyword arguments.")
+@click.option("--delay", default=0.0, help="Seconds to wait before the job is due.")
+def enqueue_job(kind, payload, delay):
+    """Queue a run of a task."""
+    if kind not in jobs.tasks:
+        raise click.BadParameter(f"unknown task, expected one of {', '.join(sorted(jobs.tasks))}", param_hint="KIND")
+    job_id = jobs.enqueue(kind, current_app.json.loads(payload) if payload else None, delay=delay)
+    click.echo(f"Queued job {job_id}")
+
+
+@jobs_cli.command("list")
+@click.option("--status", type=click.Choice([s.value for s in JobStatus]), help="Only jobs with this status.")
+@click.option("--limit", default=20, show_default=True)
+def list_jobs(status, limit):
+    """Show the most recent jobs."""
+    stmt = select(Job).order_by(Job.job_id.desc()).limit(limit)
+    if status:
+        stmt = stmt.where(Job.status == JobStatus(status))
+    with jobs.engine().connect() as conn:
+        for job in conn.execute(stmt).all():
+            click.echo(f"{job.job_id:>8}  {job.kind:<20} {job.status.value:<8} attempts={job.attempts}/{job.max_attempts}"
+                       f"  run_at={job.run_at:%Y-%m-%d %H:%M:%S}{'  ' + job.last_error if job.last_error else ''}")
+
+
+@jobs_cli.command("retry")
+@click.argument("job_id", type=int)
+def retry_job(job_id):
+    """Queue a failed job again, with its attempts reset."""
+    with jobs.engine().begin() as conn:
+        updated = conn.execute(update(Job).where(Job.job_id == job_id, Job.status == JobStatus.FAILED).values(
+            status=JobStatus.QUEUED, attempts=0, run_at=datetime.now(), finished_at=None,
+        )).rowcount
+    click.echo(f"Queued job {job_id} again" if updated else f"Job {job_id} is not a failed job")
@@ -1,36 +0,0 @@
-"""creates user model
-
-Revision ID: aa43e91c1116
-Revises: 
-Create Date: 2026-01-10 15:03:04.310790
-
-"""
-from alembic import op
-import sqlalchemy as sa
-
-
-# revision identifiers, used by Alembic.
-revision = 'aa43e91c1116'
-down_revision = None
-branch_labels = None
-depends_on = None
-
-
-def upgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.create_table('users',
-    sa.Column('user_id', sa.Integer(), nullable=False),
-    sa.Column('email', sa.String(length=20), nullable=True),
-    sa.Column('password_hash', sa.String(length=200), nullable=True),
-    sa.Column('role', sa.Enum('PATIENT', 'HEALTHCARE_WORKER', 'ADMIN', name='userrole'), nullable=True),
-    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
-    sa.Column('last_login', sa.DateTime(), nullable=True),
-    sa.PrimaryKeyConstraint('user_id')
-    )
-    # ### end Alembic commands ###
-
-
-def downgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_table('users')
-    # ### end Alembic commands ###
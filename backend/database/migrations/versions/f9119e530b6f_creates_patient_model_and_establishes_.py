@@ -1,38 +0,0 @@
-"""creates patient model and establishes relationship to the user
-
-Revision ID: f9119e530b6f
-Revises: 45892d57062e
-Create Date: 2026-01-10 15:32:03.045611
-
-"""
-from alembic import op
-import sqlalchemy as sa
-
-
-# revision identifiers, used by Alembic.
-revision = 'f9119e530b6f'
-down_revision = '45892d57062e'
-branch_labels = None
-depends_on = None
-
-
-def upgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.create_table('patients',
-    sa.Column('patient_id', sa.Integer(), nullable=False),
-    sa.Column('national_id_encrypted', sa.String(length=50), nullable=True),
-    sa.Column('first_name', sa.String(length=18), nullable=True),
-    sa.Column('last_name', sa.String(length=18), nullable=True),
-    sa.Column('date_of_birth', sa.Date(), nullable=True),
-    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
-    sa.Column('user_id', sa.Integer(), nullable=True),
-    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
-    sa.PrimaryKeyConstraint('patient_id')
-    )
-    # ### end Alembic commands ###
-
-
-def downgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_table('patients')
-    # ### end Alembic commands ###
@@ -4,8 +4,10 @@ from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy_serializer import SerializerMixin
 from sqlalchemy import MetaData
 
+from .routing import RoutingSession
+
 metadata = MetaData()
-db = SQLAlchemy(metadata=metadata)
+db = SQLAlchemy(metadata=metadata, session_options={"class_": RoutingSession})
 
 
 class UserRole(Enum):
@@ -38,6 +40,26 @@ class Status(Enum):
     REVOKED = "revoked"
 
 
+class ConsentEventType(Enum):
+    CREATED = "created"
+    REVOKED = "revoked"
+    EXPIRED = "expired"
+
+
+class ExportStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
 class User(db.Model, SerializerMixin):
     __tablename__ = "users"
 
@@ -47,6 +69,7 @@ class User(db.Model, SerializerMixin):
     role = db.Column(db.Enum(UserRole), default=UserRole.PATIENT)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     last_login = db.Column(db.DateTime, nullable=True)
+    login_count = db.Column(db.Integer, nullable=False, server_default="0")
 
     patient = db.relationship("Patient", back_populates="user", uselist=False)
     healthcare_worker = db.relationship("HealthCareWorker", back_populates="user", uselist=False)
@@ -160,6 +183,15 @@ class ConsentRecord(db.Model, SerializerMixin):
     facility = db.relationship("HealthCareFacility", back_populates="consent_records", uselist=False)
     patient = db.relationship("Patient", back_populates="consent_records", uselist=False)
 
+    __table_args__ = (
+        # expiry sweep: active consents past expires_at
+        db.Index("ix_consent_records_status_expires_at", "status", "expires_at"),
+        # a facility's consents with a given status, already in consent_id (cursor) order
+        db.Index("ix_consent_records_facility_status", "facility_id", "status", "consent_id"),
+        # covers every listing filter, so counts never read the table rows
+        db.Index("ix_consent_records_facility_counts", "facility_id", "status", "consent_type", "expires_at"),
+    )
+
     serialize_rules = (
         "-patient.consent_records",
         "-patient.access_logs",
@@ -188,6 +220,11 @@ class AccessLog(db.Model, SerializerMixin):
     patient = db.relationship("Patient", back_populates="access_logs", uselist=False)
     healthcare_worker = db.relationship("HealthCareWorker", back_populates="access_logs", uselist=False)
 
+    __table_args__ = (
+        # a patient's logs in log_id (cursor) order, for history pages, exports and streams
+        db.Index("ix_access_logs_patient_id_log_id", "patient_id", "log_id"),
+    )
+
     serialize_rules = (
         "-patient.access_logs",
         "-patient.consent_records",
@@ -198,4 +235,102 @@ class AccessLog(db.Model, SerializerMixin):
         "-healthcare_worker.user.patient",
         "-healthcare_worker.healthcare_facility.healthcare_workers",
         "-healthcare_worker.healthcare_facility.consent_records",
-    )
\ No newline at end of file
+    )
+
+
+class ConsentEvent(db.Model, SerializerMixin):
+    __tablename__ = "consent_events"
+
+    # seq increases by one per event within a facility, in commit order;
+    # clients resume the feed from the last seq they saw
+    facility_id = db.Column(db.String(20), primary_key=True)
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    event_type = db.Column(db.Enum(ConsentEventType), nullable=False)
+    status = db.Column(db.Enum(Status))
+    occurred_at = db.Column(db.DateTime, nullable=False)
+
+    # no foreign key: with sharding enabled consents live on other databases
+    consent_id = db.Column(db.Integer, nullable=False)
+    patient_id = db.Column(db.String(20))
+
+
+class ConsentFeedHead(db.Model):
+    __tablename__ = "consent_feed_heads"
+
+    # Last seq handed out per facility. Bumping it row-locks the facility until
+    # commit, so seqs become visible in order and without gaps.
+    facility_id = db.Column(db.String(20), primary_key=True)
+    seq = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ExportJob(db.Model, SerializerMixin):
+    __tablename__ = "export_jobs"
+
+    # random, so ids can't be guessed from another admin's job
+    job_id = db.Column(db.String(32), primary_key=True)
+    requested_by = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
+    format = db.Column(db.String(10), nullable=False)
+    filters = db.Column(db.JSON)
+    status = db.Column(db.Enum(ExportStatus), nullable=False, default=ExportStatus.QUEUED)
+    rows_total = db.Column(db.Integer)
+    rows_written = db.Column(db.Integer, nullable=False, default=0)
+    file_size = db.Column(db.BigInteger)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
+class RegistryDemographic(db.Model):
+    __tablename__ = "registry_demographics"
+
+    # Read-only copy of the national registry, kept current by the registry
+    # sync worker from the registry's change feed. National IDs are only kept
+    # as a keyed digest, which is enough to look a record up.
+    patient_id = db.Column(db.String(20), primary_key=True)
+    national_id_digest = db.Column(db.String(64), nullable=False, index=True)
+    first_name = db.Column(db.String(18))
+    last_name = db.Column(db.String(18))
+    date_of_birth = db.Column(db.Date)
+    gender = db.Column(db.String(6))
+    phone = db.Column(db.String(12))
+    email = db.Column(db.Text)
+    address = db.Column(db.Text)
+    emergency_contact = db.Column(db.Text)
+    # registry feed seq this row was last written from
+    seq = db.Column(db.Integer, nullable=False)
+
+
+class RegistrySyncState(db.Model):
+    __tablename__ = "registry_sync_state"
+
+    # A single row: how far the mirror has read the registry feed. A different
+    # epoch (the registry log was wiped) or digest key means starting over.
+    id = db.Column(db.Integer, primary_key=True)
+    epoch = db.Column(db.Integer, nullable=False)
+    seq = db.Column(db.Integer, nullable=False, default=0)
+    digest_key_id = db.Column(db.String(16), nullable=False)
+    synced_at = db.Column(db.DateTime)
+
+
+class Job(db.Model):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # what workers poll for: queued jobs that are due
+        db.Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
+    job_id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON)
+    status = db.Column(db.Enum(JobStatus), nullable=False, default=JobStatus.QUEUED)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    run_at = db.Column(db.DateTime, nullable=False)
+    # set on scheduled runs ("<kind>@<slot>"), so only one worker enqueues each
+    dedupe_key = db.Column(db.String(100), unique=True)
+    locked_by = db.Column(db.String(64))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    finished_at = db.Column(db.DateTime)
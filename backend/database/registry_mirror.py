@@ -0,0 +1,204 @@
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, insert, select
+
+from utils.security_utils import digest_key_id, national_id_digest
+
+from .models import RegistryDemographic, RegistrySyncState, db
+
+logger = logging.getLogger(__name__)
+
+STATE_ID = 1
+# Changes requested per page of the registry feed
+SYNC_PAGE_SIZE = 1000
+# Seconds to wait on the registry for one page
+REGISTRY_TIMEOUT = 10
+FIELDS = (
+    "first_name", "last_name", "date_of_birth", "gender",
+    "phone", "email", "address", "emergency_contact",
+)
+_COLUMNS = (RegistryDemographic.patient_id, *(getattr(RegistryDemographic, name) for name in FIELDS))
+
+
+def _fetch_changes(after, limit=SYNC_PAGE_SIZE):
+    # imported here so the app doesn't load requests until it syncs
+    import requests
+
+    response = requests.get(
+        f"{os.getenv('MOCK_REGISTRY_URL', 'http://127.0.0.1:8080')}/api/registry/changes",
+        params={"after": after, "limit": limit},
+        headers={"X-API-Key": os.getenv("REGISTRY_API_KEY")},
+        timeout=REGISTRY_TIMEOUT,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def _position(state):
+    return None if state is None else (state.epoch, state.seq, state.digest_key_id)
+
+
+def _row(change):
+    record = change["record"]
+    row = {name: record.get(name) for name in FIELDS}
+    row["patient_id"] = change["patient_id"]
+    row["national_id_digest"] = national_id_digest(record["national_id"] or "")
+    row["seq"] = change["seq"]
+    if row["date_of_birth"]:
+        row["date_of_birth"] = date.fromisoformat(row["date_of_birth"])
+    return row
+
+
+class RegistryMirror:
+    """Local, read-only copy of the national registry's demographics.
+
+    A background thread in each worker process reads the registry's change
+    feed every `interval` seconds and applies it to registry_demographics.
+    Pages are fetched without holding anything, then applied under the
+    registry_sync_state row lock only if the cursor hasn't moved in the
+    meantime; a worker that finds it moved drops its page and reads on from
+    the new cursor. Consent checks then look
+    patients up with one indexed read instead of an HTTP round trip, and go
+    to the registry only for national IDs the mirror doesn't have yet.
+
+    When the registry's log is wiped (a new epoch) or CRYPTOGRAPHY_KEY is
+    rotated (stored digests no longer match), the mirror is emptied and
+    rebuilt from the start of the feed; lookups fall back to the registry
+    until it has caught up.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval if interval is not None else float(os.getenv("REGISTRY_SYNC_INTERVAL", "30"))
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        app.cli.add_command(registry_cli)
+        if app.config.get("REGISTRY_MIRROR"):
+            # started on the first request rather than here, so `flask db`
+            # and other commands don't sync
+            app.before_request(self.start)
+
+    def enabled(self):
+        return bool(current_app.config.get("REGISTRY_MIRROR"))
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                app = current_app._get_current_object()
+                self._thread = threading.Thread(target=self._run, args=(app,), name="registry-sync", daemon=True)
+                self._thread.start()
+
+    def _run(self, app):
+        while True:
+            # a fresh app context per pass, and with it a fresh session
+            with app.app_context():
+                try:
+                    self.sync()
+                except Exception:
+                    logger.exception("Registry sync failed; retrying in %ss", self.interval)
+            time.sleep(self.interval)
+
+    def _sync_state(self, lock=False):
+        stmt = select(RegistrySyncState).where(RegistrySyncState.id == STATE_ID)
+        stmt = stmt.execution_options(populate_existing=True)
+        if lock:
+            stmt = stmt.with_for_update()
+        return db.session.execute(stmt).scalar_one_or_none()
+
+    def _sync_page(self):
+        key_id = digest_key_id()
+        state = self._sync_state()
+        seen = _position(state)
+        after = state.seq if state is not None and state.digest_key_id == key_id else 0
+        # end the read so the registry calls below hold nothing
+        db.session.commit()
+
+        page = _fetch_changes(after)
+        rebuild = seen is None or seen[2] != key_id or seen[0] != page["epoch"]
+        if rebuild and after:
+            page = _fetch_changes(0)
+
+        state = self._sync_state(lock=True)
+        if _position(state) != seen:
+            # another worker applied a page meanwhile; read on from where it left off
+            db.session.rollback()
+            return 0, True
+
+        if rebuild:
+            logger.info("Rebuilding the registry mirror from the start of the feed")
+            db.session.execute(delete(RegistryDemographic))
+            if state is None:
+                state = RegistrySyncState(id=STATE_ID)
+                db.session.add(state)
+            state.epoch, state.seq, state.digest_key_id = page["epoch"], 0, key_id
+
+        changes = page["changes"]
+        if changes:
+            connection = db.session.connection()
+            connection.execute(delete(RegistryDemographic).where(
+                RegistryDemographic.patient_id.in_({change["patient_id"] for change in changes})
+            ))
+            # the feed sends a patient's current record with each of their
+            # changes, so the last one of a page stands for all of them
+            rows = {change["patient_id"]: change for change in changes}
+            upserts = [_row(change) for change in rows.values() if change["record"] is not None]
+            if upserts:
+                connection.execute(insert(RegistryDemographic), upserts)
+        state.seq = page["cursor"]
+        state.synced_at = datetime.now()
+        db.session.commit()
+        return len(changes), page["has_more"]
+
+    def sync(self, max_pages=None):
+        """Apply registry changes until the feed is drained; returns how many were read."""
+        applied = pages = 0
+        while max_pages is None or pages < max_pages:
+            try:
+                count, has_more = self._sync_page()
+            except Exception:
+                # don't sit on the sync state lock after a failed page
+                db.session.rollback()
+                raise
+            applied += count
+            pages += 1
+            if not has_more:
+                break
+        return applied
+
+    def lookup(self, national_id):
+        """The registry record for a national ID as the registry returns it, or None."""
+        row = db.session.execute(
+            select(*_COLUMNS).where(RegistryDemographic.national_id_digest == national_id_digest(national_id))
+        ).first()
+        if row is None:
+            return None
+        return {"patient_id": row.patient_id, "national_id": national_id, **{name: getattr(row, name) for name in FIELDS}}
+
+
+registry_mirror = RegistryMirror()
+
+
+registry_cli = AppGroup("registry", help="Manage the local registry mirror.")
+
+
+@registry_cli.command("sync")
+def sync_registry():
+    """Read the registry change feed into the local mirror until it is drained."""
+    click.echo(f"Applied {registry_mirror.sync()} registry changes")
+
+
+def registry_demographics(national_id):
+    """Registry data for a national ID from the mirror, or None when it isn't there (or is off)."""
+    if not national_id or not registry_mirror.enabled():
+        return None
+    return registry_mirror.lookup(national_id)
@@ -0,0 +1,159 @@
+import logging
+import os
+import random
+import time
+from functools import wraps
+
+from flask import g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = "replica_"
+# Carries the time of a client's last write, so its next reads can go to the
+# primary whichever worker process serves them
+LAST_WRITE_HEADER = "X-Last-Write"
+
+
+def replica_binds(uris):
+    """SQLALCHEMY_BINDS entries for a comma-separated list of replica URIs."""
+    uris = [uri.strip() for uri in (uris or "").split(",") if uri.strip()]
+    return {f"{REPLICA_BIND_PREFIX}{i}": uri for i, uri in enumerate(uris)}
+
+
+def _replica_lag(engine):
+    # Seconds the replica is behind the primary; None when replication is broken
+    with engine.connect() as conn:
+        if engine.dialect.name in ("mysql", "mariadb"):
+            row = conn.execute(text("SHOW SLAVE STATUS")).mappings().first()
+            if row is None:
+                # not configured as a replica (e.g. a second local instance)
+                return 0
+            return row["Seconds_Behind_Master"]
+        conn.execute(text("SELECT 1"))
+        return 0
+
+
+class ReplicaRouter:
+    """Picks a replica engine for read-only requests.
+
+    Each replica's lag is probed at most once per REPLICA_LAG_CHECK_INTERVAL
+    seconds. Replicas that are unreachable or more than REPLICA_MAX_LAG seconds
+    behind are skipped; with none left, reads fall back to the primary.
+    Responses to requests that wrote carry the write time in LAST_WRITE_HEADER;
+    clients that send it back read from the primary for REPLICA_MAX_LAG
+    seconds, since a replica may not have their write yet. The time travels
+    with the client because its next request may land in another process.
+    """
+
+    def __init__(self):
+        self.max_lag = float(os.getenv("REPLICA_MAX_LAG", "5"))
+        self.check_interval = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "5"))
+        self.probe = _replica_lag
+        self._lag = {}
+
+    def init_app(self, app):
+        app.after_request(_stamp_last_write)
+
+    def _lag_for(self, key, engine):
+        now = time.monotonic()
+        checked_at, lag = self._lag.get(key, (None, None))
+        if checked_at is None or now - checked_at > self.check_interval:
+            try:
+                lag = self.probe(engine)
+            except Exception:
+                logger.warning("Replica %s is unreachable, reading from the primary", key, exc_info=True)
+                lag = None
+            self._lag[key] = (now, lag)
+        return lag
+
+    def choose(self, engines, wrote_at=None):
+        """Return a replica engine fit to serve this read, or None for the primary."""
+        replicas = [key for key in engines if isinstance(key, str) and key.startswith(REPLICA_BIND_PREFIX)]
+        if not replicas:
+            return None
+
+        if wrote_at is not None and self.wrote_recently(wrote_at):
+            return None
+
+        healthy = []
+        for key in replicas:
+            lag = self._lag_for(key, engines[key])
+            if lag is not None and lag <= self.max_lag:
+                healthy.append(key)
+        return engines[random.choice(healthy)] if healthy else None
+
+    def wrote_recently(self, wrote_at):
+        # wall-clock time, as the write may have gone through another process
+        # or host; past max_lag every usable replica has it. The bound on both
+        # sides also keeps a bogus future time from pinning a client to the primary.
+        return abs(time.time() - wrote_at) <= self.max_lag
+
+
+replica_router = ReplicaRouter()
+
+
+def _client_last_write():
+    if not has_request_context():
+        return None
+    try:
+        return float(request.headers[LAST_WRITE_HEADER])
+    except (KeyError, ValueError):
+        return None
+
+
+def _stamp_last_write(response):
+    wrote_at = g.get("last_write")
+    if wrote_at is not None:
+        response.headers[LAST_WRITE_HEADER] = f"{wrote_at:.3f}"
+    return response
+
+
+def replica_reads(fn):
+    """Let a read-only resource method serve its queries from a replica."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        g.replica_reads = True
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(Session):
+    """Sends reads from `replica_reads` methods to a replica, everything else to the primary.
+
+    Once the session has written anything it stays on the primary, so a
+    request always reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and has_app_context()
+            and g.get("replica_reads")
+            and not self._flushing
+            and not (self.new or self.dirty or self.deleted)
+            and not self.info.get("wrote")
+        ):
+            if "replica" not in g:
+                g.replica = replica_router.choose(self._db.engines, _client_last_write())
+            if g.replica is not None:
+                return g.replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_written(session, flush_context):
+    session.info["wrote"] = True
+    session.info["uncommitted_write"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _record_write(session):
+    if session.info.pop("uncommitted_write", False) and has_request_context():
+        g.last_write = time.time()
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard_written(session):
+    session.info.pop("uncommitted_write", None)
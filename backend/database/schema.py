@@ -0,0 +1,69 @@
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from flask import current_app
+from sqlalchemy import inspect, text
+
+from .models import db
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+_REVISION = re.compile(r"^(revision|down_revision)\s*=\s*(.+)$", re.MULTILINE)
+
+
+def init_migrate(app):
+    # Flask-Migrate pulls in Alembic, so it is only set up when a command needs it
+    from flask_migrate import Migrate
+    if "migrate" not in app.extensions:
+        Migrate(app, db, directory=str(MIGRATIONS_DIR))
+
+
+@lru_cache(maxsize=1)
+def script_heads():
+    """Revision ids no other migration builds on, read straight from the version files."""
+    revisions, parents = set(), set()
+    for path in (MIGRATIONS_DIR / "versions").glob("*.py"):
+        for key, value in _REVISION.findall(path.read_text()):
+            # down_revision is None, 'abc' or a tuple of them for merges
+            ids = set(re.findall(r"'([0-9a-f]+)'", value))
+            (revisions if key == "revision" else parents).update(ids)
+    return frozenset(revisions - parents)
+
+
+def database_revisions(engine=None):
+    engine = engine or db.engine
+    with engine.connect() as conn:
+        if not inspect(conn).has_table("alembic_version"):
+            return frozenset()
+        return frozenset(conn.execute(text("SELECT version_num FROM alembic_version")).scalars())
+
+
+def schema_is_current():
+    return database_revisions() == script_heads()
+
+
+def upgrade_schema():
+    """Upgrade the primary database to the latest migration.
+
+    One query answers whether there is anything to do, so Alembic is only
+    loaded when there is. Returns False when the schema was already current.
+    """
+    if schema_is_current():
+        return False
+    from flask_migrate import upgrade
+    init_migrate(current_app._get_current_object())
+    upgrade()
+    return True
+
+
+def upgrade_database(uri):
+    """Upgrade the database at `uri` to the latest migration, for scripts that run without the web app."""
+    from flask import Flask
+    from flask_migrate import upgrade
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = uri
+    db.init_app(app)
+    init_migrate(app)
+    with app.app_context():
+        upgrade()
@@ -0,0 +1,280 @@
+import bisect
+import hashlib
+import heapq
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import click
+from flask import current_app, g
+from flask.cli import AppGroup
+from sqlalchemy import BigInteger, Column, MetaData, String, Table, event, func, insert, inspect, select, update
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.sql import operators, visitors
+
+from .models import AccessLog, ConsentRecord, Patient, db
+from .routing import RoutingSession
+from .timeouts import current_statement_timeout
+
+SHARD_BIND_PREFIX = "shard_"
+# Everything that isn't patient-scoped stays on the primary database
+GLOBAL_SHARD = "global"
+SHARDED_MODELS = (Patient, ConsentRecord, AccessLog)
+SHARDED_TABLES = {model.__tablename__ for model in SHARDED_MODELS}
+# Points per shard on the hash ring; more points spread patients more evenly
+RING_POINTS = 64
+
+_executor = ThreadPoolExecutor(thread_name_prefix="shard-fan-out")
+
+# Last striped id handed out per table, on each shard. Bumping a row locks it
+# until commit, so concurrent inserts on backends without an auto-increment
+# stride can't be given the same id.
+_id_tickets = Table(
+    "shard_id_tickets", MetaData(),
+    Column("table_name", String(64), primary_key=True),
+    Column("last_id", BigInteger, nullable=False),
+)
+
+
+def shard_binds(uris):
+    """SQLALCHEMY_BINDS entries for a comma-separated list of shard URIs."""
+    uris = [uri.strip() for uri in (uris or "").split(",") if uri.strip()]
+    return {f"{SHARD_BIND_PREFIX}{i}": uri for i, uri in enumerate(uris)}
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+@lru_cache(maxsize=8)
+def _ring(shards):
+    points = sorted((_hash(f"{shard}#{i}"), shard) for shard in shards for i in range(RING_POINTS))
+    return [p for p, _ in points], [s for _, s in points]
+
+
+def shard_for(patient_id, shards=None):
+    """Consistent-hash placement: adding a shard moves about 1/N of the patients."""
+    hashes, owners = _ring(tuple(shards or shard_ids()))
+    i = bisect.bisect(hashes, _hash(str(patient_id))) % len(hashes)
+    return owners[i]
+
+
+def shard_ids():
+    return sorted(key for key in db.engines if isinstance(key, str) and key.startswith(SHARD_BIND_PREFIX))
+
+
+def _is_sharded(mapper):
+    return mapper is not None and mapper.class_ in SHARDED_MODELS
+
+
+def _reads_sharded_table(context):
+    if context.bind_mapper is not None:
+        return _is_sharded(context.bind_mapper)
+    # column-only selects such as max(AccessLog.log_id) carry no mapper
+    get_froms = getattr(context.statement, "get_final_froms", None)
+    return get_froms is not None and any(getattr(f, "name", None) in SHARDED_TABLES for f in get_froms())
+
+
+def _patient_ids_in(clause, params=None):
+    # patient_id values from `patient_id = x` / `patient_id IN (...)` criteria;
+    # a bindparam() without a value takes it from the execute parameters
+    found = []
+    params = params if isinstance(params, Mapping) else {}
+
+    def value_of(bind):
+        value = bind.effective_value
+        return params.get(bind.key) if value is None else value
+
+    def visit_binary(binary):
+        left, right = binary.left, binary.right
+        if getattr(left, "key", None) != "patient_id" or getattr(left, "table", None) is None \
+                or left.table.name not in SHARDED_TABLES:
+            return
+        if binary.operator is operators.eq and hasattr(right, "effective_value"):
+            found.append(value_of(right))
+        elif binary.operator is operators.in_op and hasattr(right, "effective_value"):
+            found.extend(value_of(right) or ())
+
+    if clause is not None:
+        visitors.traverse(clause, {}, {"binary": visit_binary})
+    return found
+
+
+class ShardedRoutingSession(ShardedSession, RoutingSession):
+    """RoutingSession that places patient-scoped rows on shards by patient_id.
+
+    Patients, consents and access logs live on the shard that owns their
+    patient_id; users, workers, facilities and the consent feed stay on the
+    primary (and its replicas). Queries that pin a patient_id go to one shard,
+    other queries on sharded tables visit every shard.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(
+            shard_chooser=self._shard_chooser,
+            identity_chooser=self._identity_chooser,
+            execute_chooser=self._execute_chooser,
+            **kwargs,
+        )
+
+    def _shard_chooser(self, mapper, instance, clause=None, **kw):
+        if not _is_sharded(mapper):
+            return GLOBAL_SHARD
+        if instance is not None and instance.patient_id is not None:
+            return shard_for(instance.patient_id)
+        patient_ids = _patient_ids_in(clause)
+        if patient_ids:
+            return shard_for(patient_ids[0])
+        raise ValueError(f"Can't place {mapper.class_.__name__} on a shard without a patient_id")
+
+    def _identity_chooser(self, mapper, primary_key, *, lazy_loaded_from, **kw):
+        if not _is_sharded(mapper):
+            return [GLOBAL_SHARD]
+        if mapper.class_ is Patient:
+            return [shard_for(primary_key[0])]
+        if lazy_loaded_from is not None and lazy_loaded_from.identity_token not in (None, GLOBAL_SHARD):
+            # a patient's consents and logs live on the patient's shard
+            return [lazy_loaded_from.identity_token]
+        return shard_ids()
+
+    def _execute_chooser(self, context):
+        if not _reads_sharded_table(context):
+            return [GLOBAL_SHARD]
+        if context.is_select and context.lazy_loaded_from is not None \
+                and context.lazy_loaded_from.identity_token not in (None, GLOBAL_SHARD):
+            return [context.lazy_loaded_from.identity_token]
+        patient_ids = _patient_ids_in(getattr(context.statement, "whereclause", None), context.parameters)
+        if patient_ids:
+            return sorted({shard_for(patient_id) for patient_id in patient_ids})
+        return shard_ids()
+
+    def get_bind(self, mapper=None, *, shard_id=None, instance=None, clause=None, bind=None, **kw):
+        if bind is not None:
+            return bind
+        if mapper is not None:
+            mapper = inspect(mapper)
+        if shard_id is None:
+            shard_id = self._choose_shard_and_assign(mapper, instance, clause=clause) if mapper is not None else GLOBAL_SHARD
+        if shard_id == GLOBAL_SHARD:
+            return RoutingSession.get_bind(self, mapper=mapper, clause=clause, **kw)
+        return self._db.engines[shard_id]
+
+
+def fan_out(stmt, serialize, key, reverse=False):
+    """Run a select on every shard in parallel and merge the serialized rows.
+
+    `stmt` must be ordered by `key` (descending if `reverse`), so each shard's
+    rows come back sorted and only need merging. Without shards it runs on
+    db.session as usual.
+    """
+    shards = shard_ids()
+    if not shards:
+        return [serialize(row) for row in db.session.execute(stmt).scalars()]
+
+    app = current_app._get_current_object()
+    timeout = current_statement_timeout()
+
+    def run(shard_id):
+        # each thread gets its own app context, and with it its own session
+        with app.app_context():
+            if timeout:
+                g.statement_timeout = timeout
+            rows = db.session.execute(stmt, bind_arguments={"shard_id": shard_id}).scalars()
+            return [(key(row), serialize(row)) for row in rows]
+
+    results = list(_executor.map(run, shards))
+    return [data for _, data in heapq.merge(*results, key=lambda pair: pair[0], reverse=reverse)]
+
+
+def _stripe_ids(shards, engines):
+    # consent_id and log_id must stay unique across shards: shard k hands out
+    # ids k+1, k+1+N, k+1+2N, ...
+    stripes = {engines[shard]: (i, len(shards)) for i, shard in enumerate(shards)}
+
+    for engine, (offset, step) in stripes.items():
+        if engine.dialect.name in ("mysql", "mariadb"):
+            @event.listens_for(engine, "connect")
+            def _set_increment(dbapi_connection, connection_record, offset=offset, step=step):
+                cursor = dbapi_connection.cursor()
+                cursor.execute(f"SET SESSION auto_increment_increment = {step}, auto_increment_offset = {offset + 1}")
+                cursor.close()
+
+    def _assign_id(mapper, connection, target):
+        # other backends (e.g. SQLite in tests) have no auto-increment stride
+        stripe = stripes.get(connection.engine)
+        column = mapper.primary_key[0]
+        if stripe is None or connection.dialect.name in ("mysql", "mariadb") \
+                or getattr(target, column.key) is not None:
+            return
+        offset, step = stripe
+        ticket = _id_tickets.c.table_name == column.table.name
+        bump = update(_id_tickets).where(ticket).values(last_id=_id_tickets.c.last_id + step)
+        if not connection.execute(bump).rowcount:
+            # first id for the table on this shard: start after the rows already there.
+            # Two transactions may both get here; one inserts and both then bump.
+            highest = connection.execute(select(func.max(column))).scalar() or 0
+            first = highest + ((offset + 1 - highest) % step or step)
+            connection.execute(
+                insert(_id_tickets).prefix_with("OR IGNORE", dialect="sqlite")
+                .values(table_name=column.table.name, last_id=first - step)
+            )
+            connection.execute(bump)
+        setattr(target, column.key, connection.execute(select(_id_tickets.c.last_id).where(ticket)).scalar_one())
+
+    for model in (ConsentRecord, AccessLog):
+        event.listen(model, "before_insert", _assign_id)
+
+
+def shard_metadata():
+    """The sharded tables, minus foreign keys to tables that stay on the primary, and the id tickets."""
+    metadata = MetaData()
+    _id_tickets.to_metadata(metadata)
+    for name in SHARDED_TABLES:
+        table = db.metadata.tables[name].to_metadata(metadata)
+        for constraint in list(table.foreign_key_constraints):
+            if constraint.elements[0].target_fullname.split(".")[0] not in SHARDED_TABLES:
+                table.constraints.discard(constraint)
+                table.foreign_keys.difference_update(constraint.elements)
+                for column in constraint.columns:
+                    column.foreign_keys.difference_update(constraint.elements)
+    return metadata
+
+
+shards_cli = AppGroup("shards", help="Manage patient shards.")
+
+
+@shards_cli.command("create")
+def create_shards():
+    """Create the patient-scoped tables on every shard."""
+    metadata = shard_metadata()
+    for shard in shard_ids():
+        metadata.create_all(db.engines[shard])
+        click.echo(f"{shard}: {', '.join(sorted(metadata.tables))}")
+
+
+@shards_cli.command("locate")
+@click.argument("patient_id")
+def locate_patient(patient_id):
+    """Print the shard that owns PATIENT_ID."""
+    click.echo(shard_for(patient_id))
+
+
+class Sharding:
+    """Optional horizontal sharding of patients, consents and access logs.
+
+    Enabled when SQLALCHEMY_BINDS contains shard_* binds (see shard_binds and
+    the SHARD_URIS setting); otherwise the app runs on a single database.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.cli.add_command(shards_cli)
+        with app.app_context():
+            shards = shard_ids()
+            if not shards:
+                return
+            _stripe_ids(shards, db.engines)
+        db.session.session_factory.class_ = ShardedRoutingSession
@@ -0,0 +1,187 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from utils.shared_table import SharedTable
+
+from .models import HealthCareFacility, HealthCareWorker, User, UserRole, db
+
+logger = logging.getLogger(__name__)
+
+# Seconds between the loader's checks for reload requests, and between the
+# other processes' attempts to take over as loader
+LOADER_POLL_INTERVAL = 1.0
+
+WorkerRef = namedtuple("WorkerRef", ["worker_id", "facility_id"])
+
+_FACILITY_COLUMNS = (
+    HealthCareFacility.facility_id,
+    HealthCareFacility.name,
+    HealthCareFacility.facility_type,
+    HealthCareFacility.license_number,
+    HealthCareFacility.location,
+)
+
+
+def _encode(value):
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+class SharedDirectory:
+    """Facilities and worker→facility assignments in memory shared by every worker process.
+
+    One process at a time holds an flock on a lock file and is the loader:
+    it reads healthcare_facilities and the healthcare workers into a
+    SharedTable every `ttl` seconds, and within LOADER_POLL_INTERVAL
+    whenever a process has committed a change to a facility, a worker or a
+    user's role. The other processes only read, without locks, and try for
+    the lock every LOADER_POLL_INTERVAL so one of them takes over if the
+    loader exits. So each process neither keeps nor warms its own copy.
+
+    Lookups return None when the table isn't loaded yet, or was loaded
+    more than twice `ttl` ago, e.g. by a previous run of the app; callers
+    then go to the database.
+    """
+
+    def __init__(self, size=None, ttl=None):
+        self.size = size if size is not None else int(os.getenv("SHARED_CACHE_SIZE", str(8 * 1024 * 1024)))
+        self.ttl = ttl if ttl is not None else float(os.getenv("FACILITY_DIRECTORY_TTL", "300"))
+        self._lock = threading.Lock()
+        self._table = None
+        self._thread = None
+
+    def init_app(self, app):
+        if app.config.get("SHARED_CACHE"):
+            # started on the first request, like the registry mirror
+            app.before_request(self.start)
+
+    def _name(self, app):
+        # one segment per database, so two apps on a host don't share entries
+        uri = app.config["SQLALCHEMY_DATABASE_URI"] or ""
+        return f"healthhub-{hashlib.sha1(uri.encode('utf-8')).hexdigest()[:12]}"
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                app = current_app._get_current_object()
+                name = self._name(app)
+                self._table = SharedTable(name, self.size)
+                self._thread = threading.Thread(
+                    target=self._run, args=(app, os.path.join(tempfile.gettempdir(), f"{name}.lock")),
+                    name="shared-directory", daemon=True,
+                )
+                self._thread.start()
+
+    def _run(self, app, lock_path):
+        lock_file = open(lock_path, "a")
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                time.sleep(LOADER_POLL_INTERVAL)
+
+        logger.info("Process %s is loading the shared directory", os.getpid())
+        # held until the process exits, which releases it for another process
+        seen_requests = None
+        loaded_at = 0
+        while True:
+            requests = self._table.reload_requests
+            if requests != seen_requests or time.monotonic() - loaded_at > self.ttl:
+                # a fresh app context per load, and with it a fresh session
+                with app.app_context():
+                    try:
+                        self._load()
+                        seen_requests, loaded_at = requests, time.monotonic()
+                    except Exception:
+                        logger.exception("Loading the shared directory failed; retrying in %ss", LOADER_POLL_INTERVAL)
+                    finally:
+                        db.session.remove()
+            time.sleep(LOADER_POLL_INTERVAL)
+
+    def _load(self):
+        entries = {}
+        for facility_id, name, facility_type, license_number, location in db.session.execute(select(*_FACILITY_COLUMNS)):
+            value = _encode([facility_id, name, facility_type.value if facility_type else None, license_number, location])
+            entries[b"f:" + facility_id.encode("utf-8")] = value
+            if name is not None:
+                entries[b"n:" + name.encode("utf-8")] = value
+        workers = db.session.execute(
+            select(HealthCareWorker.user_id, HealthCareWorker.worker_id, HealthCareWorker.facility_id)
+            .join(User, User.user_id == HealthCareWorker.user_id)
+            .where(User.role == UserRole.HEALTHCARE_WORKER)
+        )
+        for user_id, worker_id, facility_id in workers:
+            entries[f"w:{user_id}".encode("utf-8")] = _encode([worker_id, facility_id])
+        self._table.publish(entries, time.time())
+
+    def _get(self, key):
+        table = self._table
+        if table is None or time.time() - table.loaded_at > 2 * self.ttl:
+            return None
+        value = table.get(key.encode("utf-8"))
+        return json.loads(value) if value is not None else None
+
+    def ready(self):
+        table = self._table
+        return table is not None and table.seq > 0 and time.time() - table.loaded_at <= 2 * self.ttl
+
+    def facility(self, facility_id):
+        """[facility_id, name, facility_type value, license_number, location], or None."""
+        return self._get(f"f:{facility_id}")
+
+    def facility_by_name(self, name):
+        return self._get(f"n:{name}")
+
+    def worker(self, user_id):
+        """The WorkerRef of a healthcare worker's user_id, or None when it isn't known here."""
+        value = self._get(f"w:{user_id}")
+        return WorkerRef(*value) if value is not None else None
+
+    def request_reload(self):
+        if self._table is not None:
+            self._table.request_reload()
+
+
+shared_directory = SharedDirectory()
+
+
+def worker_facility(user_id):
+    """The worker_id and facility_id of a healthcare worker from the shared directory, or None when it's off or doesn't know the user."""
+    if not current_app.config.get("SHARED_CACHE"):
+        return None
+    return shared_directory.worker(user_id)
+
+
+# Reload after any committed change to the rows the directory is built from
+@event.listens_for(Session, "after_flush")
+def _track_directory_changes(session, flush_context):
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, (HealthCareFacility, HealthCareWorker)) or (
+            isinstance(obj, User) and (obj in session.deleted or inspect(obj).attrs.role.history.has_changes())
+        ):
+            session.info["directory_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _request_directory_reload(session):
+    if session.info.pop("directory_changed", False):
+        shared_directory.request_reload()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_directory_changes(session):
+    session.info.pop("directory_changed", None)
@@ -0,0 +1,125 @@
+"""Hot-path lookups as statements built once, with bound parameters.
+
+`db.session.query(User).filter_by(user_id=...)` builds a new statement on
+every call, and SQLAlchemy then walks it to compute the key it looks its
+compiled SQL up by. The statements here are built at import time with
+bindparam() placeholders, so each call only binds values: the cache key is
+computed once per statement and the SQL text never changes, which also keeps
+sqlite3's per-connection cache of prepared statements hitting.
+
+Queries on sharded tables name `patient_id` through a bind parameter;
+sharding.py reads its value from the execute parameters to pick the shard.
+"""
+import threading
+
+from sqlalchemy import bindparam, event, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CacheStats
+
+from .models import ConsentRecord, HealthCareWorker, Patient, User, db
+
+USER_BY_ID = select(User).where(User.user_id == bindparam("user_id")).limit(1)
+USER_BY_EMAIL = select(User).where(User.email == bindparam("email")).limit(1)
+WORKER_BY_USER = select(HealthCareWorker).where(HealthCareWorker.user_id == bindparam("user_id")).limit(1)
+CONSENT_BY_ID = select(ConsentRecord).where(ConsentRecord.consent_id == bindparam("consent_id")).limit(1)
+PATIENT_CONSENT = select(ConsentRecord).where(ConsentRecord.patient_id == bindparam("patient_id")).limit(1)
+PATIENT_FACILITY_CONSENT = select(ConsentRecord).where(
+    ConsentRecord.patient_id == bindparam("patient_id"),
+    ConsentRecord.facility_id == bindparam("facility_id"),
+).limit(1)
+PATIENT_BY_ID = select(Patient).where(Patient.patient_id == bindparam("patient_id")).limit(1)
+
+
+def _first(stmt, **params):
+    return db.session.execute(stmt, params).scalar_one_or_none()
+
+
+def user_by_id(user_id):
+    return _first(USER_BY_ID, user_id=user_id)
+
+
+def user_by_email(email):
+    return _first(USER_BY_EMAIL, email=email)
+
+
+def worker_by_user(user_id):
+    return _first(WORKER_BY_USER, user_id=user_id)
+
+
+def consent_by_id(consent_id):
+    return _first(CONSENT_BY_ID, consent_id=consent_id)
+
+
+def patient_consent(patient_id, facility_id=None):
+    """A consent of the patient's, at `facility_id` when given; which one is unspecified."""
+    if facility_id is None:
+        return _first(PATIENT_CONSENT, patient_id=patient_id)
+    return _first(PATIENT_FACILITY_CONSENT, patient_id=patient_id, facility_id=facility_id)
+
+
+def patient_by_id(patient_id):
+    return _first(PATIENT_BY_ID, patient_id=patient_id)
+
+
+# Each thread counts the statements it runs in its own table, so counting
+# takes no lock; only registering a thread's table does. Tables of threads
+# that have exited are folded into _retired_counts when the next one registers.
+_local = threading.local()
+_registry_lock = threading.Lock()
+_thread_counts = []
+_retired_counts = {}
+
+
+def _counts():
+    counts = getattr(_local, "counts", None)
+    if counts is None:
+        counts = _local.counts = {}
+        with _registry_lock:
+            for entry in [entry for entry in _thread_counts if not entry[0].is_alive()]:
+                _thread_counts.remove(entry)
+                _add_counts(_retired_counts, entry[1])
+            _thread_counts.append((threading.current_thread(), counts))
+    return counts
+
+
+def _add_counts(total, counts):
+    # list() copies a table another thread may be adding an engine to
+    for engine, engine_counts in list(counts.items()):
+        into = total.setdefault(engine, [0] * len(CacheStats))
+        for i, n in enumerate(engine_counts):
+            into[i] += n
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_cache_use(conn, cursor, statement, parameters, context, executemany):
+    if context is None:
+        return
+    counts = _counts()
+    engine_counts = counts.get(conn.engine)
+    if engine_counts is None:
+        engine_counts = counts[conn.engine] = [0] * len(CacheStats)
+    engine_counts[context.cache_hit.value] += 1
+
+
+def statement_cache_stats():
+    """Compiled-statement cache use of this process, per bind ("default" is MARIADB_URI).
+
+    Counts are read while other threads keep adding to them, so they may be a
+    few statements behind.
+    """
+    with _registry_lock:
+        totals = {}
+        _add_counts(totals, _retired_counts)
+        for _, counts in _thread_counts:
+            _add_counts(totals, counts)
+
+    stats = {}
+    for key, engine in db.engines.items():
+        counts = totals.get(engine, [0] * len(CacheStats))
+        stats[key or "default"] = {
+            "hits": counts[CacheStats.CACHE_HIT.value],
+            "misses": counts[CacheStats.CACHE_MISS.value],
+            "uncached": counts[CacheStats.CACHING_DISABLED.value] + counts[CacheStats.NO_CACHE_KEY.value]
+                        + counts[CacheStats.NO_DIALECT_SUPPORT.value],
+        }
+    return stats
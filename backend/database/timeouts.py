@@ -0,0 +1,109 @@
+"""Per-resource limits on how long a single query may run.
+
+A resource method marked `@statement_timeout(seconds)` has every SELECT it
+runs cut off after that many seconds: MariaDB is asked to abort it with
+`SET STATEMENT max_statement_time=... FOR`, and on SQLite a progress
+handler interrupts it. Either way the request ends with a 503
+"query_timeout" response rather than holding its connection and worker
+until the query finishes. Writes are never cut off half way.
+
+Set STATEMENT_TIMEOUTS=0 to turn the limits off.
+"""
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.exceptions import ServiceUnavailable
+
+logger = logging.getLogger(__name__)
+
+# SQLite virtual machine instructions between checks of the deadline
+SQLITE_PROGRESS_STEPS = 10_000
+# MariaDB's ER_STATEMENT_TIMEOUT
+ER_STATEMENT_TIMEOUT = 1969
+# Retry-After of a query_timeout response
+RETRY_AFTER = 5
+
+
+class QueryTimeout(ServiceUnavailable):
+    """A query ran past its resource's statement timeout."""
+
+    def __init__(self, seconds):
+        response = current_app.json.response({"success": False, "message": "query_timeout", "data": {"timeout": seconds}})
+        response.status_code = self.code
+        response.headers["Retry-After"] = str(RETRY_AFTER)
+        super().__init__(f"A query ran for more than {seconds}s", response=response)
+
+
+def statement_timeout(seconds):
+    """Abort queries of the decorated resource method that run longer than `seconds`."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if current_app.config.get("STATEMENT_TIMEOUTS", True):
+                g.statement_timeout = seconds
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_statement_timeout():
+    return g.get("statement_timeout") if has_app_context() else None
+
+
+@contextmanager
+def without_statement_timeout():
+    """Lift the request's statement timeout, e.g. for a cache load the request happens to trigger."""
+    timeout = g.pop("statement_timeout", None) if has_app_context() else None
+    try:
+        yield
+    finally:
+        if timeout is not None:
+            g.statement_timeout = timeout
+
+
+def _is_select(statement):
+    keyword = statement.lstrip()[:7].split(None, 1)
+    return bool(keyword) and keyword[0].upper() in ("SELECT", "WITH")
+
+
+@event.listens_for(Engine, "before_cursor_execute", retval=True)
+def _apply_statement_timeout(conn, cursor, statement, parameters, context, executemany):
+    timeout = current_statement_timeout()
+    if timeout and not _is_select(statement):
+        timeout = None
+
+    if conn.dialect.name == "sqlite":
+        dbapi_connection = conn.connection.dbapi_connection
+        if timeout:
+            deadline = time.monotonic() + timeout
+            # a true return value interrupts the statement, which also covers fetching its rows
+            dbapi_connection.set_progress_handler(lambda: time.monotonic() > deadline, SQLITE_PROGRESS_STEPS)
+            conn.info["progress_handler"] = True
+        elif conn.info.pop("progress_handler", False):
+            # left over from an earlier statement on this pooled connection
+            dbapi_connection.set_progress_handler(None, 0)
+    elif timeout and getattr(conn.dialect, "is_mariadb", False):
+        statement = f"SET STATEMENT max_statement_time={timeout:g} FOR {statement}"
+    return statement, parameters
+
+
+def _timed_out(exc):
+    if isinstance(exc, sqlite3.OperationalError):
+        return str(exc) == "interrupted"
+    return getattr(exc, "errno", None) == ER_STATEMENT_TIMEOUT or (
+        bool(exc.args) and exc.args[0] == ER_STATEMENT_TIMEOUT
+    )
+
+
+@event.listens_for(Engine, "handle_error")
+def _raise_query_timeout(context):
+    timeout = current_statement_timeout()
+    if timeout and _timed_out(context.original_exception):
+        logger.warning("Query aborted after %ss: %s", timeout, context.statement)
+        raise QueryTimeout(timeout) from context.sqlalchemy_exception
@@ -0,0 +1,148 @@
+import atexit
+import logging
+import os
+import threading
+
+from flask import current_app
+from sqlalchemy import case, func, update
+
+from .models import User, db
+
+logger = logging.getLogger(__name__)
+
+# Rows updated per UPDATE statement when a buffer is flushed
+FLUSH_BATCH_SIZE = 500
+# Keys buffered before a flush is started early, ahead of the interval
+MAX_PENDING = 10_000
+COMBINE = {
+    "max": max,
+    "sum": lambda old, new: old + new,
+}
+
+
+class WriteBehind:
+    """Buffers writes to one column of hot rows and applies them in bulk.
+
+    `record(key, value)` only updates a dict in memory; values recorded for
+    the same key are combined, keeping the latest ("max") or adding them up
+    ("sum", for counters). A background thread in each worker process writes
+    the buffer every `interval` seconds, or sooner once `max_pending` keys
+    are waiting, with one `UPDATE ... SET column = CASE key WHEN ...` per
+    FLUSH_BATCH_SIZE rows. The buffer is flushed once more when the process
+    exits.
+
+    A "max" column only ever moves forward, so a worker flushing an older
+    value after another worker's newer one leaves the newer one in place; a
+    "sum" column is incremented rather than set. Rows are updated in key
+    order, so workers flushing at once don't deadlock on each other's locks.
+    Values still buffered when a process is killed outright are lost.
+
+    A flush that fails before its COMMIT is sent puts its values back into
+    the buffer for the next one. One that fails on the COMMIT itself may or
+    may not have been applied. "max" values go back all the same, since
+    writing one twice does no harm; "sum" deltas are dropped and logged, so
+    a counter can come out low but never counts anything twice.
+    """
+
+    def __init__(self, column, key, combine="max", interval=None, max_pending=MAX_PENDING):
+        self.column = column
+        self.key = key
+        self.combine = combine
+        self.interval = interval if interval is not None else float(os.getenv("WRITE_BEHIND_INTERVAL", "5"))
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._app = None
+
+    def init_app(self, app):
+        if app.config.get("WRITE_BEHIND"):
+            self._app = app
+
+    def enabled(self):
+        return bool(current_app.config.get("WRITE_BEHIND"))
+
+    def record(self, key, value):
+        """Buffer `value` for the row `key`; it reaches the database within `interval` seconds."""
+        combine = COMBINE[self.combine]
+        with self._lock:
+            current = self._pending.get(key)
+            self._pending[key] = value if current is None else combine(current, value)
+            pending = len(self._pending)
+        self._start()
+        if pending >= self.max_pending:
+            self._wake.set()
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                app = self._app or current_app._get_current_object()
+                self._thread = threading.Thread(
+                    target=self._run, args=(app,), name=f"write-behind-{self.column.key}", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self._flush_at_exit, app)
+
+    def _run(self, app):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            # a fresh app context per pass, and with it a fresh session
+            with app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("Write-behind flush of %s failed; retrying in %ss", self.column, self.interval)
+
+    def _flush_at_exit(self, app):
+        with app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Write-behind flush of %s failed at exit", self.column)
+
+    def _assignment(self, values):
+        new = case(values, value=self.key)
+        if self.combine == "sum":
+            return func.coalesce(self.column, 0) + new
+        return case((self.column.is_(None) | (self.column < new), new), else_=self.column)
+
+    def flush(self):
+        """Write everything buffered so far; returns how many rows were updated."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        keys = sorted(pending)
+        committing = False
+        try:
+            for start in range(0, len(keys), FLUSH_BATCH_SIZE):
+                batch = {key: pending[key] for key in keys[start:start + FLUSH_BATCH_SIZE]}
+                db.session.execute(
+                    update(self.column.table).where(self.key.in_(batch)).values({self.column.key: self._assignment(batch)})
+                )
+            committing = True
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            if committing and self.combine == "sum":
+                # the COMMIT may have gone through; adding these again could count them twice
+                logger.error("Write-behind flush of %s failed on commit; dropped %d keys' increments: %r",
+                             self.column, len(pending), pending)
+                raise
+            # keep the values for the next flush, combined with any recorded since
+            combine = COMBINE[self.combine]
+            with self._lock:
+                for key, value in pending.items():
+                    current = self._pending.get(key)
+                    self._pending[key] = value if current is None else combine(value, current)
+            raise
+        return len(keys)
+
+
+last_login_writes = WriteBehind(User.__table__.c.last_login, User.__table__.c.user_id)
+login_count_writes = WriteBehind(User.__table__.c.login_count, User.__table__.c.user_id, combine="sum")
@@ -0,0 +1,167 @@
+"""Re-encrypt national IDs under the current key.
+
+Deploy the new key as CRYPTOGRAPHY_KEY with the old one moved to
+CRYPTOGRAPHY_PREVIOUS_KEYS; the app keeps decrypting old rows while this job
+walks the patients table in patient_id order, re-encrypts every ID still under
+a previous key in a process pool and writes each batch back with one
+executemany. Nothing is locked beyond the rows of the batch being written.
+
+    python rotate_keys.py --batch-size 5000 --processes 4
+
+Progress is checkpointed to --state after every batch, so an interrupted run
+resumes where it stopped. Once a run reports no remaining rows, the previous
+key can be removed. With sharding enabled, run it once per shard URI.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from multiprocessing import Pool, cpu_count
+
+from cryptography.fernet import Fernet, InvalidToken
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, create_engine, func, select, update
+
+load_dotenv()
+
+from database import Patient
+from utils.security_utils import configured_keys, key_ring
+
+BATCH_SIZE = 2_000
+
+patients = Patient.__table__
+
+_current = None
+_ring = None
+
+
+def _init_worker(current, previous):
+    global _current, _ring
+    _current = Fernet(current)
+    _ring = key_ring(current, previous)
+
+
+def _rotate(batch):
+    # Returns (last patient_id, rows scanned, [(patient_id, old, new)], [patient_ids no key could decrypt])
+    changed, failed = [], []
+    for pid, token in batch:
+        if not token:
+            continue
+        try:
+            _current.decrypt(token.encode("utf-8"))
+            continue  # already under the current key
+        except InvalidToken:
+            pass
+        try:
+            changed.append((pid, token, _ring.rotate(token.encode("utf-8")).decode("utf-8")))
+        except InvalidToken:
+            failed.append(pid)
+    return batch[-1][0], len(batch), changed, failed
+
+
+def _batches(engine, after, batch_size):
+    # keyset pagination: each read is an index range scan, however far in we are
+    while True:
+        stmt = select(patients.c.patient_id, patients.c.national_id_encrypted) \
+            .order_by(patients.c.patient_id).limit(batch_size)
+        if after is not None:
+            stmt = stmt.where(patients.c.patient_id > after)
+        with engine.connect() as conn:
+            rows = [tuple(row) for row in conn.execute(stmt)]
+        if not rows:
+            return
+        yield rows
+        after = rows[-1][0]
+
+
+def write_back(engine, changed):
+    if not changed:
+        return
+    # the old value guard skips rows that changed since they were read
+    stmt = update(patients).where(
+        patients.c.patient_id == bindparam("b_patient_id"),
+        patients.c.national_id_encrypted == bindparam("b_old"),
+    ).values(national_id_encrypted=bindparam("b_new"))
+    with engine.begin() as conn:
+        conn.execute(stmt, [{"b_patient_id": pid, "b_old": old, "b_new": new} for pid, old, new in changed])
+
+
+def key_fingerprint(key):
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+
+
+def load_state(path, fingerprint):
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        state = None
+    # a checkpoint from a rotation to a different key doesn't apply
+    if not state or state.get("key") != fingerprint:
+        state = {"key": fingerprint, "after": None, "scanned": 0, "rotated": 0, "failed": []}
+    return state
+
+
+def save_state(path, state):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def rotate(uri, state_path, batch_size=BATCH_SIZE, processes=None, restart=False, log=print):
+    engine = create_engine(uri)
+    current, previous = configured_keys()
+    state = load_state(state_path, key_fingerprint(current))
+    if restart:
+        state.update(after=None, scanned=0, rotated=0, failed=[])
+
+    with engine.connect() as conn:
+        remaining = conn.execute(
+            select(func.count()).select_from(patients).where(patients.c.patient_id > state["after"])
+            if state["after"] is not None else select(func.count()).select_from(patients)
+        ).scalar()
+    log(f"{remaining} patients to scan" + (f", resuming after {state['after']}" if state["after"] else ""))
+
+    started = time.perf_counter()
+    scanned = 0
+    with Pool(processes or cpu_count(), initializer=_init_worker, initargs=(current, previous)) as pool:
+        # imap reads the next batches while the pool decrypts and this process writes
+        for last, count, changed, failed in pool.imap(_rotate, _batches(engine, state["after"], batch_size)):
+            write_back(engine, changed)
+            scanned += count
+            state["after"] = last
+            state["scanned"] += count
+            state["rotated"] += len(changed)
+            state["failed"].extend(failed)
+            save_state(state_path, state)
+
+            elapsed = time.perf_counter() - started
+            rate = scanned / elapsed if elapsed else 0
+            eta = (remaining - scanned) / rate if rate else 0
+            log(f"{scanned}/{remaining} scanned, {state['rotated']} re-encrypted, "
+                f"{rate:,.0f} rows/s, ~{eta:.0f}s left")
+
+    if state["failed"]:
+        log(f"{len(state['failed'])} IDs could not be decrypted with any configured key: {state['failed'][:10]}")
+    return state
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Re-encrypt national IDs with the current CRYPTOGRAPHY_KEY.")
+    parser.add_argument("--database-uri", default=os.getenv("MARIADB_URI"))
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--processes", type=int, help="pool size (default: number of CPUs)")
+    parser.add_argument("--state", default=".rotate_keys.json", help="checkpoint file used to resume")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and scan from the start")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    started = time.perf_counter()
+    state = rotate(args.database_uri, args.state, batch_size=args.batch_size,
+                   processes=args.processes, restart=args.restart)
+    print(json.dumps({"scanned": state["scanned"], "rotated": state["rotated"], "failed": len(state["failed"]),
+                      "seconds": round(time.perf_counter() - started, 1)}))
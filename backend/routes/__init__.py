@@ -1,4 +1,83 @@
-from .auth import RegisterRoute, LoginRoute, RefreshRoute
-from .consent_management import NewConsent, GetConsents, RevokeConsent, GetConsentByID, GetFacilityConsents
-from .facilities import Facilities
-from .access_logs import PatientAccessLogs, AdminAccessLogs
\ No newline at end of file
+from importlib import import_module
+
+# (module:Resource, url, methods, admission class). Route modules pull in
+# pydantic, bcrypt and requests, so each is imported on the first request to
+# one of its URLs rather than when the app is created. The admission class
+# (utils/admission.py) decides how the route is queued under load; routes
+# without one are never held back, so the admission stats answer under load.
+RESOURCES = [
+    ("auth:LoginRoute", "/login", ["POST"], "auth"),
+    ("auth:RegisterRoute", "/register", ["POST"], "auth"),
+    ("auth:RefreshRoute", "/auth/token-refresh", ["POST"], "auth"),
+    ("auth:StreamTicketRoute", "/auth/stream-ticket", ["POST"], "auth"),
+
+    ("consent_management:NewConsent", "/api/consents", ["POST"], "clinical"),
+    ("consent_management:GetConsents", "/api/consents/patient/<url_id>", ["GET"], "clinical"),
+    ("consent_management:RevokeConsent", "/api/consents/<consent_id>/revoke", ["PATCH"], "clinical"),
+    ("consent_management:GetConsentByID", "/api/consents/check", ["GET"], "clinical"),
+    ("consent_management:GetFacilityConsents", "/api/consents/facility", ["GET"], "clinical"),
+    ("consent_management:FacilityConsentChanges", "/api/consents/facility/changes", ["GET"], "clinical"),
+    ("consent_management:FacilityConsentStream", "/api/consents/facility/stream", ["GET"], "clinical"),
+    ("consent_management:FacilityConsentSummary", "/api/consents/facility/summary", ["GET"], "clinical"),
+    ("consent_management:AdminConsentSummary", "/api/admin/consents/summary", ["GET"], "bulk"),
+    ("facilities:Facilities", "/facilities", ["GET"], "clinical"),
+    ("access_logs:PatientAccessLogs", "/api/access-logs/user/<user_id>", ["GET"], "clinical"),
+    ("access_logs:PatientAccessLogStream", "/api/access-logs/user/<user_id>/stream", ["GET"], "clinical"),
+    ("access_logs:AdminAccessLogs", "/api/admin/access-logs", ["GET"], "bulk"),
+    ("consent_management:PatientSearch", "/api/patients/search", ["GET"], "clinical"),
+    ("patient_export:PatientDataExport", "/api/patients/<user_id>/export", ["GET"], "bulk"),
+    ("exports:AccessLogExports", "/api/admin/exports", ["GET", "POST"], "bulk"),
+    ("exports:AccessLogExport", "/api/admin/exports/<job_id>", ["GET"], "bulk"),
+    ("exports:AccessLogExportDownload", "/api/admin/exports/<job_id>/download", ["GET"], "bulk"),
+    ("diagnostics:StatementCacheStats", "/api/admin/statement-cache", ["GET"], "bulk"),
+    ("diagnostics:AdmissionStats", "/api/admin/admission", ["GET"], None),
+]
+
+# Endpoints that take a stream ticket (see auth.StreamTicketRoute) as ?jwt=;
+# no other endpoint accepts one
+STREAM_ENDPOINTS = {"facilityconsentstream", "patientaccesslogstream"}
+
+
+def load_resource(target):
+    module, name = target.split(":")
+    return getattr(import_module(f"{__name__}.{module}"), name)
+
+
+def _lazy_view(api, target, endpoint):
+    view = None
+
+    def dispatch(*args, **kwargs):
+        nonlocal view
+        if view is None:
+            # the same steps as Api.add_resource, done once the class is needed
+            resource = load_resource(target)
+            resource.mediatypes = api.mediatypes_method()
+            resource.endpoint = endpoint
+            view = api.output(resource.as_view(endpoint))
+            for decorator in api.decorators:
+                view = decorator(view)
+        return view(*args, **kwargs)
+
+    dispatch.__name__ = endpoint
+    return dispatch
+
+
+def admission_classes():
+    """The admission class of each endpoint that has one, for AdmissionControl."""
+    return {target.split(":")[1].lower(): cls for target, _, _, cls in RESOURCES if cls is not None}
+
+
+def register_resources(api, app, eager=False):
+    """Add every route in RESOURCES to the app.
+
+    With `eager` the route modules are imported straight away, as
+    Api.add_resource would, e.g. to warm a worker before it takes traffic.
+    """
+    for target, url, methods, _ in RESOURCES:
+        if eager:
+            api.add_resource(load_resource(target), url)
+            continue
+        endpoint = target.split(":")[1].lower()
+        # Flask-RESTful only handles errors for endpoints it knows about
+        api.endpoints.add(endpoint)
+        app.add_url_rule(url, endpoint, _lazy_view(api, target, endpoint), methods=methods)
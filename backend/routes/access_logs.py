@@ -1,7 +1,17 @@
 from flask_restful import Resource
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from flask import jsonify, make_response
-from database import db, AccessLog, User, Patient, UserRole
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity, get_jwt_request_location
+from flask import Response, current_app, jsonify, make_response, request, stream_with_context
+from database import db, AccessLog, Patient, UserRole, access_log_events, replica_reads, fan_out, statement_timeout, user_by_id
+
+# Seconds between keep-alive comments on an idle stream. Each one also picks up
+# logs written by other worker processes, which the in-process broker can't see.
+STREAM_POLL_INTERVAL = 15
+# Default and largest page of logs, for every listing
+LOG_PAGE_SIZE = 100
+MAX_LOG_PAGE_SIZE = 1000
+# Seconds any one query may run for a patient's logs and for the admin listing
+PATIENT_QUERY_TIMEOUT = 5
+ADMIN_QUERY_TIMEOUT = 10
 
 def make_standard_response(success: bool, message: str = None, data=None, status: int = 200):
     payload = {"success": success}
@@ -11,53 +21,171 @@ def make_standard_response(success: bool, message: str = None, data=None, status
         payload["data"] = data
     return make_response(jsonify(payload), status)
 
+def _patient_for_request(user_id):
+    # Returns (patient, None) or (None, error_response)
+    current_user_id = get_jwt_identity()
+
+    # Authorization check: Ensure the requester is accessing their own logs or is an admin
+    # Note: The route parameter is user_id. We should check if current_user_id matches user_id
+    # If I am a patient, I should only see my logs.
+
+    user = user_by_id(int(user_id))
+
+    if not user:
+        return None, make_standard_response(False, "user_not_found", status=404)
+
+    if str(current_user_id) != str(user_id):
+         # You could allow admins to see specific patient logs here too if desired,
+         # but sticking to strict ownership for now unless they use the admin all-logs endpoint.
+         # Actually, checking if the requester is an admin to allow access is good practice.
+        requester = user_by_id(current_user_id)
+        if not requester or requester.role != UserRole.ADMIN:
+            return None, make_standard_response(False, "unauthorized", status=401)
+
+    if user.role != UserRole.PATIENT:
+         return None, make_standard_response(False, "user_is_not_patient", status=400)
+
+    patient = user.patient
+    if not patient:
+        return None, make_standard_response(False, "patient_record_not_found", status=404)
+
+    return patient, None
+
+def _logs_after(patient_id, cursor, limit):
+    # log_id only grows, so it doubles as the cursor for incremental reads
+    return db.session.query(AccessLog).filter(
+        AccessLog.patient_id == patient_id,
+        AccessLog.log_id > cursor,
+    ).order_by(AccessLog.log_id).limit(limit).all()
+
+def _parse_cursor(value):
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+def _page_size():
+    limit = request.args.get("limit", LOG_PAGE_SIZE, type=int)
+    return limit if 0 < limit <= MAX_LOG_PAGE_SIZE else None
+
+def _newest_first(stmt):
+    """One keyset page of logs from `stmt`, newest first; ?before= is the cursor from the previous page.
+
+    Returns (statement, limit, cursor, error response). Pages walk the
+    primary key: timestamp has no index, so ordering by it would sort every
+    matching row on each request.
+    """
+    limit = _page_size()
+    if limit is None:
+        return None, None, None, make_standard_response(False, "invalid_limit", status=400)
+    before = request.args.get("before")
+    cursor = _parse_cursor(before)
+    if before is not None and cursor is None:
+        return None, None, None, make_standard_response(False, "invalid_cursor", status=400)
+    # one extra row tells whether there is another page
+    stmt = stmt.order_by(AccessLog.log_id.desc()).limit(limit + 1)
+    if cursor is not None:
+        stmt = stmt.where(AccessLog.log_id < cursor)
+    return stmt, limit, cursor, None
+
+def _page_data(rows, limit, cursor):
+    # rows are (log_id, serialized log) pairs
+    page = rows[:limit]
+    return {
+        "logs": [log for _, log in page],
+        "cursor": page[-1][0] if page else cursor,
+        "has_more": len(rows) > limit,
+    }
+
 class PatientAccessLogs(Resource):
     
     @jwt_required()
+    @replica_reads
+    @statement_timeout(PATIENT_QUERY_TIMEOUT)
     def get(self, user_id):
-        current_user_id = get_jwt_identity()
+        patient, error = _patient_for_request(user_id)
+        if error:
+            return error
+
+        since = request.args.get("since")
+        if since is not None:
+            cursor = _parse_cursor(since)
+            if cursor is None:
+                return make_standard_response(False, "invalid_cursor", status=400)
+            limit = _page_size()
+            if limit is None:
+                return make_standard_response(False, "invalid_limit", status=400)
+            # one extra row tells whether there is another page
+            rows = [(log.log_id, log.to_dict()) for log in _logs_after(patient.patient_id, cursor, limit + 1)]
+            return make_standard_response(True, data=_page_data(rows, limit, cursor))
 
-        # Authorization check: Ensure the requester is accessing their own logs or is an admin
-        # Note: The route parameter is user_id. We should check if current_user_id matches user_id
-        # If I am a patient, I should only see my logs.
-        
-        user = db.session.query(User).filter_by(user_id=int(user_id)).first()
-        
-        if not user:
-            return make_standard_response(False, "user_not_found", status=404)
-
-        if str(current_user_id) != str(user_id):
-             # You could allow admins to see specific patient logs here too if desired, 
-             # but sticking to strict ownership for now unless they use the admin all-logs endpoint.
-             # Actually, checking if the requester is an admin to allow access is good practice.
-            requester = db.session.query(User).filter_by(user_id=current_user_id).first()
-            if not requester or requester.role != UserRole.ADMIN:
-                return make_standard_response(False, "unauthorized", status=401)
-
-        if user.role != UserRole.PATIENT:
-             return make_standard_response(False, "user_is_not_patient", status=400)
-        
-        patient = user.patient
-        if not patient:
-            return make_standard_response(False, "patient_record_not_found", status=404)
-
-        logs = db.session.query(AccessLog).filter_by(patient_id=patient.patient_id).order_by(AccessLog.timestamp.desc()).all()
-        
-        # Serialize
-        data = [log.to_dict() for log in logs]
-        return make_standard_response(True, data=data)
+        stmt, limit, cursor, error = _newest_first(db.select(AccessLog).where(AccessLog.patient_id == patient.patient_id))
+        if error:
+            return error
+        rows = [(log.log_id, log.to_dict()) for log in db.session.execute(stmt).scalars()]
+        return make_standard_response(True, data=_page_data(rows, limit, cursor))
+
+class PatientAccessLogStream(Resource):
+
+    # EventSource can't set headers, so a stream ticket may come as ?jwt= instead
+    @jwt_required(locations=["headers", "query_string"])
+    def get(self, user_id):
+        # a token in the URL ends up in proxy access logs, so it has to be a short-lived stream ticket
+        if get_jwt_request_location() == "query_string" and not get_jwt().get("stream"):
+            return make_standard_response(False, "stream_ticket_required", status=401)
+        patient, error = _patient_for_request(user_id)
+        if error:
+            return error
+
+        patient_id = patient.patient_id
+        since = _parse_cursor(request.headers.get("Last-Event-ID") or request.args.get("since"))
+
+        def events():
+            # subscribe before reading the starting cursor so nothing committed in between is missed
+            with access_log_events.subscribe(patient_id) as subscription:
+                cursor = since
+                if cursor is None:
+                    # start from "now": only logs written after the client connected
+                    cursor = db.session.query(db.func.max(AccessLog.log_id)).filter_by(patient_id=patient_id).scalar() or 0
+                db.session.close()
+
+                yield "retry: 5000\n: connected\n\n"
+                while True:
+                    if subscription.get(timeout=STREAM_POLL_INTERVAL) is None:
+                        yield ": keep-alive\n\n"
+                    while True:
+                        # a client resuming from an old cursor catches up a page at a time
+                        logs = _logs_after(patient_id, cursor, MAX_LOG_PAGE_SIZE)
+                        for log in logs:
+                            cursor = log.log_id
+                            yield f"id: {cursor}\nevent: access_log\ndata: {current_app.json.dumps(log.to_dict())}\n\n"
+                        if len(logs) < MAX_LOG_PAGE_SIZE:
+                            break
+                    # don't hold a pooled connection while waiting for the next event
+                    db.session.close()
+
+        return Response(
+            stream_with_context(events()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
 class AdminAccessLogs(Resource):
     
     @jwt_required()
+    @replica_reads
+    @statement_timeout(ADMIN_QUERY_TIMEOUT)
     def get(self):
         current_user_id = get_jwt_identity()
-        user = db.session.query(User).filter_by(user_id=current_user_id).first()
+        user = user_by_id(current_user_id)
 
         if not user or user.role != UserRole.ADMIN:
             return make_standard_response(False, "unauthorized", status=401)
-        
-        logs = db.session.query(AccessLog).order_by(AccessLog.timestamp.desc()).all()
-        data = [log.to_dict() for log in logs]
-        
-        return make_standard_response(True, data=data)
+
+        stmt, limit, cursor, error = _newest_first(db.select(AccessLog))
+        if error:
+            return error
+
+        # with sharding enabled this reads every shard in parallel and merges by log_id
+        rows = fan_out(stmt, lambda log: (log.log_id, log.to_dict()), key=lambda log: log.log_id, reverse=True)[:limit + 1]
+        return make_standard_response(True, data=_page_data(rows, limit, cursor))
@@ -5,13 +5,12 @@ from flask_jwt_extended import get_jwt_identity
 from flask_bcrypt import Bcrypt
 import requests
 import os
-
-from dotenv import load_dotenv
-load_dotenv()
+from datetime import datetime, timedelta
 
 import logging
 import re
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.attributes import set_committed_value
 from typing import Optional, Literal
 from pydantic import BaseModel, EmailStr, ValidationError, root_validator, Field
 
@@ -19,11 +18,15 @@ logger = logging.getLogger(__name__)
 
 from utils import encrypt_id, decrypt_id
 
-from database import User, Patient, HealthCareWorker, HealthCareFacility, db
+from database import User, Patient, HealthCareWorker, db, facility_directory, last_login_writes, login_count_writes, user_by_email
 from database import UserRole
 
 bcrypt = Bcrypt()
 
+# How long a stream ticket can be used to open an event stream. It's only
+# checked when the stream is opened, so an open stream outlives it.
+STREAM_TICKET_TTL = timedelta(seconds=60)
+
 def standardized_response(success: bool, message: str = None, data=None, status: int = 200):
     payload = {"success": success}
     if message:
@@ -74,7 +77,7 @@ class RegisterRoute(Resource):
         password_hash = bcrypt.generate_password_hash(password, rounds=10)
 
         # check for duplicate email
-        existing_user = db.session.query(User).filter_by(email=email).first()
+        existing_user = user_by_email(email)
         if existing_user:
             return standardized_response(False, "email_already_registered", status=409)
 
@@ -108,7 +111,7 @@ class RegisterRoute(Resource):
             db.session.add(new_patient)
 
         elif role == "HEALTHCARE_WORKER":
-            facility = db.session.query(HealthCareFacility).filter_by(name=payload.facility_name).first()
+            facility = facility_directory.by_name(payload.facility_name)
             if facility:
                 new_healthcare_worker = HealthCareWorker(
                     license_number=payload.license_number,
@@ -147,18 +150,27 @@ class LoginRoute(Resource):
         email = payload.email
         password = payload.password
 
-        user = db.session.query(User).filter_by(email=email).first()
+        user = user_by_email(email)
 
         if user and bcrypt.check_password_hash(user.password_hash, str(password).encode("utf-8")):
             access_token = create_access_token(identity=str(user.user_id))
             refresh_token = create_refresh_token(identity=str(user.user_id))
-            user.last_login = db.func.now()
-            try:
-                db.session.commit()
-            except SQLAlchemyError:
-                db.session.rollback()
-                logger.exception("Database transaction failed while updating last_login")
-                return standardized_response(False, "database_transaction_failed", status=500)
+            if last_login_writes.enabled():
+                # written in the next bulk flush; the response shows it already
+                now = datetime.now()
+                last_login_writes.record(user.user_id, now)
+                login_count_writes.record(user.user_id, 1)
+                set_committed_value(user, "last_login", now)
+                set_committed_value(user, "login_count", (user.login_count or 0) + 1)
+            else:
+                user.last_login = db.func.now()
+                user.login_count = User.login_count + 1
+                try:
+                    db.session.commit()
+                except SQLAlchemyError:
+                    db.session.rollback()
+                    logger.exception("Database transaction failed while updating last_login")
+                    return standardized_response(False, "database_transaction_failed", status=500)
 
             if user.role == UserRole.PATIENT:
                 current_user = user.to_dict(rules=("-healthcare_worker", ))
@@ -181,3 +193,16 @@ class RefreshRoute(Resource):
         identity = get_jwt_identity()
         access_token = create_access_token(identity=identity)
         return standardized_response(True, data={"access_token": access_token})
+
+class StreamTicketRoute(Resource):
+    method_decorators = [jwt_required()]
+
+    def post(self):
+        # EventSource can't set headers, so streams take a token in the URL.
+        # That URL ends up in proxy access logs, so it carries this
+        # short-lived ticket, good only for opening streams, rather than the
+        # access token itself.
+        ticket = create_access_token(
+            identity=get_jwt_identity(), expires_delta=STREAM_TICKET_TTL, additional_claims={"stream": True},
+        )
+        return standardized_response(True, data={"ticket": ticket, "expires_in": int(STREAM_TICKET_TTL.total_seconds())})
@@ -1,8 +1,8 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from flask_restful import Resource
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from flask import request, make_response, jsonify
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity, get_jwt_request_location
+from flask import Response, current_app, request, make_response, jsonify, stream_with_context
 
 import requests, os
 import logging
@@ -10,9 +10,33 @@ from sqlalchemy.exc import SQLAlchemyError
 
 logger = logging.getLogger(__name__)
 
-from database import ConsentRecord, Patient, HealthCareFacility, User, HealthCareWorker, AccessLog
+from sqlalchemy.orm import selectinload
+
+from database import ConsentRecord, Patient, HealthCareFacility, AccessLog, ConsentEvent
 from database import UserRole, Status, EventAction, ConsentType
-from database import db
+from database import db, facility_directory, consent_change_events, replica_reads, fan_out, statement_timeout
+from database import consent_summary, expiring_consents, registry_demographics
+from database import consent_by_id, patient_by_id, patient_consent, user_by_id, worker_by_user, worker_facility
+
+# Page size for the consent change feed
+CHANGE_FEED_LIMIT = 500
+# Default and largest page for consent listings
+CONSENT_PAGE_SIZE = 100
+MAX_CONSENT_PAGE_SIZE = 500
+# Seconds between keep-alive comments on an idle stream; each also re-reads the
+# feed so changes committed by other worker processes are picked up.
+STREAM_POLL_INTERVAL = 15
+# Default and largest ?days= window for consents "expiring soon", and the most ids listed
+EXPIRING_DAYS = 7
+MAX_EXPIRING_DAYS = 365
+EXPIRING_LIMIT = 500
+# Seconds to wait on the registry's patient search
+REGISTRY_SEARCH_TIMEOUT = 10
+# Seconds any one query may run for a consent check, a listing or page, and a summary
+CHECK_QUERY_TIMEOUT = 2
+LIST_QUERY_TIMEOUT = 5
+SUMMARY_QUERY_TIMEOUT = 15
+SEARCH_PARAMS = ("name", "dob", "limit", "offset")
 
 def make_standard_response(success: bool, message: str = None, data=None, status: int = 200):
     payload = {"success": success}
@@ -28,7 +52,7 @@ class NewConsent(Resource):
     def post(self):
         user_id = get_jwt_identity()
 
-        user = db.session.query(User).filter_by(user_id=user_id).first()
+        user = user_by_id(user_id)
 
         if not user:
             return make_standard_response(False, "not_found", status=404)
@@ -37,7 +61,7 @@ class NewConsent(Resource):
             return make_standard_response(False, "unauthorized", status=401)
             
         facility_name = request.json.get("facility_name")
-        facility = db.session.query(HealthCareFacility).filter_by(name=facility_name).first()
+        facility = facility_directory.by_name(facility_name)
         if not facility:
             return make_standard_response(False, "facility_not_found", status=404)
 
@@ -55,10 +79,9 @@ class NewConsent(Resource):
             purpose=purpose,
             patient_id=patient_id,
             granted_by=granted_by,
+            facility_id=facility.facility_id,
         )
 
-        new_consent.facility = facility
-
         db.session.add(new_consent)
         try:
             db.session.commit()
@@ -72,25 +95,25 @@ class NewConsent(Resource):
 class GetConsents(Resource):
 
     @jwt_required()
+    @replica_reads
+    @statement_timeout(LIST_QUERY_TIMEOUT)
     def get(self, url_id):
         user_id = get_jwt_identity()
 
-        user = db.session.query(User).filter_by(user_id=int(user_id)).first()
+        user = user_by_id(int(user_id))
         if not user:
             return make_standard_response(False, "not_found", status=404)
 
         if user.role == UserRole.ADMIN:
             # If admin, fetch by the patient_id passed in URL
-            consents = db.session.query(ConsentRecord).filter_by(patient_id=url_id).all()
-            data = [consent_record.to_dict(rules=("-facility.healthcare_workers", )) for consent_record in consents]
-            return make_standard_response(True, data=data)
-
-        if user.role == UserRole.PATIENT and user.patient and str(url_id) == str(user.patient.patient_id):
-            consents = db.session.query(ConsentRecord).filter_by(granted_by=user_id).all()
-            data = [consent_record.to_dict(rules=("-facility.healthcare_workers", )) for consent_record in consents]
-            return make_standard_response(True, data=data)
+            criteria = [ConsentRecord.patient_id == url_id]
+        elif user.role == UserRole.PATIENT and user.patient and str(url_id) == str(user.patient.patient_id):
+            # patient_id as well, so the query goes to the patient's shard and index
+            criteria = [ConsentRecord.patient_id == url_id, ConsentRecord.granted_by == user.user_id]
+        else:
+            return make_standard_response(False, "unauthorized", status=401)
 
-        return make_standard_response(False, "unauthorized", status=401)
+        return _consent_page(criteria, _patient_consent_dict, [selectinload(ConsentRecord.facility)])
         
 
 class RevokeConsent(Resource):        
@@ -98,7 +121,7 @@ class RevokeConsent(Resource):
     @jwt_required()
     def patch(self, consent_id):
         user_id = get_jwt_identity()
-        consent_record = db.session.query(ConsentRecord).filter_by(consent_id=consent_id).first()
+        consent_record = consent_by_id(consent_id)
 
         if not consent_record:
             return make_standard_response(False, "not_found", status=404)
@@ -117,74 +140,72 @@ class RevokeConsent(Resource):
         return make_standard_response(True, data=consent_record.to_dict(rules=("-facility.healthcare_workers", )))
 
 
+def _registry_record(national_id):
+    # the local mirror first; the registry itself for patients it doesn't have (or when it's off)
+    record = registry_demographics(national_id)
+    if record is not None:
+        return record
+    response = requests.get(
+        url=f"{os.getenv('MOCK_REGISTRY_URL', 'http://127.0.0.1:8080')}/api/registry/patients?national_id={national_id}",
+        headers={
+            "X-API-Key": os.getenv("REGISTRY_API_KEY")
+        })
+    if response.status_code != 200:
+        return None
+    return response.json()
+
 class GetConsentByID(Resource):
 
     @jwt_required()
+    @statement_timeout(CHECK_QUERY_TIMEOUT)
     def get(self):
         user_id = get_jwt_identity()
         consent_id = request.args.get("consent_id")
         national_id = request.args.get("national_id")
 
-        healthcare_worker = db.session.query(HealthCareWorker).filter_by(user_id=user_id).first()
+        # worker_id and facility_id from shared memory when it has them
+        healthcare_worker = worker_facility(user_id) or worker_by_user(user_id)
         if not healthcare_worker:
             return make_standard_response(False, "unauthorized", status=401)
         
         consent_record = None # The consent record granted BY the patient
+        registry_data = None
 
         # If consent_id is provided, use the old logic (but slightly improved path)
         if consent_id: 
-            consent_record_meta = db.session.query(ConsentRecord).filter_by(consent_id=int(consent_id)).first()
+            consent_record_meta = consent_by_id(int(consent_id))
             if not consent_record_meta:
                  return make_standard_response(False, "not_found", status=404)
             # load consent for the patient linked to this consent_record
-            consent_record = db.session.query(ConsentRecord).filter_by(patient_id=consent_record_meta.patient.patient_id).first()
+            consent_record = patient_consent(consent_record_meta.patient.patient_id)
         
         # If no consent_id, try to find patient via national_id
         elif national_id:
              # 1. Get patient_id from registry
-            patient_id_response = requests.get(
-                url=f"{os.getenv('MOCK_REGISTRY_URL', 'http://127.0.0.1:8080')}/api/registry/patients?national_id={national_id}",
-                headers={
-                    "X-API-Key": os.getenv("REGISTRY_API_KEY")
-                })
-            
-            if patient_id_response.status_code != 200:
+            registry_data = _registry_record(national_id)
+            if registry_data is None:
                  return make_standard_response(False, "patient_not_found_in_registry", status=404)
-            
-            registry_data = patient_id_response.json()
             patient_id = registry_data.get("patient_id")
 
             # 2. Find consent for this patient at this facility
             # LIMITATION: Only picks the first one found.
-            consent_record = db.session.query(ConsentRecord).join(HealthCareFacility).filter(
-                ConsentRecord.patient_id == patient_id,
-                ConsentRecord.facility_id == healthcare_worker.facility_id
-            ).first()
+            consent_record = patient_consent(patient_id, healthcare_worker.facility_id)
 
         if not consent_record or consent_record.facility_id != healthcare_worker.facility_id:
             return make_standard_response(False, "no_valid_consent_found", status=404)
 
         status = consent_record.to_dict(rules=("-facility.healthcare_workers", ))["status"]
 
-        # fetch patient data from registry if consent is active
+        # fetch patient data from registry if consent is active, reusing the lookup above
         patient_data = None
-        if status == "active":
-             # Optimization: reuse registry_data if we have it and it matches (optional, but cleaner to re-fetch or use logic)
-             # For simplicity to match existing flow structure:
-            if national_id: # We have national_id in args
-                patient_id_response = requests.get(
-                    url=f"{os.getenv('MOCK_REGISTRY_URL', 'http://127.0.0.1:8080')}/api/registry/patients?national_id={national_id}",
-                    headers={
-                        "X-API-Key": os.getenv("REGISTRY_API_KEY")
-                    })
-                patient_data = patient_id_response.json()
+        if status == "active" and national_id:
+            patient_data = registry_data or _registry_record(national_id)
 
         patient = None
         if patient_data:
-            patient = db.session.query(Patient).filter_by(patient_id=patient_data.get("patient_id")).first()
-            if patient:
-                for k, v in patient_data.items():
-                    setattr(patient, k, v)
+            # registry fields are merged into the response below; copying them onto
+            # the ORM object would mark it dirty and write them back on commit
+            patient = patient_by_id(patient_data.get("patient_id"))
 
         # determine action from consent type
         if consent_record.consent_type == ConsentType.VIEW:
@@ -221,13 +242,76 @@ class GetConsentByID(Resource):
         return make_standard_response(False, "consent_not_active", status=403)
 
 
+class PatientSearch(Resource):
+
+    @jwt_required()
+    @statement_timeout(LIST_QUERY_TIMEOUT)
+    def get(self):
+        healthcare_worker, error = _worker_for_request()
+        if error:
+            return error
+
+        try:
+            response = requests.get(
+                url=f"{os.getenv('MOCK_REGISTRY_URL', 'http://127.0.0.1:8080')}/api/registry/patients/search",
+                params={key: request.args[key] for key in SEARCH_PARAMS if key in request.args},
+                headers={
+                    "X-API-Key": os.getenv("REGISTRY_API_KEY")
+                },
+                timeout=REGISTRY_SEARCH_TIMEOUT)
+        except requests.RequestException:
+            logger.exception("Registry search failed")
+            return make_standard_response(False, "registry_unavailable", status=502)
+        if response.status_code == 400:
+            return make_standard_response(False, "invalid_search", status=400)
+        if response.status_code != 200:
+            return make_standard_response(False, "registry_unavailable", status=502)
+        page = response.json()
+
+        # only patients who have an active consent at the worker's facility are
+        # shown beyond their patient_id
+        patient_ids = [match["patient_id"] for match in page["results"]]
+        consents = {}
+        if patient_ids:
+            now = datetime.now()
+            for consent in db.session.execute(
+                db.select(ConsentRecord).where(
+                    ConsentRecord.patient_id.in_(patient_ids),
+                    ConsentRecord.facility_id == healthcare_worker.facility_id,
+                    ConsentRecord.status == Status.ACTIVE,
+                    db.or_(ConsentRecord.expires_at.is_(None), ConsentRecord.expires_at > now),
+                ).order_by(ConsentRecord.consent_id)
+            ).scalars():
+                consents.setdefault(consent.patient_id, consent)
+
+        results = []
+        for match in page["results"]:
+            consent = consents.get(match["patient_id"])
+            if consent is None:
+                results.append({"patient_id": match["patient_id"], "consent": None})
+                continue
+            results.append({**match, "consent": {
+                "consent_id": consent.consent_id,
+                "consent_type": consent.consent_type,
+                "expires_at": consent.expires_at,
+            }})
+
+        return make_standard_response(True, data={
+            "results": results,
+            "next_offset": page["next_offset"],
+            "has_more": page["has_more"],
+        })
+
+
 class GetFacilityConsents(Resource):
 
     @jwt_required()
+    @replica_reads
+    @statement_timeout(LIST_QUERY_TIMEOUT)
     def get(self):
         user_id = get_jwt_identity()
 
-        user = db.session.query(User).filter_by(user_id=int(user_id)).first()
+        user = user_by_id(int(user_id))
         if not user or user.role != UserRole.HEALTHCARE_WORKER:
             return make_standard_response(False, "unauthorized", status=401)
         
@@ -235,15 +319,267 @@ class GetFacilityConsents(Resource):
         if not healthcare_worker:
             return make_standard_response(False, "worker_profile_not_found", status=404)
 
-        consents = db.session.query(ConsentRecord).filter_by(facility_id=healthcare_worker.facility_id).all()
-        
         # Enhanced serialization to include patient details if available locally
-        data = []
-        for c in consents:
-            c_dict = c.to_dict(rules=("-facility.healthcare_workers", ))
-            # If we want to show patient name, we need to join or fetch. 
-            if c.patient and c.patient.user:
-                 c_dict['patient_name'] = f"{c.patient.first_name} {c.patient.last_name}"
-            data.append(c_dict)
-
-        return make_standard_response(True, data=data)
+        return _consent_page(
+            [ConsentRecord.facility_id == healthcare_worker.facility_id],
+            _facility_consent_dict,
+            [selectinload(ConsentRecord.patient).selectinload(Patient.user), selectinload(ConsentRecord.facility)],
+        )
+
+
+class FacilityConsentChanges(Resource):
+
+    @jwt_required()
+    @replica_reads
+    @statement_timeout(LIST_QUERY_TIMEOUT)
+    def get(self):
+        healthcare_worker, error = _worker_for_request()
+        if error:
+            return error
+
+        since = request.args.get("since")
+        if since is None:
+            # No cursor yet: hand out the current head so the client can load the
+            # full list once and follow the feed from here
+            cursor = _head_seq(healthcare_worker.facility_id)
+            return make_standard_response(True, data={"events": [], "cursor": cursor, "has_more": False})
+
+        cursor = _parse_cursor(since)
+        if cursor is None:
+            return make_standard_response(False, "invalid_cursor", status=400)
+        limit = min(request.args.get("limit", CHANGE_FEED_LIMIT, type=int), CHANGE_FEED_LIMIT)
+
+        events = _events_after(healthcare_worker.facility_id, cursor, limit)
+        return make_standard_response(True, data={
+            "events": _event_dicts(events),
+            "cursor": events[-1].seq if events else cursor,
+            "has_more": len(events) == limit,
+        })
+
+
+class FacilityConsentStream(Resource):
+
+    # EventSource can't set headers, so a stream ticket may come as ?jwt= instead
+    @jwt_required(locations=["headers", "query_string"])
+    def get(self):
+        # a token in the URL ends up in proxy access logs, so it has to be a short-lived stream ticket
+        if get_jwt_request_location() == "query_string" and not get_jwt().get("stream"):
+            return make_standard_response(False, "stream_ticket_required", status=401)
+        healthcare_worker, error = _worker_for_request()
+        if error:
+            return error
+
+        facility_id = healthcare_worker.facility_id
+        since = _parse_cursor(request.headers.get("Last-Event-ID") or request.args.get("since"))
+
+        def events():
+            # subscribe before reading the head so nothing committed in between is missed
+            with consent_change_events.subscribe(facility_id) as subscription:
+                cursor = since if since is not None else _head_seq(facility_id)
+                db.session.close()
+
+                yield "retry: 5000\n: connected\n\n"
+                while True:
+                    if subscription.get(timeout=STREAM_POLL_INTERVAL) is None:
+                        yield ": keep-alive\n\n"
+                    while True:
+                        batch = _events_after(facility_id, cursor, CHANGE_FEED_LIMIT)
+                        for payload in _event_dicts(batch):
+                            cursor = payload["seq"]
+                            yield f"id: {cursor}\nevent: consent\ndata: {current_app.json.dumps(payload)}\n\n"
+                        if len(batch) < CHANGE_FEED_LIMIT:
+                            break
+                    # don't hold a pooled connection while waiting for the next change
+                    db.session.close()
+
+        return Response(
+            stream_with_context(events()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+
+# The summaries read the primary: the consent snapshot follows the primary's
+# change feed, and a lagging replica would undo changes it has already applied.
+class FacilityConsentSummary(Resource):
+
+    @jwt_required()
+    @statement_timeout(SUMMARY_QUERY_TIMEOUT)
+    def get(self):
+        healthcare_worker, error = _worker_for_request()
+        if error:
+            return error
+
+        days = _expiring_days()
+        if days is None:
+            return make_standard_response(False, "invalid_days", status=400)
+
+        facility_id = healthcare_worker.facility_id
+        summary = consent_summary(facility_id, expiring_within=days).get(facility_id) or {
+            "active": {t.value: 0 for t in ConsentType},
+            "by_status": {s.value: 0 for s in Status},
+            "expiring": 0,
+        }
+        summary["expiring_days"] = days.days
+        summary["expiring_consent_ids"] = expiring_consents(facility_id, within=days, limit=EXPIRING_LIMIT)
+        return make_standard_response(True, data={"facility_id": facility_id, **summary})
+
+
+class AdminConsentSummary(Resource):
+
+    @jwt_required()
+    @statement_timeout(SUMMARY_QUERY_TIMEOUT)
+    def get(self):
+        user = user_by_id(int(get_jwt_identity()))
+        if not user or user.role != UserRole.ADMIN:
+            return make_standard_response(False, "unauthorized", status=401)
+
+        days = _expiring_days()
+        if days is None:
+            return make_standard_response(False, "invalid_days", status=400)
+
+        return make_standard_response(True, data={
+            "expiring_days": days.days,
+            "facilities": consent_summary(expiring_within=days),
+        })
+
+
+def _expiring_days():
+    days = request.args.get("days", EXPIRING_DAYS, type=int)
+    if days is None or not 0 < days <= MAX_EXPIRING_DAYS:
+        return None
+    return timedelta(days=days)
+
+
+def _worker_for_request():
+    # Returns (healthcare_worker, None) or (None, error_response); callers only
+    # use its worker_id and facility_id, which the shared directory has too
+    user_id = get_jwt_identity()
+
+    healthcare_worker = worker_facility(int(user_id))
+    if healthcare_worker is not None:
+        return healthcare_worker, None
+
+    user = user_by_id(int(user_id))
+    if not user or user.role != UserRole.HEALTHCARE_WORKER:
+        return None, make_standard_response(False, "unauthorized", status=401)
+
+    healthcare_worker = user.healthcare_worker
+    if not healthcare_worker:
+        return None, make_standard_response(False, "worker_profile_not_found", status=404)
+
+    return healthcare_worker, None
+
+
+def _consent_filters():
+    # ?status=, ?type= (comma-separated values) and ?expires_after=/?expires_before= (ISO dates)
+    # as criteria; returns (criteria, None) or (None, error_response)
+    criteria = []
+    for key, column, enum in (("status", ConsentRecord.status, Status), ("type", ConsentRecord.consent_type, ConsentType)):
+        value = request.args.get(key)
+        if not value:
+            continue
+        try:
+            criteria.append(column.in_([enum(v.strip().lower()) for v in value.split(",")]))
+        except ValueError:
+            return None, make_standard_response(False, f"invalid_filter_{key}", status=400)
+    for key, bound in (("expires_after", lambda at: ConsentRecord.expires_at >= at),
+                       ("expires_before", lambda at: ConsentRecord.expires_at < at)):
+        value = request.args.get(key)
+        if not value:
+            continue
+        try:
+            criteria.append(bound(datetime.fromisoformat(value)))
+        except ValueError:
+            return None, make_standard_response(False, f"invalid_filter_{key}", status=400)
+    return criteria, None
+
+
+def _consent_page(criteria, serialize, options):
+    """One keyset page of consents in consent_id order, filtered by the request's query string.
+
+    ?after= is the cursor from the previous page, ?limit= the page size and
+    ?count=true adds the number of consents matching the filters.
+    """
+    filters, error = _consent_filters()
+    if error:
+        return error
+    criteria = criteria + filters
+
+    after = request.args.get("after")
+    cursor = _parse_cursor(after)
+    if after is not None and cursor is None:
+        return make_standard_response(False, "invalid_cursor", status=400)
+    limit = request.args.get("limit", CONSENT_PAGE_SIZE, type=int)
+    if not 0 < limit <= MAX_CONSENT_PAGE_SIZE:
+        return make_standard_response(False, "invalid_limit", status=400)
+
+    # one extra row tells whether there is another page
+    stmt = db.select(ConsentRecord).where(*criteria).options(*options).order_by(ConsentRecord.consent_id).limit(limit + 1)
+    if cursor is not None:
+        stmt = stmt.where(ConsentRecord.consent_id > cursor)
+    rows = fan_out(stmt, lambda c: (c.consent_id, serialize(c)), key=lambda c: c.consent_id)[:limit + 1]
+
+    page = rows[:limit]
+    data = {
+        "consents": [consent for _, consent in page],
+        "cursor": page[-1][0] if page else cursor,
+        "has_more": len(rows) > limit,
+    }
+    if request.args.get("count", "").lower() in ("1", "true", "yes"):
+        # a sharded session returns one count per shard
+        data["total"] = sum(db.session.execute(
+            db.select(db.func.count()).select_from(ConsentRecord).where(*criteria)
+        ).scalars())
+    return make_standard_response(True, data=data)
+
+
+def _patient_consent_dict(c):
+    return c.to_dict(rules=("-facility.healthcare_workers", ))
+
+
+def _facility_consent_dict(c):
+    c_dict = c.to_dict(rules=("-facility.healthcare_workers", ))
+    # If we want to show patient name, we need to join or fetch. 
+    if c.patient and c.patient.user:
+         c_dict['patient_name'] = f"{c.patient.first_name} {c.patient.last_name}"
+    return c_dict
+
+
+def _parse_cursor(value):
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _head_seq(facility_id):
+    return db.session.query(db.func.max(ConsentEvent.seq)).filter_by(facility_id=facility_id).scalar() or 0
+
+
+def _events_after(facility_id, cursor, limit):
+    return db.session.query(ConsentEvent).filter(
+        ConsentEvent.facility_id == facility_id,
+        ConsentEvent.seq > cursor,
+    ).order_by(ConsentEvent.seq).limit(limit).all()
+
+
+def _event_dicts(events):
+    consents = {}
+    ids = {e.consent_id for e in events}
+    if ids:
+        rows = db.session.query(ConsentRecord).options(
+            selectinload(ConsentRecord.patient).selectinload(Patient.user),
+            selectinload(ConsentRecord.facility),
+        ).filter(ConsentRecord.consent_id.in_(ids)).all()
+        consents = {c.consent_id: _facility_consent_dict(c) for c in rows}
+    return [
+        {
+            "seq": e.seq,
+            "event": e.event_type.value,
+            "consent_id": e.consent_id,
+            "occurred_at": e.occurred_at,
+            "consent": consents.get(e.consent_id),
+        }
+        for e in events
+    ]
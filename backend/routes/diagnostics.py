@@ -0,0 +1,40 @@
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import current_app, jsonify, make_response
+from database import UserRole, statement_cache_stats, user_by_id
+
+def make_standard_response(success: bool, message: str = None, data=None, status: int = 200):
+    payload = {"success": success}
+    if message:
+        payload["message"] = message
+    if data is not None:
+        payload["data"] = data
+    return make_response(jsonify(payload), status)
+
+class StatementCacheStats(Resource):
+
+    @jwt_required()
+    def get(self):
+        user = user_by_id(int(get_jwt_identity()))
+        if not user or user.role != UserRole.ADMIN:
+            return make_standard_response(False, "unauthorized", status=401)
+
+        # counts are per worker process, since each keeps its own cache
+        return make_standard_response(True, data=statement_cache_stats())
+
+
+class AdmissionStats(Resource):
+
+    @jwt_required()
+    def get(self):
+        user = user_by_id(int(get_jwt_identity()))
+        if not user or user.role != UserRole.ADMIN:
+            return make_standard_response(False, "unauthorized", status=401)
+
+        admission = current_app.extensions["admission"]
+        # limits are per worker process too
+        return make_standard_response(True, data={
+            "enabled": bool(current_app.config.get("ADMISSION_CONTROL")),
+            "max_active": admission.max_active,
+            "classes": admission.stats(),
+        })
@@ -0,0 +1,98 @@
+import os
+
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import current_app, jsonify, make_response, request, send_file, url_for
+from database import db, ExportJob, ExportStatus, UserRole, user_by_id
+from database import EXPORT_FORMATS, export_path, parse_filters, start_export
+
+def make_standard_response(success: bool, message: str = None, data=None, status: int = 200):
+    payload = {"success": success}
+    if message:
+        payload["message"] = message
+    if data is not None:
+        payload["data"] = data
+    return make_response(jsonify(payload), status)
+
+def _admin_for_request():
+    # Returns (admin, None) or (None, error_response)
+    user = user_by_id(get_jwt_identity())
+    if not user or user.role != UserRole.ADMIN:
+        return None, make_standard_response(False, "unauthorized", status=401)
+    return user, None
+
+def _job_for_request(job_id):
+    admin, error = _admin_for_request()
+    if error:
+        return None, error
+    job = db.session.get(ExportJob, job_id)
+    # admins only see the exports they started
+    if not job or job.requested_by != admin.user_id:
+        return None, make_standard_response(False, "export_not_found", status=404)
+    return job, None
+
+def _job_dict(job):
+    data = job.to_dict(only=(
+        "job_id", "format", "filters", "status", "rows_total", "rows_written",
+        "file_size", "error", "created_at", "started_at", "finished_at",
+    ))
+    data["progress"] = round(job.rows_written / job.rows_total, 4) if job.rows_total else None
+    data["download_url"] = url_for("accesslogexportdownload", job_id=job.job_id) \
+        if job.status == ExportStatus.DONE else None
+    return data
+
+class AccessLogExports(Resource):
+
+    @jwt_required()
+    def post(self):
+        admin, error = _admin_for_request()
+        if error:
+            return error
+
+        data = request.get_json(silent=True) or {}
+        export_format = data.get("format", "ndjson")
+        if export_format not in EXPORT_FORMATS:
+            return make_standard_response(False, "invalid_format", status=400)
+        try:
+            filters = parse_filters(data.get("filters") or {})
+        except ValueError as e:
+            return make_standard_response(False, f"invalid_filter_{e}", status=400)
+
+        job = start_export(admin.user_id, export_format, filters)
+        return make_standard_response(True, data=_job_dict(job), status=202)
+
+    @jwt_required()
+    def get(self):
+        admin, error = _admin_for_request()
+        if error:
+            return error
+
+        jobs = db.session.query(ExportJob).filter_by(requested_by=admin.user_id) \
+            .order_by(ExportJob.created_at.desc()).limit(50).all()
+        return make_standard_response(True, data=[_job_dict(job) for job in jobs])
+
+class AccessLogExport(Resource):
+
+    @jwt_required()
+    def get(self, job_id):
+        job, error = _job_for_request(job_id)
+        if error:
+            return error
+        return make_standard_response(True, data=_job_dict(job))
+
+class AccessLogExportDownload(Resource):
+
+    @jwt_required()
+    def get(self, job_id):
+        job, error = _job_for_request(job_id)
+        if error:
+            return error
+        if job.status != ExportStatus.DONE:
+            return make_standard_response(False, "export_not_ready", status=409)
+
+        path = export_path(current_app, job)
+        if not os.path.exists(path):
+            return make_standard_response(False, "export_file_missing", status=410)
+        # already gzipped on disk, so it is sent as-is
+        return send_file(path, mimetype="application/gzip", as_attachment=True,
+                         download_name=f"access-logs-{job.job_id}.{job.format}.gz")
@@ -1,7 +1,12 @@
+from flask import current_app, request
 from flask_restful import Resource
-from database.models import HealthCareFacility
+from database import facility_directory
 
 class Facilities(Resource):
     def get(self):
-        facilities = HealthCareFacility.query.all()
-        return [{"id": f.facility_id, "name": f.name} for f in facilities], 200
+        snapshot = facility_directory.snapshot()
+        response = current_app.json.response(snapshot.listing)
+        # clients revalidate every time and get a 304 while the directory is unchanged
+        response.set_etag(snapshot.etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
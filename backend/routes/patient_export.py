@@ -0,0 +1,153 @@
+import io
+import zipfile
+from datetime import datetime
+
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required
+from flask import Response, current_app, request, stream_with_context
+from sqlalchemy.orm import selectinload
+from database import db, AccessLog, ConsentRecord, HealthCareWorker, replica_reads
+from utils import decrypt_id
+from .access_logs import _patient_for_request, make_standard_response
+
+# Rows per keyset page; one page of ORM objects is all the bundle ever holds
+BUNDLE_PAGE_SIZE = 500
+BUNDLE_FORMATS = ("ndjson", "zip")
+
+PROFILE_FIELDS = (
+    "patient_id", "first_name", "last_name", "date_of_birth", "created_at",
+    "emergency_contact", "address", "user.email", "user.created_at", "user.last_login",
+)
+
+def _profile(patient):
+    data = patient.to_dict(only=PROFILE_FIELDS)
+    data["national_id"] = decrypt_id(patient.national_id_encrypted) if patient.national_id_encrypted else None
+    return data
+
+# Built by hand rather than with to_dict, which costs milliseconds per row at
+# the nesting these need; the JSON provider takes care of dates and enums
+def _consent_dict(consent):
+    facility = consent.facility
+    return {
+        "consent_id": consent.consent_id,
+        "consent_type": consent.consent_type,
+        "status": consent.status,
+        "purpose": consent.purpose,
+        "granted_at": consent.granted_at,
+        "expires_at": consent.expires_at,
+        "facility_id": consent.facility_id,
+        "facility": facility and {"name": facility.name, "facility_type": facility.facility_type, "location": facility.location},
+    }
+
+def _access_log_dict(log):
+    worker = log.healthcare_worker
+    return {
+        "log_id": log.log_id,
+        "timestamp": log.timestamp,
+        "action": log.action,
+        "result": log.result,
+        "reason": log.reason,
+        "ip_address": log.ip_address,
+        "accessed_by": log.accessed_by,
+        "healthcare_worker": worker and {
+            "job_title": worker.job_title,
+            "email": worker.user.email if worker.user else None,
+            "facility_id": worker.facility_id,
+            "facility_name": worker.healthcare_facility.name if worker.healthcare_facility else None,
+        },
+    }
+
+def _pages(model, key, patient_id, options, serialize):
+    # keyset pagination on the primary key, within the patient. Access logs have a
+    # (patient_id, log_id) index, so each of their pages is an index range scan;
+    # a patient has few enough consents that theirs are found through patient_id alone
+    cursor = None
+    while True:
+        stmt = db.select(model).where(model.patient_id == patient_id).options(*options) \
+            .order_by(key).limit(BUNDLE_PAGE_SIZE)
+        if cursor is not None:
+            stmt = stmt.where(key > cursor)
+        rows = db.session.execute(stmt).scalars().all()
+        if not rows:
+            return
+        cursor = getattr(rows[-1], key.key)
+        yield [serialize(row) for row in rows]
+        # don't hold a pooled connection while the client reads the page
+        db.session.close()
+        if len(rows) < BUNDLE_PAGE_SIZE:
+            return
+
+def _consent_pages(patient_id):
+    return _pages(ConsentRecord, ConsentRecord.consent_id, patient_id,
+                  [selectinload(ConsentRecord.facility)], _consent_dict)
+
+def _access_log_pages(patient_id):
+    return _pages(AccessLog, AccessLog.log_id, patient_id,
+                  [selectinload(AccessLog.healthcare_worker).selectinload(HealthCareWorker.user),
+                   selectinload(AccessLog.healthcare_worker).selectinload(HealthCareWorker.healthcare_facility)],
+                  _access_log_dict)
+
+def _ndjson_bundle(profile, patient_id):
+    dumps = current_app.json.dumps
+    yield dumps({"type": "profile", "data": profile}) + "\n"
+    for record_type, pages in (("consent", _consent_pages(patient_id)), ("access_log", _access_log_pages(patient_id))):
+        for page in pages:
+            yield "".join(dumps({"type": record_type, "data": row}) + "\n" for row in page)
+
+class _ChunkWriter(io.RawIOBase):
+    # Write-only, unseekable file for ZipFile; the generator hands each chunk on as it is written
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+def _zip_bundle(profile, patient_id):
+    dumps = current_app.json.dumps
+    out = _ChunkWriter()
+    # on an unseekable stream ZipFile writes sizes after each entry, so nothing is buffered
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+        bundle.writestr("profile.json", dumps(profile))
+        yield out.drain()
+        for name, pages in (("consents.ndjson", _consent_pages(patient_id)), ("access_logs.ndjson", _access_log_pages(patient_id))):
+            with bundle.open(name, "w", force_zip64=True) as entry:
+                for page in pages:
+                    entry.write("".join(dumps(row) + "\n" for row in page).encode("utf-8"))
+                    yield out.drain()
+            yield out.drain()
+    yield out.drain()
+
+class PatientDataExport(Resource):
+
+    @jwt_required()
+    @replica_reads
+    def get(self, user_id):
+        patient, error = _patient_for_request(user_id)
+        if error:
+            return error
+
+        export_format = request.args.get("format", "ndjson")
+        if export_format not in BUNDLE_FORMATS:
+            return make_standard_response(False, "invalid_format", status=400)
+
+        patient_id = patient.patient_id
+        profile = _profile(patient)
+        filename = f"{patient_id}-{datetime.now():%Y%m%d}.{export_format}"
+        if export_format == "zip":
+            body, mimetype = _zip_bundle(profile, patient_id), "application/zip"
+        else:
+            body, mimetype = _ndjson_bundle(profile, patient_id), "application/x-ndjson"
+
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
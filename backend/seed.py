@@ -1,10 +1,12 @@
+import argparse
+import hashlib
 import json
 from datetime import datetime, timedelta
-from app import app
+from app import create_app
 from database.models import (
-    User, Patient, HealthCareFacility, HealthCareWorker, 
-    ConsentRecord, AccessLog, UserRole, FacilityType, 
-    ConsentType, Status, EventAction,
+    User, Patient, HealthCareFacility, HealthCareWorker,
+    ConsentRecord, AccessLog, UserRole, FacilityType,
+    ConsentType, Status, EventAction, ConsentEvent, ConsentFeedHead,
     db
 )
 
@@ -12,135 +14,186 @@ from utils import encrypt_id
 
 import bcrypt
 
-def seed_main_backend():
-    with app.app_context():
-
-        # Order matters for deletion due to Foreign Keys
-        db.session.query(AccessLog).delete()
-        db.session.query(ConsentRecord).delete()
-        db.session.query(HealthCareWorker).delete()
-        db.session.query(HealthCareFacility).delete()
-        db.session.query(Patient).delete()
-        db.session.query(User).delete()
-
-        # Create Facilities
-        hosp = HealthCareFacility(
-            facility_id="FAC-001", name="HealthHub Clinic", 
-            facility_type=FacilityType.CLINIC, license_number="LIC-999", 
-            location="Nairobi"
+FACILITIES = [
+    {"facility_id": "FAC-001", "name": "HealthHub Clinic", "facility_type": FacilityType.CLINIC,
+     "license_number": "LIC-999", "location": "Nairobi"},
+    {"facility_id": "FAC-002", "name": "Kenyatta National", "facility_type": FacilityType.HOSPITAL,
+     "license_number": "LIC-888", "location": "Nairobi"},
+    {"facility_id": "FAC-003", "name": "GoodLife Pharmacy", "facility_type": FacilityType.PHARMACY,
+     "license_number": "LIC-777", "location": "Kisumu"},
+]
+
+ADMIN_EMAILS = ["admin@test.com", "audit@test.com"]
+PATIENT_EMAILS = ["patient@test.com", "sam@test.com", "musa@test.com", "faith@test.com", "david@test.com"]
+WORKER_EMAILS = ["doctor@test.com"] + [f"worker{i}@test.com" for i in range(2, 9)]
+
+# Patient profiles - mapping correctly to user accounts
+PATIENTS = [
+    {"id": "PAT-100002", "nid": "28456789", "fn": "Sarah", "ln": "Ochieng", "dob": (1992, 7, 25), "user_idx": 0},
+    {"id": "PAT-100001", "nid": "31245678", "fn": "Samuel", "ln": "Muchiri", "dob": (1985, 3, 12), "user_idx": 1},
+    {"id": "PAT-100003", "nid": "35678912", "fn": "Musa", "ln": "Hassan", "dob": (1978, 11, 2), "user_idx": 2},
+    {"id": "PAT-100004", "nid": "21987654", "fn": "Faith", "ln": "Wanjiku", "dob": (1995, 5, 18), "user_idx": 3},
+    {"id": "PAT-100005", "nid": "30123456", "fn": "David", "ln": "Njoroge", "dob": (1988, 9, 30), "user_idx": 4},
+]
+
+
+def worker_facility(i):
+    return "FAC-001" if i < 4 else ("FAC-002" if i < 7 else "FAC-003")
+
+
+def _fingerprint(facilities, users, patients, workers):
+    # sorted, so the order rows come back from the database doesn't matter
+    rows = [sorted(map(list, facilities)), sorted(map(list, users)), sorted(map(list, patients)), sorted(map(list, workers))]
+    return hashlib.sha256(json.dumps(rows, default=str).encode("utf-8")).hexdigest()
+
+
+def expected_fingerprint():
+    """Fingerprint of the accounts, profiles and facilities this script creates."""
+    return _fingerprint(
+        [(f["facility_id"], f["name"], f["facility_type"].name, f["license_number"], f["location"]) for f in FACILITIES],
+        [(email, UserRole.ADMIN.name) for email in ADMIN_EMAILS]
+        + [(email, UserRole.PATIENT.name) for email in PATIENT_EMAILS]
+        + [(email, UserRole.HEALTHCARE_WORKER.name) for email in WORKER_EMAILS],
+        [(p["id"], PATIENT_EMAILS[p["user_idx"]], p["fn"], p["ln"], datetime(*p["dob"]).date().isoformat())
+         for p in PATIENTS],
+        [(email, worker_facility(i), f"W-00{i}", "Physician") for i, email in enumerate(WORKER_EMAILS)],
+    )
+
+
+def seeded_fingerprint():
+    """The same fingerprint, computed from what is in the database now."""
+    facilities = db.session.query(
+        HealthCareFacility.facility_id, HealthCareFacility.name, HealthCareFacility.facility_type,
+        HealthCareFacility.license_number, HealthCareFacility.location,
+    ).filter(HealthCareFacility.facility_id.in_([f["facility_id"] for f in FACILITIES]))
+    users = db.session.query(User.user_id, User.email, User.role) \
+        .filter(User.email.in_(ADMIN_EMAILS + PATIENT_EMAILS + WORKER_EMAILS)).all()
+    emails = {user_id: email for user_id, email, _ in users}
+    # no join to users: with sharding enabled patients live on another database
+    patients = db.session.query(Patient.patient_id, Patient.user_id, Patient.first_name, Patient.last_name, Patient.date_of_birth) \
+        .filter(Patient.patient_id.in_([p["id"] for p in PATIENTS]))
+    workers = db.session.query(User.email, HealthCareWorker.facility_id, HealthCareWorker.license_number, HealthCareWorker.job_title) \
+        .join(User, HealthCareWorker.user_id == User.user_id) \
+        .filter(User.email.in_(WORKER_EMAILS))
+    return _fingerprint(
+        [(*row[:2], row[2].name, *row[3:]) for row in facilities],
+        [(email, role.name) for _, email, role in users],
+        [(pid, emails.get(user_id), first, last, dob.isoformat()) for pid, user_id, first, last, dob in patients],
+        list(workers),
+    )
+
+
+def seed(force=False):
+    """Reset the database to the demo data, unless it already holds it.
+
+    Needs an app context. Returns False when the demo accounts were already in
+    place, which takes a few indexed lookups; pass `force` to reseed anyway.
+    """
+    if not force and seeded_fingerprint() == expected_fingerprint():
+        return False
+
+    # Order matters for deletion due to Foreign Keys
+    db.session.query(AccessLog).delete()
+    db.session.query(ConsentEvent).delete()
+    db.session.query(ConsentFeedHead).delete()
+    db.session.query(ConsentRecord).delete()
+    db.session.query(HealthCareWorker).delete()
+    db.session.query(HealthCareFacility).delete()
+    db.session.query(Patient).delete()
+    db.session.query(User).delete()
+
+    # Create Facilities
+    facilities = [HealthCareFacility(**f) for f in FACILITIES]
+    db.session.add_all(facilities)
+
+    pw_hash = bcrypt.hashpw("Test123!".encode('utf-8'), bcrypt.gensalt(10)).decode('utf-8')
+
+    admins = [User(email=email, password_hash=pw_hash, role=UserRole.ADMIN) for email in ADMIN_EMAILS]
+    patient_users = [User(email=email, password_hash=pw_hash, role=UserRole.PATIENT) for email in PATIENT_EMAILS]
+    worker_users = [
+        User(email=email, password_hash=pw_hash, role=UserRole.HEALTHCARE_WORKER)
+        for email in WORKER_EMAILS
+    ]
+
+    db.session.add_all(admins + patient_users + worker_users)
+    db.session.commit()
+
+    patients = []
+    for data in PATIENTS:
+        encrypted_nid = encrypt_id(data["nid"])
+        p = Patient(
+            patient_id=data["id"],
+            user_id=patient_users[data["user_idx"]].user_id,
+            first_name=data["fn"],
+            last_name=data["ln"],
+            national_id_encrypted=encrypted_nid,
+            date_of_birth=datetime(*data["dob"]).date()
         )
-        hosp2 = HealthCareFacility(
-            facility_id="FAC-002", name="Kenyatta National", 
-            facility_type=FacilityType.HOSPITAL, license_number="LIC-888", 
-            location="Nairobi"
+        patients.append(p)
+
+    db.session.add_all(patients)
+    db.session.commit()
+
+    # Create healthcare workers
+    workers = []
+    for i, u in enumerate(worker_users):
+        w = HealthCareWorker(
+            user_id=u.user_id, facility_id=worker_facility(i),
+            license_number=f"W-00{i}", job_title="Physician"
         )
-        pharm = HealthCareFacility(
-            facility_id="FAC-003", name="GoodLife Pharmacy", 
-            facility_type=FacilityType.PHARMACY, license_number="LIC-777", 
-            location="Kisumu"
+        workers.append(w)
+    db.session.add_all(workers)
+    db.session.commit()
+
+    # Create consent records
+    consents = [
+        # Active Consent for Sarah at HealthHub
+        ConsentRecord(
+            patient_id="PAT-100002", facility_id="FAC-001",
+            consent_type=ConsentType.VIEW, status=Status.ACTIVE,
+            granted_by=patient_users[0].user_id, purpose="Routine Checkup",
+            granted_at=datetime.now(), expires_at=datetime.now() + timedelta(days=30)
+        ),
+        # Revoked Consent for testing
+        ConsentRecord(
+            patient_id="PAT-100002", facility_id="FAC-002",
+            consent_type=ConsentType.EDIT, status=Status.REVOKED,
+            granted_by=patient_users[0].user_id, purpose="Old Surgery"
+        ),
+        # Expired Consent
+        ConsentRecord(
+            patient_id="PAT-100001", facility_id="FAC-003",
+            consent_type=ConsentType.SHARE, status=Status.EXPIRED,
+            granted_by=patient_users[1].user_id, purpose="Past Prescription",
+            expires_at=datetime.now() - timedelta(days=1)
         )
-        db.session.add_all([hosp, hosp2, pharm])
-
-        pw_hash = bcrypt.hashpw("Test123!".encode('utf-8'), bcrypt.gensalt(10)).decode('utf-8')
-
-        admins = [
-            User(email="admin@test.com", password_hash=pw_hash, role=UserRole.ADMIN),
-            User(email="audit@test.com", password_hash=pw_hash, role=UserRole.ADMIN)
-        ]
-        
-        patient_users = [
-            User(email="patient@test.com", password_hash=pw_hash, role=UserRole.PATIENT),
-            User(email="sam@test.com", password_hash=pw_hash, role=UserRole.PATIENT),      
-            User(email="musa@test.com", password_hash=pw_hash, role=UserRole.PATIENT),     
-            User(email="faith@test.com", password_hash=pw_hash, role=UserRole.PATIENT),    
-            User(email="david@test.com", password_hash=pw_hash, role=UserRole.PATIENT),    
-        ]
-
-        worker_users = [
-            User(email=f"worker{i}@test.com", password_hash=pw_hash, role=UserRole.HEALTHCARE_WORKER) 
-            for i in range(1, 9)
-        ]
-        worker_users[0].email = "doctor@test.com"
-
-        db.session.add_all(admins + patient_users + worker_users)
-        db.session.commit()
-
-        # Create patient profiles - mapping correctly to user accounts
-        patient_data = [
-            {"id": "PAT-100002", "nid": "28456789", "fn": "Sarah", "ln": "Ochieng", "dob": (1992, 7, 25), "user_idx": 0},
-            {"id": "PAT-100001", "nid": "31245678", "fn": "Samuel", "ln": "Muchiri", "dob": (1985, 3, 12), "user_idx": 1},
-            {"id": "PAT-100003", "nid": "35678912", "fn": "Musa", "ln": "Hassan", "dob": (1978, 11, 2), "user_idx": 2},
-            {"id": "PAT-100004", "nid": "21987654", "fn": "Faith", "ln": "Wanjiku", "dob": (1995, 5, 18), "user_idx": 3},
-            {"id": "PAT-100005", "nid": "30123456", "fn": "David", "ln": "Njoroge", "dob": (1988, 9, 30), "user_idx": 4},
-        ]
-
-        patients = []
-        for data in patient_data:
-            encrypted_nid = encrypt_id(data["nid"])
-            p = Patient(
-                patient_id=data["id"],
-                user_id=patient_users[data["user_idx"]].user_id,
-                first_name=data["fn"],
-                last_name=data["ln"],
-                national_id_encrypted=encrypted_nid,
-                date_of_birth=datetime(*data["dob"]).date()
-            )
-            patients.append(p)
-
-        db.session.add_all(patients)
-        db.session.commit()
-
-        # Create healthcare workers
-        workers = []
-        for i, u in enumerate(worker_users):
-            fac = hosp if i < 4 else (hosp2 if i < 7 else pharm)
-            w = HealthCareWorker(
-                user_id=u.user_id, facility_id=fac.facility_id,
-                license_number=f"W-00{i}", job_title="Physician"
-            )
-            workers.append(w)
-        db.session.add_all(workers)
-        db.session.commit()
-
-        # Create consent records
-        consents = [
-            # Active Consent for Sarah at HealthHub
-            ConsentRecord(
-                patient_id="PAT-100002", facility_id="FAC-001", 
-                consent_type=ConsentType.VIEW, status=Status.ACTIVE,
-                granted_by=patient_users[0].user_id, purpose="Routine Checkup",
-                granted_at=datetime.now(), expires_at=datetime.now() + timedelta(days=30)
-            ),
-            # Revoked Consent for testing
-            ConsentRecord(
-                patient_id="PAT-100002", facility_id="FAC-002", 
-                consent_type=ConsentType.EDIT, status=Status.REVOKED,
-                granted_by=patient_users[0].user_id, purpose="Old Surgery"
-            ),
-            # Expired Consent
-            ConsentRecord(
-                patient_id="PAT-100001", facility_id="FAC-003", 
-                consent_type=ConsentType.SHARE, status=Status.EXPIRED,
-                granted_by=patient_users[1].user_id, purpose="Past Prescription",
-                expires_at=datetime.now() - timedelta(days=1)
-            )
-        ]
-        db.session.add_all(consents)
-
-        # Create Access Logs
-        logs = []
-        for i in range(20):
-            res = "ALLOWED" if i % 2 == 0 else "DENIED"
-            logs.append(AccessLog(
-                patient_id="PAT-100002", accessed_by=workers[0].worker_id,
-                action=EventAction.VIEW, result=res,
-                reason="Consent Check" if res == "ALLOWED" else "No Active Consent",
-                ip_address="192.168.1.1"
-            ))
-        db.session.add_all(logs)
-
-        db.session.commit()
-        print("Main Backend successfully seeded!")
+    ]
+    db.session.add_all(consents)
+
+    # Create Access Logs
+    logs = []
+    for i in range(20):
+        res = "ALLOWED" if i % 2 == 0 else "DENIED"
+        logs.append(AccessLog(
+            patient_id="PAT-100002", accessed_by=workers[0].worker_id,
+            action=EventAction.VIEW, result=res,
+            reason="Consent Check" if res == "ALLOWED" else "No Active Consent",
+            ip_address="192.168.1.1"
+        ))
+    db.session.add_all(logs)
+
+    db.session.commit()
+    return True
+
+
+def seed_main_backend(force=False):
+    with create_app().app_context():
+        if seed(force):
+            print("Main Backend successfully seeded!")
+        else:
+            print("Main Backend already seeded, nothing to do.")
 
 if __name__ == "__main__":
-    seed_main_backend()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Seed the backend with demo accounts and data.")
+    parser.add_argument("--force", action="store_true", help="reseed even if the demo data is already present")
+    seed_main_backend(parser.parse_args().force)
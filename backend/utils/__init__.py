@@ -1 +1,4 @@
-from .security_utils import encrypt_id, decrypt_id
\ No newline at end of file
+from .security_utils import encrypt_id, decrypt_id, national_id_digest, digest_key_id
+from .json_provider import FastJSONProvider
+from .compression import Compress
+from .admission import AdmissionControl
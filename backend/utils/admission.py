@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import Counter, namedtuple
+
+from flask import g, jsonify, request
+
+# priority: lower goes first when a slot frees up.
+# limit: requests of the class in progress at once, or None for ADMISSION_MAX_ACTIVE.
+# queue_timeout: seconds a request may wait for a slot before it is turned away.
+# max_queue: requests of the class waiting at once; any more are turned away straight off.
+# status, retry_after: the response to requests turned away, and its Retry-After in seconds.
+AdmissionClass = namedtuple(
+    "AdmissionClass", ["priority", "limit", "queue_timeout", "max_queue", "status", "retry_after"]
+)
+
+
+def default_classes(auth_limit=4, bulk_limit=2):
+    return {
+        "clinical": AdmissionClass(0, None, 5.0, 64, 503, 1),
+        "auth": AdmissionClass(1, auth_limit, 2.0, 32, 429, 5),
+        "bulk": AdmissionClass(2, bulk_limit, 0.5, 4, 503, 30),
+    }
+
+
+class AdmissionControl:
+    """Per-process concurrency limits by route class, with clinical requests first.
+
+    `routes` maps endpoints to a class in ADMISSION_CLASSES; endpoints it
+    doesn't name (and CORS preflights) are let through untouched. At most
+    ADMISSION_MAX_ACTIVE classified requests, and at most the class's
+    `limit`, are in progress at once. The rest wait up to the class's
+    `queue_timeout`, and whenever a slot frees up it goes to the waiting
+    class with the lowest `priority`. A request that finds `max_queue`
+    others of its class already waiting, or that times out, gets its class's
+    status with a Retry-After header instead of queueing indefinitely.
+
+    A slot is held until the view has returned its response, so streamed
+    bodies are sent without one.
+
+    Config: ADMISSION_CONTROL turns it on; ADMISSION_MAX_ACTIVE,
+    ADMISSION_AUTH_LIMIT, ADMISSION_BULK_LIMIT, or ADMISSION_CLASSES to
+    replace the classes outright.
+    """
+
+    def __init__(self, app=None, routes=None):
+        self._cond = threading.Condition()
+        self._active = Counter()
+        self._waiting = Counter()
+        self._total = 0
+        self._counts = {}
+        if app is not None:
+            self.init_app(app, routes)
+
+    def init_app(self, app, routes):
+        app.config.setdefault("ADMISSION_MAX_ACTIVE", 16)
+        app.config.setdefault("ADMISSION_AUTH_LIMIT", 4)
+        app.config.setdefault("ADMISSION_BULK_LIMIT", 2)
+        app.config.setdefault("ADMISSION_CLASSES", default_classes(
+            app.config["ADMISSION_AUTH_LIMIT"], app.config["ADMISSION_BULK_LIMIT"],
+        ))
+        self.routes = routes or {}
+        self.max_active = app.config["ADMISSION_MAX_ACTIVE"]
+        self.classes = app.config["ADMISSION_CLASSES"]
+        self._counts = {name: Counter() for name in self.classes}
+        app.extensions["admission"] = self
+
+        if app.config.get("ADMISSION_CONTROL"):
+            app.before_request(self.before_request)
+            app.after_request(self.after_request)
+            # after_request is skipped when the view raises
+            app.teardown_request(self.teardown_request)
+
+    def _limit(self, name):
+        limit = self.classes[name].limit
+        return self.max_active if limit is None else min(limit, self.max_active)
+
+    def _admissible(self, name, queued):
+        if self._total >= self.max_active or self._active[name] >= self._limit(name):
+            return False
+        priority = self.classes[name].priority
+        for other, cls in self.classes.items():
+            if not self._waiting[other] or self._active[other] >= self._limit(other):
+                continue
+            # waiting requests of a more urgent class go first; newcomers
+            # also queue behind requests of their own priority
+            if cls.priority < priority or (not queued and cls.priority == priority):
+                return False
+        return True
+
+    def _acquire(self, name):
+        """Take a slot for a request of class `name`; returns None, or why it was turned away."""
+        cls = self.classes[name]
+        with self._cond:
+            if not self._admissible(name, queued=False):
+                if self._waiting[name] >= cls.max_queue:
+                    self._counts[name]["rejected"] += 1
+                    return "queue_full"
+                self._counts[name]["queued"] += 1
+                self._waiting[name] += 1
+                deadline = time.monotonic() + cls.queue_timeout
+                try:
+                    while not self._admissible(name, queued=True):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._counts[name]["timed_out"] += 1
+                            return "timed_out"
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting[name] -= 1
+                    # a request leaving the queue may unblock one of a lower priority
+                    self._cond.notify_all()
+            self._active[name] += 1
+            self._total += 1
+            self._counts[name]["admitted"] += 1
+        return None
+
+    def _release(self):
+        name = g.pop("admission_class", None)
+        if name is None:
+            return
+        with self._cond:
+            self._active[name] -= 1
+            self._total -= 1
+            self._cond.notify_all()
+
+    def before_request(self):
+        name = self.routes.get(request.endpoint)
+        if name is None or request.method == "OPTIONS":
+            return None
+        reason = self._acquire(name)
+        if reason is None:
+            g.admission_class = name
+            return None
+
+        cls = self.classes[name]
+        response = jsonify({"success": False, "message": "too_many_requests" if cls.status == 429 else "overloaded"})
+        response.status_code = cls.status
+        response.headers["Retry-After"] = str(cls.retry_after)
+        return response
+
+    def after_request(self, response):
+        self._release()
+        return response
+
+    def teardown_request(self, exc):
+        self._release()
+
+    def stats(self):
+        """In-progress and waiting requests per class, and counts since the process started."""
+        with self._cond:
+            return {
+                name: {"active": self._active[name], "waiting": self._waiting[name], **self._counts[name]}
+                for name in self.classes
+            }
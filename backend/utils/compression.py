@@ -0,0 +1,161 @@
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional, see the "speedups" extra
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional, see the "speedups" extra
+    zstandard = None
+
+DEFAULT_MIMETYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "text/csv",
+    "text/plain",
+    "text/html",
+)
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+class Compress:
+    """Content-negotiated response compression.
+
+    Buffered responses are compressed in one go once they reach
+    COMPRESS_MIN_SIZE bytes. Streamed responses are compressed chunk by
+    chunk and flushed after every chunk so clients still see each piece as
+    soon as it is produced.
+
+    Config: COMPRESS_ALGORITHMS (server preference order), COMPRESS_MIN_SIZE,
+    COMPRESS_MIMETYPES and COMPRESS_{GZIP,BR,ZSTD}_LEVEL.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("COMPRESS_ALGORITHMS", ["zstd", "br", "gzip"])
+        app.config.setdefault("COMPRESS_MIN_SIZE", 1024)
+        app.config.setdefault("COMPRESS_MIMETYPES", DEFAULT_MIMETYPES)
+        app.config.setdefault("COMPRESS_GZIP_LEVEL", 6)
+        app.config.setdefault("COMPRESS_BR_LEVEL", 4)
+        app.config.setdefault("COMPRESS_ZSTD_LEVEL", 3)
+
+        self._codecs = {"gzip": _Gzip}
+        if brotli is not None:
+            self._codecs["br"] = _Brotli
+        if zstandard is not None:
+            self._codecs["zstd"] = _Zstd
+        self._config = app.config
+
+        app.after_request(self.after_request)
+
+    def _negotiate(self):
+        available = [name for name in self._config["COMPRESS_ALGORITHMS"] if name in self._codecs]
+        # ties in client quality go to the server's preference order
+        return request.accept_encodings.best_match(available)
+
+    def _compressor(self, encoding):
+        return self._codecs[encoding](self._config[f"COMPRESS_{encoding.upper()}_LEVEL"])
+
+    def _skip(self, response):
+        return (
+            request.method == "HEAD"
+            or response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or "no-transform" in response.headers.get("Cache-Control", "")
+            or response.mimetype not in self._config["COMPRESS_MIMETYPES"]
+        )
+
+    def after_request(self, response):
+        if self._skip(response):
+            return response
+
+        # The representation depends on Accept-Encoding whether or not we compress
+        response.vary.add("Accept-Encoding")
+
+        if not response.is_streamed and response.content_length is not None \
+                and response.content_length < self._config["COMPRESS_MIN_SIZE"]:
+            return response
+
+        encoding = self._negotiate()
+        if encoding is None:
+            return response
+
+        compressor = self._compressor(encoding)
+        if response.is_streamed:
+            response.response = self._stream(response.response, compressor)
+            response.headers.pop("Content-Length", None)
+        else:
+            body = compressor.compress(response.get_data()) + compressor.finish()
+            response.set_data(body)
+
+        response.headers["Content-Encoding"] = encoding
+        # a compressed body is a different byte sequence, so a strong ETag no longer applies
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    @staticmethod
+    def _stream(chunks, compressor):
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                data = compressor.compress(chunk) + compressor.flush()
+                if data:
+                    yield data
+            yield compressor.finish()
+        finally:
+            # the WSGI server only closes the outer iterable
+            if hasattr(chunks, "close"):
+                chunks.close()
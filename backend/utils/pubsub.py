@@ -0,0 +1,68 @@
+import queue
+import threading
+from collections import defaultdict
+
+
+class Subscription:
+    def __init__(self, broker, topic, maxsize):
+        self._broker = broker
+        self.topic = topic
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def _put(self, message):
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            # A slow consumer loses messages rather than blocking publishers;
+            # consumers that need every event must resync from a cursor.
+            pass
+
+    def get(self, timeout=None):
+        """Return the next message, or None if nothing arrived within `timeout`."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._broker._unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Broker:
+    """In-process publish/subscribe keyed by topic.
+
+    Only reaches subscribers in the same process; consumers that must not
+    miss writes from other workers should also poll their source.
+    """
+
+    def __init__(self, maxsize=256):
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, topic):
+        subscription = Subscription(self, topic, self._maxsize)
+        with self._lock:
+            self._subscriptions[topic].add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.topic]
+
+    def publish(self, topic, message):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(topic, ()))
+        for subscription in subscribers:
+            subscription._put(message)
+        return len(subscribers)
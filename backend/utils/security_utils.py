@@ -1,21 +1,65 @@
+import hashlib
+import hmac
 import os
+from functools import lru_cache
 
-from cryptography.fernet import Fernet
-from dotenv import load_dotenv
+from cryptography.fernet import Fernet, MultiFernet
+from flask import current_app, has_app_context
 
-load_dotenv()
 
-SECRET_KEY=os.getenv("CRYPTOGRAPHY_KEY")
-cipher = Fernet(SECRET_KEY)
+def key_ring(current, previous=()):
+    # MultiFernet encrypts with the first key and decrypts with any of them
+    return MultiFernet([Fernet(key) for key in [current, *previous]])
+
+
+def configured_keys():
+    """The current key and the retired keys, newest first.
+
+    Read from the app config inside an app context and from the environment
+    otherwise (scripts such as bulk_seed.py and rotate_keys.py).
+    """
+    settings = current_app.config if has_app_context() else os.environ
+    current = settings.get("CRYPTOGRAPHY_KEY")
+    # Retired keys are kept so rows not yet re-encrypted still decrypt
+    previous = tuple(k.strip() for k in (settings.get("CRYPTOGRAPHY_PREVIOUS_KEYS") or "").split(",") if k.strip())
+    return current, previous
+
+
+@lru_cache(maxsize=4)
+def _cipher(current, previous):
+    if not current:
+        raise RuntimeError("CRYPTOGRAPHY_KEY is not set")
+    return key_ring(current, previous)
+
+
+def cipher():
+    # Built on first use, so importing this module needs no key
+    return _cipher(*configured_keys())
 
 def encrypt_id(national_id):
     # IDs are usually strings; Fernet needs bytes
     id_bytes = national_id.encode('utf-8')
-    encrypted_id = cipher.encrypt(id_bytes)
+    encrypted_id = cipher().encrypt(id_bytes)
     return encrypted_id.decode('utf-8')
 
 def decrypt_id(encrypted_id_string):
     # Convert string back to bytes to decrypt
     encrypted_bytes = encrypted_id_string.encode('utf-8')
-    decrypted_bytes = cipher.decrypt(encrypted_bytes)
+    decrypted_bytes = cipher().decrypt(encrypted_bytes)
     return decrypted_bytes.decode('utf-8')
+
+def _digest_key():
+    current = configured_keys()[0]
+    if not current:
+        raise RuntimeError("CRYPTOGRAPHY_KEY is not set")
+    # derived rather than reusing the Fernet key for a second purpose
+    return hashlib.sha256(b"national-id-digest:" + current.encode("utf-8")).digest()
+
+def national_id_digest(national_id):
+    # deterministic, so it can be indexed and looked up; keyed, so the small
+    # space of national IDs can't be reversed from a table dump
+    return hmac.new(_digest_key(), national_id.encode("utf-8"), hashlib.sha256).hexdigest()
+
+def digest_key_id():
+    # changes when CRYPTOGRAPHY_KEY is rotated, invalidating stored digests
+    return hashlib.sha256(_digest_key()).hexdigest()[:16]
@@ -0,0 +1,154 @@
+import hashlib
+import struct
+import time
+from multiprocessing import shared_memory
+
+MAGIC = b"HHST"
+# bumped whenever the layout below changes, so old segments are never misread
+LAYOUT = 1
+
+# magic, layout, seq, active buffer, loaded_at (time.time()), reload requests
+_HEADER = struct.Struct("<4sIQIxxxxdQ")
+HEADER_SIZE = 64
+_SEQ_OFFSET = 8
+_ACTIVE_OFFSET = 16
+_LOADED_AT_OFFSET = 24
+_REQUESTED_OFFSET = 32
+# per buffer: slot count, entries, bytes of keys and values
+_BUFFER_HEADER = struct.Struct("<III")
+BUFFER_HEADER_SIZE = 16
+# per slot: key hash (0 for an empty slot), offset of key then value, key and value lengths
+_SLOT = struct.Struct("<QIHH")
+# reads restarted by a concurrent publish before a lookup gives up
+MAX_READ_RETRIES = 8
+
+
+def _hash(key):
+    # stable across processes, unlike hash(); never 0, which marks an empty slot
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") | 1
+
+
+class SharedTable:
+    """A bytes-to-bytes hash table in a named shared memory segment.
+
+    The segment holds a header and two buffers. One process publishes a
+    complete table at a time: it is written into the buffer readers aren't
+    using, which then becomes the active one, and `seq` is bumped. Readers
+    take no locks: they note `seq`, probe the active buffer, and start over
+    if `seq` moved meanwhile, since the buffer may have been rewritten under
+    them. Each buffer is an open-addressing table of fixed 16-byte slots
+    followed by the keys and values they point to.
+
+    Any process can ask the publisher for a fresh table with
+    request_reload(), which bumps a counter the publisher watches.
+    """
+
+    def __init__(self, name, size):
+        try:
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size, track=False)
+            _HEADER.pack_into(self.shm.buf, 0, MAGIC, LAYOUT, 0, 0, 0.0, 0)
+        except FileExistsError:
+            # another process created it; it outlives every process that uses it
+            self.shm = shared_memory.SharedMemory(name, track=False)
+        for _ in range(100):
+            magic, layout = struct.unpack_from("<4sI", self.shm.buf, 0)
+            if magic != bytes(4):
+                break
+            # created a moment ago, and the header isn't written yet
+            time.sleep(0.01)
+        if (magic, layout) != (MAGIC, LAYOUT):
+            raise RuntimeError(f"Shared memory segment {name} has an unexpected layout")
+        self.buf = self.shm.buf
+        self.buffer_size = (self.shm.size - HEADER_SIZE) // 2
+
+    def _header(self):
+        _, _, seq, active, loaded_at, requested = _HEADER.unpack_from(self.buf, 0)
+        return seq, active, loaded_at, requested
+
+    @property
+    def seq(self):
+        return self._header()[0]
+
+    @property
+    def loaded_at(self):
+        return self._header()[2]
+
+    @property
+    def reload_requests(self):
+        return self._header()[3]
+
+    def request_reload(self):
+        # unsynchronized; two requests landing at once still count as one, which is enough
+        struct.pack_into("<Q", self.buf, _REQUESTED_OFFSET, self.reload_requests + 1)
+
+    def publish(self, entries, loaded_at):
+        """Replace the table's contents with `entries` (bytes to bytes); raises ValueError if they don't fit."""
+        if any(len(key) > 0xFFFF or len(value) > 0xFFFF for key, value in entries.items()):
+            raise ValueError("keys and values are limited to 64 KiB")
+        capacity = 8
+        while capacity < len(entries) * 2:
+            capacity *= 2
+        heap_start = BUFFER_HEADER_SIZE + capacity * _SLOT.size
+        heap_size = sum(len(key) + len(value) for key, value in entries.items())
+        if heap_start + heap_size > self.buffer_size:
+            raise ValueError(f"{len(entries)} entries need {heap_start + heap_size} bytes, "
+                             f"the shared table has {self.buffer_size} per buffer")
+
+        data = bytearray(heap_start + heap_size)
+        _BUFFER_HEADER.pack_into(data, 0, capacity, len(entries), heap_size)
+        offset = heap_start
+        for key, value in entries.items():
+            key_hash = _hash(key)
+            slot = key_hash & (capacity - 1)
+            while _SLOT.unpack_from(data, BUFFER_HEADER_SIZE + slot * _SLOT.size)[0]:
+                slot = (slot + 1) & (capacity - 1)
+            _SLOT.pack_into(data, BUFFER_HEADER_SIZE + slot * _SLOT.size, key_hash, offset, len(key), len(value))
+            data[offset:offset + len(key) + len(value)] = key + value
+            offset += len(key) + len(value)
+
+        seq, active, _, _ = self._header()
+        target = 1 - active
+        start = HEADER_SIZE + target * self.buffer_size
+        self.buf[start:start + len(data)] = data
+        # the new buffer becomes active before seq moves, so a reader that
+        # sees the new seq also sees the new buffer
+        struct.pack_into("<I", self.buf, _ACTIVE_OFFSET, target)
+        struct.pack_into("<d", self.buf, _LOADED_AT_OFFSET, loaded_at)
+        struct.pack_into("<Q", self.buf, _SEQ_OFFSET, seq + 1)
+
+    def _probe(self, start, key, key_hash):
+        capacity = _BUFFER_HEADER.unpack_from(self.buf, start)[0]
+        if not capacity or capacity & (capacity - 1) or capacity * _SLOT.size > self.buffer_size:
+            # read mid-rewrite; the caller will see seq move and retry
+            return None
+        slot = key_hash & (capacity - 1)
+        for _ in range(capacity):
+            slot_hash, offset, key_len, value_len = _SLOT.unpack_from(
+                self.buf, start + BUFFER_HEADER_SIZE + slot * _SLOT.size
+            )
+            if not slot_hash:
+                return None
+            if slot_hash == key_hash and self.buf[start + offset:start + offset + key_len] == key:
+                return bytes(self.buf[start + offset + key_len:start + offset + key_len + value_len])
+            slot = (slot + 1) & (capacity - 1)
+        return None
+
+    def get(self, key):
+        """The value stored for `key`, or None; also None before anything is published."""
+        key_hash = _hash(key)
+        for _ in range(MAX_READ_RETRIES):
+            seq, active, _, _ = self._header()
+            if seq == 0:
+                return None
+            try:
+                value = self._probe(HEADER_SIZE + active * self.buffer_size, key, key_hash)
+            except struct.error:
+                # offsets read mid-rewrite pointed outside the buffer
+                value = None
+            if self.seq == seq:
+                return value
+        return None
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
@@ -1,5 +1,5 @@
 import { useState, useEffect } from "react";
-import { api } from "../utils/api";
+import { api, openStream } from "../utils/api";
 import {
   Eye,
   Edit,
@@ -17,19 +17,32 @@ export default function AccessLogList({ userId }) {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [isDialogOpen, setIsDialogOpen] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
 
-  useEffect(() => {
-    if (!userId) return;
-
-    setLoading(true);
-    api(`/api/access-logs/user/${userId}`)
+  // The backend returns { success: true, data: { logs, cursor, has_more } },
+  // newest first; ?before=<cursor> fetches the next, older page
+  const fetchPage = (before) =>
+    api(
+      `/api/access-logs/user/${userId}` +
+        (before != null ? `?before=${before}` : ""),
+    )
       .then((res) => {
         if (!res.ok) throw new Error("Failed to fetch logs");
         return res.json();
       })
       .then((data) => {
-        // The backend returns { success: true, data: [...] }
-        setLogs(data.data || []);
+        setNextCursor(data.data.has_more ? data.data.cursor : null);
+        return data.data.logs;
+      });
+
+  useEffect(() => {
+    if (!userId) return;
+
+    setLoading(true);
+    fetchPage(null)
+      .then((page) => {
+        setLogs(page);
         setError(null);
       })
       .catch((err) => {
@@ -39,6 +52,33 @@ export default function AccessLogList({ userId }) {
       .finally(() => setLoading(false));
   }, [userId]);
 
+  const loadOlder = () => {
+    setLoadingOlder(true);
+    fetchPage(nextCursor)
+      .then((page) =>
+        setLogs((prev) => [
+          ...prev,
+          ...page.filter((log) => !prev.some((l) => l.log_id === log.log_id)),
+        ]),
+      )
+      .catch((err) => console.error("Error fetching logs:", err))
+      .finally(() => setLoadingOlder(false));
+  };
+
+  // Live updates: new access events are pushed as they are recorded
+  useEffect(() => {
+    if (!userId) return;
+
+    return openStream(`/api/access-logs/user/${userId}/stream`, {
+      access_log: (event) => {
+        const log = JSON.parse(event.data);
+        setLogs((prev) =>
+          prev.some((l) => l.log_id === log.log_id) ? prev : [log, ...prev]
+        );
+      },
+    });
+  }, [userId]);
+
   const getActionIcon = (action) => {
     switch (action) {
       case "VIEW":
@@ -115,7 +155,8 @@ export default function AccessLogList({ userId }) {
             onClick={() => setIsDialogOpen(true)}
             className="text-xs text-yellow-700 hover:text-yellow-900 font-medium flex items-center gap-1"
           >
-            View All ({logs.length}) <Maximize2 size={12} />
+            View All ({logs.length}
+            {nextCursor !== null ? "+" : ""}) <Maximize2 size={12} />
           </button>
         )}
       </div>
@@ -153,7 +194,8 @@ export default function AccessLogList({ userId }) {
                   Full Access History
                 </h2>
                 <p className="text-xs text-gray-500">
-                  Showing all {logs.length} records
+                  Showing {nextCursor !== null ? "the latest" : "all"}{" "}
+                  {logs.length} records
                 </p>
               </div>
               <button
@@ -177,7 +219,16 @@ export default function AccessLogList({ userId }) {
               ))}
             </div>
 
-            <div className="p-4 border-t border-gray-100 bg-white text-right">
+            <div className="p-4 border-t border-gray-100 bg-white flex justify-end gap-2">
+              {nextCursor !== null && (
+                <button
+                  onClick={loadOlder}
+                  disabled={loadingOlder}
+                  className="px-4 py-2 text-yellow-700 hover:bg-yellow-50 text-sm font-medium rounded-lg transition-colors disabled:opacity-50 disabled:cursor-wait"
+                >
+                  {loadingOlder ? "Loading..." : "Load older"}
+                </button>
+              )}
               <button
                 onClick={() => setIsDialogOpen(false)}
                 className="px-4 py-2 bg-gray-100 hover:bg-gray-200 text-gray-700 text-sm font-medium rounded-lg transition-colors"
@@ -22,20 +22,33 @@ export default function AdminAccessLogs() {
   const [timeRange, setTimeRange] = useState("7days"); // 24h, 7days, 30days, all
   const [searchQuery, setSearchQuery] = useState("");
   const [expanded, setExpanded] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
 
   // Limits
   const INITIAL_LIMIT = 7;
+  const PAGE_LIMIT = 1000;
 
-  const fetchLogs = () => {
-    setLoading(true);
-    api("/api/admin/access-logs")
+  // Logs come newest first, a page at a time; the filters below work on
+  // the pages loaded so far
+  const fetchPage = (before) =>
+    api(
+      `/api/admin/access-logs?limit=${PAGE_LIMIT}` +
+        (before != null ? `&before=${before}` : ""),
+    )
       .then((res) => {
         if (!res.ok) throw new Error("Failed to fetch system logs");
         return res.json();
       })
       .then((data) => {
-        // Determine data structure (array or {data: []})
-        const logs = Array.isArray(data) ? data : data.data || [];
+        setNextCursor(data.data.has_more ? data.data.cursor : null);
+        return data.data.logs;
+      });
+
+  const fetchLogs = () => {
+    setLoading(true);
+    fetchPage(null)
+      .then((logs) => {
         setAllLogs(logs);
         setError(null);
       })
@@ -46,6 +59,17 @@ export default function AdminAccessLogs() {
       .finally(() => setLoading(false));
   };
 
+  const loadOlder = () => {
+    setLoadingOlder(true);
+    fetchPage(nextCursor)
+      .then((logs) => setAllLogs((prev) => [...prev, ...logs]))
+      .catch((err) => {
+        console.error("Admin Log Fetch Error:", err);
+        setError("Could not retrieve system access logs.");
+      })
+      .finally(() => setLoadingOlder(false));
+  };
+
   useEffect(() => {
     fetchLogs();
   }, []);
@@ -322,14 +346,25 @@ export default function AdminAccessLogs() {
           )}
         </span>
 
-        {filteredLogs.length > INITIAL_LIMIT && (
-          <button
-            onClick={() => setExpanded(!expanded)}
-            className="text-yellow-600 hover:text-yellow-800 font-medium hover:underline transition"
-          >
-            {expanded ? "Show Less" : `Show All (${filteredLogs.length})`}
-          </button>
-        )}
+        <div className="flex items-center gap-4">
+          {nextCursor !== null && (
+            <button
+              onClick={loadOlder}
+              disabled={loadingOlder}
+              className="text-gray-600 hover:text-gray-900 font-medium hover:underline transition disabled:opacity-50 disabled:cursor-wait"
+            >
+              {loadingOlder ? "Loading..." : "Load older logs"}
+            </button>
+          )}
+          {filteredLogs.length > INITIAL_LIMIT && (
+            <button
+              onClick={() => setExpanded(!expanded)}
+              className="text-yellow-600 hover:text-yellow-800 font-medium hover:underline transition"
+            >
+              {expanded ? "Show Less" : `Show All (${filteredLogs.length})`}
+            </button>
+          )}
+        </div>
       </div>
     </div>
   );
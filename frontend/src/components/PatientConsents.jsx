@@ -22,13 +22,21 @@ export default function PatientConsents({ patientId }) {
     const fetchConsents = async () => {
       setLoading(true);
       try {
-        const res = await api(`/api/consents/patient/${patientId}`);
-        const data = await res.json();
-        if (data.success) {
-          setConsents(data.data);
-        } else {
-          setError("Failed to load consents");
-        }
+        // a patient has few consents, so read every page
+        const all = [];
+        let after = null;
+        do {
+          const query = after === null ? "" : `?after=${after}`;
+          const res = await api(`/api/consents/patient/${patientId}${query}`);
+          const data = await res.json();
+          if (!data.success) {
+            setError("Failed to load consents");
+            return;
+          }
+          all.push(...data.data.consents);
+          after = data.data.has_more ? data.data.cursor : null;
+        } while (after !== null);
+        setConsents(all);
       } catch (err) {
         console.error("Error fetching consents:", err);
         setError("Could not load consents.");
@@ -1,26 +1,56 @@
 import { useState, useEffect } from "react";
-import { api } from "../utils/api";
+import { api, openStream } from "../utils/api";
 import { FileText, AlertCircle, CheckCircle, XCircle } from "lucide-react";
 
 export default function FacilityConsents() {
   const [consents, setConsents] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
   useEffect(() => {
-    fetchConsents();
+    let closeStream;
+    let unmounted = false;
+    fetchConsents().then((cursor) => {
+      if (cursor === undefined || unmounted) return;
+      // Apply changes since the full load instead of re-fetching the list
+      closeStream = openStream(`/api/consents/facility/stream?since=${cursor}`, {
+        consent: (event) => {
+          const change = JSON.parse(event.data);
+          if (!change.consent) return;
+          if (change.event === "created") setTotal((prev) => prev + 1);
+          setConsents((prev) => {
+            const rest = prev.filter((c) => c.consent_id !== change.consent_id);
+            return [change.consent, ...rest];
+          });
+        },
+      });
+    });
+
+    return () => {
+      unmounted = true;
+      closeStream?.();
+    };
   }, []);
 
   async function fetchConsents() {
     try {
-      const res = await api("/api/consents/facility");
+      // Read the feed position first so nothing committed during the list load is missed
+      const feedRes = await api("/api/consents/facility/changes");
+      const feed = await feedRes.json();
+      const res = await api("/api/consents/facility?count=true");
       const body = await res.json();
 
       if (!res.ok) {
         throw new Error(body.message || "Failed to fetch consents");
       }
 
-      setConsents(body.data || []);
+      setConsents(body.data.consents);
+      setTotal(body.data.total);
+      setNextCursor(body.data.has_more ? body.data.cursor : null);
+      return feedRes.ok ? feed.data.cursor : undefined;
     } catch (err) {
       setError(err.message);
     } finally {
@@ -28,6 +58,27 @@ export default function FacilityConsents() {
     }
   }
 
+  async function loadMore() {
+    setLoadingMore(true);
+    try {
+      const res = await api(`/api/consents/facility?after=${nextCursor}`);
+      const body = await res.json();
+      if (!res.ok) {
+        throw new Error(body.message || "Failed to fetch consents");
+      }
+      // skip any the change stream already added
+      setConsents((prev) => {
+        const seen = new Set(prev.map((c) => c.consent_id));
+        return [...prev, ...body.data.consents.filter((c) => !seen.has(c.consent_id))];
+      });
+      setNextCursor(body.data.has_more ? body.data.cursor : null);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   if (loading) {
     return (
       <div className="flex justify-center items-center py-12">
@@ -57,7 +108,7 @@ export default function FacilityConsents() {
           </p>
         </div>
         <div className="bg-yellow-100 text-yellow-800 px-3 py-1 rounded-full text-sm font-medium">
-          Total: {consents.length}
+          Total: {total}
         </div>
       </div>
 
@@ -137,6 +188,17 @@ export default function FacilityConsents() {
               </tbody>
             </table>
           </div>
+          {nextCursor !== null && (
+            <div className="p-4 border-t border-gray-200 text-center">
+              <button
+                onClick={loadMore}
+                disabled={loadingMore}
+                className="px-4 py-2 text-sm font-medium text-yellow-700 hover:bg-yellow-50 rounded-lg transition-colors disabled:opacity-50 disabled:cursor-wait"
+              >
+                {loadingMore ? "Loading..." : `Load more (${consents.length} of ${total})`}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -39,6 +39,24 @@ function clearAuth() {
   sessionStorage.removeItem("access_token");
   sessionStorage.removeItem("refresh_token");
   sessionStorage.removeItem("user");
+  sessionStorage.removeItem("last_write");
+}
+
+/**
+ * Time of this tab's last write, as sent by the backend. Echoing it back
+ * keeps the following reads on the primary database until the read
+ * replicas have caught up, whichever server process handles them.
+ */
+const LAST_WRITE_HEADER = "X-Last-Write";
+
+function fetchTrackingWrites(url, config) {
+  const lastWrite = sessionStorage.getItem("last_write");
+  if (lastWrite) config.headers[LAST_WRITE_HEADER] = lastWrite;
+  return fetch(url, config).then((response) => {
+    const wroteAt = response.headers.get(LAST_WRITE_HEADER);
+    if (wroteAt) sessionStorage.setItem("last_write", wroteAt);
+    return response;
+  });
 }
 
 /**
@@ -86,7 +104,7 @@ export async function api(endpoint, options = {}) {
   };
 
   try {
-    const response = await fetch(url, config);
+    const response = await fetchTrackingWrites(url, config);
 
     // specific check for 401 Unauthorized
     if (response.status === 401) {
@@ -101,7 +119,7 @@ export async function api(endpoint, options = {}) {
           subscribeTokenRefresh((newToken) => {
             // Update the header with the new token
             config.headers["Authorization"] = `Bearer ${newToken}`;
-            resolve(fetch(url, config));
+            resolve(fetchTrackingWrites(url, config));
           });
         });
       }
@@ -146,7 +164,7 @@ export async function api(endpoint, options = {}) {
         // Notify any other queued requests
         onRefreshed(newAccessToken);
 
-        return fetch(url, config);
+        return fetchTrackingWrites(url, config);
       } catch (refreshErr) {
         // If refresh fails, clear auth and redirect
         clearAuth();
@@ -162,3 +180,69 @@ export async function api(endpoint, options = {}) {
     return Promise.reject(error);
   }
 }
+
+/**
+ * Delay before reopening a stream the server closed, e.g. once its ticket
+ * has expired and the browser's own reconnect was refused.
+ */
+const STREAM_RETRY_MS = 3000;
+
+/**
+ * Open an EventSource stream. EventSource can't send headers, so the URL
+ * carries a short-lived stream ticket instead of the access token (which
+ * would end up in proxy logs). Fetching the ticket goes through api(), so
+ * an expired access token is refreshed first. When the stream is closed,
+ * it's reopened with a new ticket from the last event received.
+ *
+ * `listeners` maps event names to handlers. Returns a function that closes
+ * the stream for good.
+ */
+export function openStream(endpoint, listeners) {
+  let source = null;
+  let retryTimer = null;
+  let lastEventId = null;
+  let closed = false;
+
+  const reopenLater = () => {
+    if (!closed) retryTimer = setTimeout(connect, STREAM_RETRY_MS);
+  };
+
+  async function connect() {
+    let ticket;
+    try {
+      const res = await api("/auth/stream-ticket", { method: "POST" });
+      if (!res.ok) throw new Error("Failed to get a stream ticket");
+      ticket = (await res.json()).data.ticket;
+    } catch (err) {
+      console.error("Error opening stream:", err);
+      reopenLater();
+      return;
+    }
+    if (closed) return;
+
+    const url = new URL(BASE_URL + endpoint, window.location.origin);
+    url.searchParams.set("jwt", ticket);
+    if (lastEventId) url.searchParams.set("since", lastEventId);
+
+    source = new EventSource(url.toString());
+    Object.entries(listeners).forEach(([name, handler]) =>
+      source.addEventListener(name, (event) => {
+        if (event.lastEventId) lastEventId = event.lastEventId;
+        handler(event);
+      }),
+    );
+    source.onerror = () => {
+      // The browser retries dropped connections itself, but gives up once
+      // the server refuses one, which it does when the ticket has expired
+      if (source.readyState === EventSource.CLOSED) reopenLater();
+    };
+  }
+
+  connect();
+
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    source?.close();
+  };
+}
@@ -0,0 +1,154 @@
+"""Bulk loader for the registry.
+
+seed.py adds the 20 demo patients one ORM object at a time. This script
+streams records into registry_records with Core executemany batches, either
+from a JSON file (one record per line, as in seed_data.json, or NDJSON) or
+from a synthetic generator run in a process pool.
+
+    python bulk_seed.py --patients 1000000
+    python bulk_seed.py --file seed_data.json
+
+Synthetic patient and national IDs follow backend/bulk_seed.py so both
+services describe the same population.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+from multiprocessing import Pool, cpu_count
+
+from sqlalchemy import event, insert
+
+from main import db, app
+from data import PatientRegistryRecord
+from changes import record_changes, reset_changes
+from search import search_key
+
+BATCH_SIZE = 10_000
+
+FIRST_NAMES = ["Sarah", "Samuel", "Musa", "Faith", "David", "Mercy", "Kevin", "Beatrice", "Isaac", "Lydia"]
+LAST_NAMES = ["Ochieng", "Muchiri", "Hassan", "Wanjiku", "Njoroge", "Chelagat", "Otieno", "Mutua", "Kiprono", "Achieng"]
+COUNTIES = ["Nairobi", "Kisumu", "Mombasa", "Kiambu", "Nakuru", "Machakos", "Kericho", "Siaya"]
+
+
+def patient_id(i):
+    return f"PAT-{i:09d}"
+
+
+def national_id(i):
+    return str(10_000_000 + i)
+
+
+def _synthetic(task):
+    start, stop, seed = task
+    rng = random.Random(f"registry-{seed}-{start}")
+    rows = []
+    for i in range(start, stop):
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        rows.append({
+            "patient_id": patient_id(i),
+            "national_id": national_id(i),
+            "first_name": first_name,
+            "last_name": last_name,
+            "date_of_birth": date(1940, 1, 1) + timedelta(days=rng.randrange(365 * 65)),
+            "gender": rng.choice(["MALE", "FEMALE"]),
+            "phone": f"+2547{i % 100_000_000:08d}",
+            "email": f"{first_name}.{last_name}{i}@example.com".lower(),
+            "address": json.dumps({"county": rng.choice(COUNTIES)}),
+            "emergency_contact": f"+2547{(i * 7) % 100_000_000:08d}",
+            "search_name": search_key(first_name, last_name),
+        })
+    return rows
+
+
+def _from_file(path):
+    # Reads one record per line so the file is never held in memory at once
+    with open(path) as f:
+        for line in f:
+            line = line.strip().rstrip(",")
+            if not line or line in ("[", "]"):
+                continue
+            p = json.loads(line)
+            yield {
+                "patient_id": p["patient_id"],
+                "national_id": p["national_id"],
+                "first_name": p["first_name"],
+                "last_name": p["last_name"],
+                "date_of_birth": datetime.strptime(p["date_of_birth"], "%Y-%m-%d").date(),
+                "gender": p["gender"].upper(),
+                "phone": p.get("phone"),
+                "email": p.get("email"),
+                "address": json.dumps(p["address"]) if p.get("address") else None,
+                "emergency_contact": json.dumps(p["emergency_contact"]) if p.get("emergency_contact") else None,
+                # Core inserts skip the ORM hook that sets this
+                "search_name": search_key(p["first_name"], p["last_name"]),
+            }
+
+
+def _batched(rows, batch_size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_insert(engine, batches):
+    table = PatientRegistryRecord.__table__
+    count = 0
+    for batch in batches:
+        with engine.begin() as conn:
+            conn.execute(insert(table), batch)
+            # Core inserts skip the ORM hooks, so the change log is written here
+            record_changes(conn, (row["patient_id"] for row in batch))
+        count += len(batch)
+    return count
+
+
+def seed_registry(patients=0, path=None, processes=None, seed=0, reset=True):
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == "sqlite":
+            @event.listens_for(engine, "connect")
+            def _fast_sqlite(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA synchronous=OFF")
+                cursor.close()
+            engine.dispose()
+
+        if reset:
+            with engine.begin() as conn:
+                reset_changes(conn)
+                conn.execute(PatientRegistryRecord.__table__.delete())
+
+        started = time.perf_counter()
+        if path:
+            count = bulk_insert(engine, _batched(_from_file(path)))
+        else:
+            tasks = ((start, min(start + BATCH_SIZE, patients), seed) for start in range(0, patients, BATCH_SIZE))
+            with Pool(processes or cpu_count()) as pool:
+                count = bulk_insert(engine, pool.imap(_synthetic, tasks))
+        elapsed = time.perf_counter() - started
+        print(f"registry_records: {count} rows in {elapsed:.1f}s ({count / elapsed if elapsed else 0:,.0f} rows/s)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-load registry records.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--patients", type=int, help="number of synthetic patients to generate")
+    source.add_argument("--file", help="JSON file with one record per line (e.g. seed_data.json)")
+    parser.add_argument("--processes", type=int, help="pool size (default: number of CPUs)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--append", action="store_true", help="keep existing records")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    seed_registry(patients=args.patients or 0, path=args.file, processes=args.processes,
+                  seed=args.seed, reset=not args.append)
@@ -0,0 +1,71 @@
+"""The registry change log behind GET /api/registry/changes.
+
+Every insert, update and delete of a PatientRegistryRecord through the ORM
+appends a row to registry_changes in the same transaction. Bulk loaders that
+write with Core call record_changes / reset_changes themselves.
+"""
+from datetime import datetime
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from data import PatientRegistryRecord, RegistryChange, RegistryFeedHead
+
+HEAD_ID = 1
+
+
+def _reserve_seqs(connection, count):
+    # Returns the first of `count` consecutive seqs. The UPDATE holds the head
+    # row lock until commit, so a later seq can't commit first.
+    bumped = connection.execute(
+        update(RegistryFeedHead).where(RegistryFeedHead.id == HEAD_ID).values(seq=RegistryFeedHead.seq + count)
+    ).rowcount
+    if not bumped:
+        connection.execute(insert(RegistryFeedHead).values(id=HEAD_ID, seq=count, epoch=1))
+        return 1
+    head = connection.execute(select(RegistryFeedHead.seq).where(RegistryFeedHead.id == HEAD_ID)).scalar_one()
+    return head - count + 1
+
+
+def record_changes(connection, patient_ids, op="upsert"):
+    """Append one change per patient id, in the caller's transaction."""
+    patient_ids = list(patient_ids)
+    if not patient_ids:
+        return
+    first = _reserve_seqs(connection, len(patient_ids))
+    now = datetime.now()
+    connection.execute(insert(RegistryChange), [
+        {"seq": seq, "patient_id": patient_id, "op": op, "changed_at": now}
+        for seq, patient_id in enumerate(patient_ids, start=first)
+    ])
+
+
+def reset_changes(connection):
+    """Empty the log and start a new epoch, for loaders that wipe registry_records."""
+    connection.execute(RegistryChange.__table__.delete())
+    bumped = connection.execute(
+        update(RegistryFeedHead).where(RegistryFeedHead.id == HEAD_ID).values(seq=0, epoch=RegistryFeedHead.epoch + 1)
+    ).rowcount
+    if not bumped:
+        connection.execute(insert(RegistryFeedHead).values(id=HEAD_ID, seq=0, epoch=1))
+
+
+def feed_head(connection):
+    """(seq, epoch) of the log; (0, 1) before anything has been written."""
+    row = connection.execute(
+        select(RegistryFeedHead.seq, RegistryFeedHead.epoch).where(RegistryFeedHead.id == HEAD_ID)
+    ).first()
+    return tuple(row) if row else (0, 1)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_registry_changes(session, flush_context):
+    upserts = [obj.patient_id for obj in session.new if isinstance(obj, PatientRegistryRecord)]
+    upserts += [obj.patient_id for obj in session.dirty
+                if isinstance(obj, PatientRegistryRecord) and session.is_modified(obj)]
+    deletes = [obj.patient_id for obj in session.deleted if isinstance(obj, PatientRegistryRecord)]
+    if not upserts and not deletes:
+        return
+    connection = session.connection()
+    record_changes(connection, upserts, "upsert")
+    record_changes(connection, deletes, "delete")
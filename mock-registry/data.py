@@ -15,4 +15,36 @@ class PatientRegistryRecord(db.Model, SerializerMixin):
     phone = db.Column(db.String(12))
     email = db.Column(db.Text)
     address = db.Column(db.Text)
-    emergency_contact = db.Column(db.String(20))
\ No newline at end of file
+    emergency_contact = db.Column(db.String(20))
+    # normalized "first last" for name search (see search.py); set on every write
+    search_name = db.Column(db.String(40))
+
+    serialize_rules = ("-search_name",)
+
+    __table_args__ = (
+        # FULLTEXT on MariaDB; SQLite searches through the registry_search FTS5 table instead
+        db.Index("ix_registry_records_search_name", "search_name", mysql_prefix="FULLTEXT", mariadb_prefix="FULLTEXT"),
+        db.Index("ix_registry_records_date_of_birth", "date_of_birth", "search_name"),
+    )
+
+
+class RegistryChange(db.Model):
+    __tablename__ = "registry_changes"
+
+    # One row per write to a registry record, numbered in commit order;
+    # consumers resume the feed from the last seq they applied
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    patient_id = db.Column(db.String(20), nullable=False)
+    op = db.Column(db.Enum("upsert", "delete"), nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False)
+
+
+class RegistryFeedHead(db.Model):
+    __tablename__ = "registry_feed_head"
+
+    # A single row: the last seq handed out. Bumping it row-locks the feed until
+    # commit, so seqs become visible in order and without gaps. `epoch` goes up
+    # whenever the log is wiped, telling consumers their cursor no longer applies.
+    id = db.Column(db.Integer, primary_key=True)
+    seq = db.Column(db.Integer, nullable=False, default=0)
+    epoch = db.Column(db.Integer, nullable=False, default=1)
@@ -0,0 +1,158 @@
+"""Injected latency and failures, for testing clients against a degraded registry.
+
+A profile says how one endpoint misbehaves:
+
+    {
+        "latency": {"dist": "fixed", "ms": 50}
+                 | {"dist": "normal", "mean_ms": 80, "stddev_ms": 20}
+                 | {"dist": "longtail", "median_ms": 40, "p99_ms": 2000},
+        "error_rate": 0.02,     # answer with error_status (default 503) after the delay
+        "error_status": 503,
+        "timeout_rate": 0.01,   # hold the request for timeout_ms (default 30000), then 504
+        "timeout_ms": 30000,
+        "reset_rate": 0.005,    # drop the connection without a response
+    }
+
+Profiles are keyed by endpoint (the view function's name: patient_data,
+search_registry, registry_changes) or "*" for every endpoint without its
+own. They are read from the REGISTRY_FAULTS environment variable as JSON at
+startup and can be replaced at runtime through /api/registry/admin/faults;
+REGISTRY_FAULTS_SEED makes the draws repeatable. Each process keeps its own
+profiles, so with several workers set them through the environment.
+"""
+import json
+import math
+import os
+import random
+import socket
+import struct
+import threading
+import time
+
+from flask import request, make_response
+
+DISTRIBUTIONS = {
+    "fixed": ("ms",),
+    "normal": ("mean_ms", "stddev_ms"),
+    "longtail": ("median_ms", "p99_ms"),
+}
+RATES = ("error_rate", "timeout_rate", "reset_rate")
+DEFAULT_ERROR_STATUS = 503
+DEFAULT_TIMEOUT_MS = 30_000
+# z-score of the 99th percentile of a normal distribution
+_Z99 = 2.3263
+# endpoints that never misbehave, so faults can always be switched off again
+EXEMPT_ENDPOINTS = {"registry_faults"}
+
+
+def _number(profile, key, default=None):
+    value = profile.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError(f"{key} must be a non-negative number")
+    return value
+
+
+def parse_profile(profile):
+    """A validated copy of one profile; raises ValueError naming the bad field."""
+    if not isinstance(profile, dict):
+        raise ValueError("a profile must be an object")
+    unknown = set(profile) - {"latency", "error_status", "timeout_ms", *RATES}
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+
+    parsed = {rate: _number(profile, rate, 0) for rate in RATES}
+    if sum(parsed.values()) > 1:
+        raise ValueError("error_rate, timeout_rate and reset_rate add up to more than 1")
+    parsed["error_status"] = int(_number(profile, "error_status", DEFAULT_ERROR_STATUS))
+    if not 400 <= parsed["error_status"] <= 599:
+        raise ValueError("error_status must be a 4xx or 5xx status")
+    parsed["timeout_ms"] = _number(profile, "timeout_ms", DEFAULT_TIMEOUT_MS)
+
+    latency = profile.get("latency")
+    if latency is not None:
+        if not isinstance(latency, dict) or latency.get("dist") not in DISTRIBUTIONS:
+            raise ValueError(f"latency.dist must be one of {', '.join(DISTRIBUTIONS)}")
+        dist = latency["dist"]
+        parsed["latency"] = {"dist": dist, **{key: _number(latency, key) for key in DISTRIBUTIONS[dist]}}
+        if dist == "longtail" and not 0 < parsed["latency"]["median_ms"] <= parsed["latency"]["p99_ms"]:
+            raise ValueError("longtail needs 0 < median_ms <= p99_ms")
+    return parsed
+
+
+def parse_profiles(profiles):
+    if not isinstance(profiles, dict):
+        raise ValueError("profiles must be an object keyed by endpoint")
+    return {endpoint: parse_profile(profile) for endpoint, profile in profiles.items()}
+
+
+class FaultInjector:
+    """Applies the profile for each request's endpoint before the view runs."""
+
+    def __init__(self, profiles=None, seed=None):
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.profiles = parse_profiles(profiles or {})
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+
+    def replace(self, profiles):
+        parsed = parse_profiles(profiles)
+        with self._lock:
+            self.profiles = parsed
+
+    def _profile(self, endpoint):
+        profiles = self.profiles
+        return profiles.get(endpoint) or profiles.get("*")
+
+    def _draw(self):
+        with self._lock:
+            return self._random.random()
+
+    def _delay_ms(self, latency):
+        if latency is None:
+            return 0
+        with self._lock:
+            if latency["dist"] == "fixed":
+                return latency["ms"]
+            if latency["dist"] == "normal":
+                return max(0.0, self._random.gauss(latency["mean_ms"], latency["stddev_ms"]))
+            # lognormal through the median and the 99th percentile
+            sigma = math.log(latency["p99_ms"] / latency["median_ms"]) / _Z99
+            return self._random.lognormvariate(math.log(latency["median_ms"]), sigma)
+
+    def _reset(self):
+        # a zero linger makes the socket reset instead of closing cleanly; the
+        # client sees the connection drop with no response
+        sock = request.environ.get("werkzeug.socket") or request.environ.get("gunicorn.socket")
+        if sock is None:
+            return make_response({"message": "injected connection reset"}, 502)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+        sock.shutdown(socket.SHUT_RDWR)
+        return make_response("", 502)
+
+    def _before_request(self):
+        if request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+        profile = self._profile(request.endpoint)
+        if profile is None:
+            return None
+
+        draw = self._draw()
+        if draw < profile["reset_rate"]:
+            return self._reset()
+        draw -= profile["reset_rate"]
+        if draw < profile["timeout_rate"]:
+            time.sleep(profile["timeout_ms"] / 1000)
+            return make_response({"message": "injected timeout"}, 504)
+        draw -= profile["timeout_rate"]
+
+        time.sleep(self._delay_ms(profile.get("latency")) / 1000)
+        if draw < profile["error_rate"]:
+            return make_response({"message": "injected error"}, profile["error_status"])
+        return None
+
+
+def injector_from_env():
+    seed = os.getenv("REGISTRY_FAULTS_SEED")
+    return FaultInjector(json.loads(os.getenv("REGISTRY_FAULTS") or "{}"), seed=int(seed) if seed else None)
@@ -6,18 +6,40 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
+from datetime import date
 from functools import wraps
 
-from data import db, PatientRegistryRecord
+from data import db, PatientRegistryRecord, RegistryChange
+from changes import feed_head
+from faults import injector_from_env
+from search import query_words, search_patients
+from utils import FastJSONProvider
+
+# Default and largest page of the change feed
+CHANGE_FEED_LIMIT = 1000
+MAX_CHANGE_FEED_LIMIT = 10_000
+# Default and largest page of search results, and the deepest a search can be paged
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_SEARCH_OFFSET = 1000
+FEED_FIELDS = (
+    "patient_id", "national_id", "first_name", "last_name", "date_of_birth",
+    "gender", "phone", "email", "address", "emergency_contact",
+)
 
 app = Flask(__name__)
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///database.db"
+app.json = FastJSONProvider(app)
+app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("REGISTRY_DATABASE_URI", "sqlite:///database.db")
 db.init_app(app)
 
 CORS(app)
 
 Migrate(app, db)
 
+# latency and failures from REGISTRY_FAULTS, for testing clients (see faults.py)
+faults = injector_from_env()
+faults.init_app(app)
+
 # custom decorator for API Key auth
 def api_key_required(f):
     @wraps(f)
@@ -33,6 +55,7 @@ def api_key_required(f):
         
         # allow user to access the resource
         return f(*args, **kwargs)
+    return decorator
 
 @api_key_required
 @app.route("/api/registry/patients")
@@ -70,6 +93,83 @@ def get_patient_id():
     response.headers["Content-Type"] = "json"
 
 
+@app.route("/api/registry/admin/faults", methods=["GET", "PUT", "DELETE"])
+@api_key_required
+def registry_faults():
+    if request.method == "PUT":
+        try:
+            faults.replace(request.get_json(silent=True))
+        except ValueError as e:
+            return make_response({"message": str(e)}, 400)
+    elif request.method == "DELETE":
+        faults.replace({})
+    return make_response({"profiles": faults.profiles})
+
+@app.route("/api/registry/patients/search")
+@api_key_required
+def search_registry():
+    try:
+        limit = int(request.args.get("limit", SEARCH_LIMIT))
+        offset = int(request.args.get("offset", 0))
+        dob = request.args.get("dob")
+        date_of_birth = date.fromisoformat(dob) if dob else None
+    except ValueError:
+        return make_response({"message": "limit and offset must be integers and dob a YYYY-MM-DD date"}, 400)
+    if not 0 < limit <= MAX_SEARCH_LIMIT or not 0 <= offset <= MAX_SEARCH_OFFSET:
+        return make_response({"message": "limit or offset out of range"}, 400)
+
+    words = query_words(request.args.get("name", ""))
+    if not words and date_of_birth is None:
+        return make_response({"message": "give a name (words of two letters or more) or a dob"}, 400)
+
+    results, has_more = search_patients(words, date_of_birth, limit, offset)
+    # pages stop at MAX_SEARCH_OFFSET; narrow the search to see past it
+    has_more = has_more and offset + len(results) <= MAX_SEARCH_OFFSET
+    return make_response({
+        "results": results,
+        "next_offset": offset + len(results) if has_more else None,
+        "has_more": has_more,
+    })
+
+@app.route("/api/registry/changes")
+@api_key_required
+def registry_changes():
+    try:
+        after = int(request.args.get("after", 0))
+        limit = int(request.args.get("limit", CHANGE_FEED_LIMIT))
+    except ValueError:
+        return make_response({"message": "after and limit must be integers"}, 400)
+    if after < 0 or not 0 < limit <= MAX_CHANGE_FEED_LIMIT:
+        return make_response({"message": "after or limit out of range"}, 400)
+
+    head, epoch = feed_head(db.session.connection())
+    columns = [getattr(PatientRegistryRecord, name) for name in FEED_FIELDS]
+    rows = db.session.execute(
+        db.select(RegistryChange.seq, RegistryChange.patient_id, PatientRegistryRecord.patient_id.label("found"), *columns)
+        .outerjoin(PatientRegistryRecord, PatientRegistryRecord.patient_id == RegistryChange.patient_id)
+        .where(RegistryChange.seq > after)
+        .order_by(RegistryChange.seq)
+        .limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # each change carries the record as it is now, so a patient changed several
+    # times since `after` reads the same every time and a deleted one as a delete
+    changes = [{
+        "seq": row.seq,
+        "patient_id": row[1],
+        "op": "upsert" if row.found else "delete",
+        "record": dict(zip(FEED_FIELDS, row[3:])) if row.found else None,
+    } for row in rows]
+    return make_response({
+        "changes": changes,
+        "cursor": rows[-1].seq if rows else after,
+        "head": head,
+        "epoch": epoch,
+        "has_more": has_more,
+    })
+
 @app.errorhandler(404)
 def not_found_handler(error):
     response = make_response({"data": "not found"}, 404)
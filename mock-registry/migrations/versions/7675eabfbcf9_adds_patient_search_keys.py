@@ -0,0 +1,103 @@
+"""adds patient search keys
+
+Revision ID: 7675eabfbcf9
+Revises: ebedfe314fc0
+Create Date: 2026-10-19 13:26:35.404386
+
+"""
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7675eabfbcf9'
+down_revision = 'ebedfe314fc0'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL_BATCH_SIZE = 10_000
+
+# A copy of search.search_key as of this revision
+def _search_key(*parts):
+    value = unicodedata.normalize("NFKD", " ".join(p for p in parts if p))
+    value = "".join(c for c in value if not unicodedata.combining(c)).casefold()
+    return " ".join(re.findall(r"[^\W_]+", value))
+
+
+def _backfill_search_names():
+    connection = op.get_bind()
+    records = sa.table('registry_records', sa.column('patient_id'), sa.column('first_name'),
+                       sa.column('last_name'), sa.column('search_name'))
+    after = ''
+    while True:
+        rows = connection.execute(
+            sa.select(records.c.patient_id, records.c.first_name, records.c.last_name)
+            .where(records.c.patient_id > after).order_by(records.c.patient_id).limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        connection.execute(
+            records.update().where(records.c.patient_id == sa.bindparam('pid')).values(search_name=sa.bindparam('key')),
+            [{'pid': row.patient_id, 'key': _search_key(row.first_name, row.last_name)} for row in rows],
+        )
+        after = rows[-1].patient_id
+
+
+def _create_fts_index():
+    # SQLite has no FULLTEXT index; an external-content FTS5 table over
+    # search_name stands in for it, kept current by triggers. prefix='2 3'
+    # keeps the short prefixes searched most often precomputed.
+    op.execute(
+        "CREATE VIRTUAL TABLE registry_search USING fts5("
+        "search_name, content='registry_records', content_rowid='rowid', "
+        "prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+    )
+    op.execute(
+        "CREATE TRIGGER registry_search_insert AFTER INSERT ON registry_records BEGIN "
+        "INSERT INTO registry_search(rowid, search_name) VALUES (new.rowid, new.search_name); END"
+    )
+    op.execute(
+        "CREATE TRIGGER registry_search_delete AFTER DELETE ON registry_records BEGIN "
+        "INSERT INTO registry_search(registry_search, rowid, search_name) VALUES ('delete', old.rowid, old.search_name); END"
+    )
+    op.execute(
+        "CREATE TRIGGER registry_search_update AFTER UPDATE OF search_name ON registry_records BEGIN "
+        "INSERT INTO registry_search(registry_search, rowid, search_name) VALUES ('delete', old.rowid, old.search_name); "
+        "INSERT INTO registry_search(rowid, search_name) VALUES (new.rowid, new.search_name); END"
+    )
+    op.execute("INSERT INTO registry_search(registry_search) VALUES ('rebuild')")
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('registry_records', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('search_name', sa.String(length=40), nullable=True))
+
+    _backfill_search_names()
+
+    with op.batch_alter_table('registry_records', schema=None) as batch_op:
+        batch_op.create_index('ix_registry_records_date_of_birth', ['date_of_birth', 'search_name'], unique=False)
+        batch_op.create_index('ix_registry_records_search_name', ['search_name'], unique=False, mysql_prefix='FULLTEXT', mariadb_prefix='FULLTEXT')
+
+    # ### end Alembic commands ###
+    if op.get_bind().dialect.name == 'sqlite':
+        _create_fts_index()
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('registry_search_insert', 'registry_search_delete', 'registry_search_update'):
+            op.execute(f"DROP TRIGGER {trigger}")
+        op.execute("DROP TABLE registry_search")
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('registry_records', schema=None) as batch_op:
+        batch_op.drop_index('ix_registry_records_search_name', mysql_prefix='FULLTEXT', mariadb_prefix='FULLTEXT')
+        batch_op.drop_index('ix_registry_records_date_of_birth')
+        batch_op.drop_column('search_name')
+
+    # ### end Alembic commands ###
@@ -0,0 +1,96 @@
+"""Name and date-of-birth search over registry_records.
+
+Names are searched through a normalized `search_name` key ("first last",
+lower case, accents and punctuation dropped) kept on every record. Each word
+of the query matches the start of a word in the name, in any order, so
+"mu sam" finds Samuel Muchiri. The key is indexed with FULLTEXT on MariaDB
+and with the registry_search FTS5 table on SQLite; both rank the matches.
+With a date of birth the search goes through ix_registry_records_date_of_birth
+instead.
+
+On SQLite the index's triggers are dropped along with registry_records, so a
+migration that makes SQLite rebuild that table must create them again and
+rebuild the index.
+
+MariaDB needs innodb_ft_min_token_size=2 and innodb_ft_enable_stopword=OFF,
+or short names and names such as "Will" can't be found.
+"""
+import re
+import unicodedata
+
+from sqlalchemy import column, event, literal, literal_column, select, table, text
+from sqlalchemy.dialects.mysql import match
+
+from data import PatientRegistryRecord, db
+
+# Words shorter than this are left out of a name query
+MIN_PREFIX = 2
+# At most this many words of a query are used
+MAX_WORDS = 4
+# Name matches ranked per search; more than the deepest page main.py serves
+RANK_WINDOW = 2000
+
+SEARCH_FIELDS = ("patient_id", "first_name", "last_name", "date_of_birth", "gender")
+
+# SQLite only: external-content FTS5 index over registry_records.search_name,
+# kept current by the triggers created in the migration
+_fts = table("registry_search", column("rowid"), column("rank"))
+
+
+def search_key(*parts):
+    """Lower-case words of `parts` without accents or punctuation, space separated."""
+    value = unicodedata.normalize("NFKD", " ".join(p for p in parts if p))
+    value = "".join(c for c in value if not unicodedata.combining(c)).casefold()
+    return " ".join(re.findall(r"[^\W_]+", value))
+
+
+def query_words(name):
+    return [word for word in search_key(name).split() if len(word) >= MIN_PREFIX][:MAX_WORDS]
+
+
+@event.listens_for(PatientRegistryRecord, "before_insert")
+@event.listens_for(PatientRegistryRecord, "before_update")
+def _set_search_name(mapper, connection, record):
+    record.search_name = search_key(record.first_name, record.last_name)
+
+
+def _ranked_matches(dialect, words):
+    # (subquery of the first RANK_WINDOW matches with a `score`, join condition, ascending)
+    if dialect == "sqlite":
+        # "sam"* "mu"*: every word as a prefix; FTS5's rank is bm25, lower is better
+        query = " ".join(f'"{word}"*' for word in words)
+        matches = select(_fts.c.rowid, _fts.c.rank.label("score")).select_from(_fts) \
+            .where(text("registry_search MATCH :query").bindparams(query=query)).limit(RANK_WINDOW).subquery()
+        return matches, matches.c.rowid == literal_column("registry_records.rowid"), True
+    # +sam* +mu*: every word required, as a prefix; higher relevance is better
+    query = " ".join(f"+{word}*" for word in words)
+    score = match(PatientRegistryRecord.search_name, against=query).in_boolean_mode()
+    matches = select(PatientRegistryRecord.patient_id, score.label("score")).where(score).limit(RANK_WINDOW).subquery()
+    return matches, matches.c.patient_id == PatientRegistryRecord.patient_id, False
+
+
+def search_patients(words=(), date_of_birth=None, limit=20, offset=0):
+    """Matching records, best first, as (rows, has_more); rows are dicts of SEARCH_FIELDS.
+
+    With a date of birth the index on it narrows the search to a few dozen
+    records, which are then checked word by word and listed by name. A name
+    alone goes through the full-text index, and only the first RANK_WINDOW
+    matches are ranked: scoring every record that starts with "sa" costs far
+    more than the page is worth, and no page reaches past the window anyway.
+    """
+    columns = [getattr(PatientRegistryRecord, name) for name in SEARCH_FIELDS]
+    stmt = select(*columns)
+    order = []
+    if date_of_birth is not None:
+        stmt = stmt.where(PatientRegistryRecord.date_of_birth == date_of_birth)
+        # each word starts a word of the name
+        padded = literal(" ") + PatientRegistryRecord.search_name
+        stmt = stmt.where(*(padded.like(f"% {word}%") for word in words))
+    elif words:
+        matches, on, ascending = _ranked_matches(db.engine.dialect.name, words)
+        stmt = stmt.join(matches, on)
+        order.append(matches.c.score if ascending else matches.c.score.desc())
+    order += [PatientRegistryRecord.search_name, PatientRegistryRecord.patient_id]
+
+    rows = db.session.execute(stmt.order_by(*order).limit(limit + 1).offset(offset)).all()
+    return [dict(zip(SEARCH_FIELDS, row)) for row in rows[:limit]], len(rows) > limit
@@ -2,6 +2,7 @@ import json
 from datetime import datetime
 from main import db, app
 from data import PatientRegistryRecord
+from changes import reset_changes
 
 # COMPLETE 20-PATIENT DATA
 patients_data = [
@@ -30,6 +31,8 @@ patients_data = [
 def seed_registry():
     with app.app_context():
         print("Starting seeding process...")
+        # a bulk delete skips the change hooks, so the log starts a new epoch instead
+        reset_changes(db.session.connection())
         db.session.query(PatientRegistryRecord).delete()
 
         for p in patients_data:
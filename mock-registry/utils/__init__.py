@@ -1 +1,2 @@
-from .security_utils import encrypt_id, decrypt_id
\ No newline at end of file
+from .security_utils import encrypt_id, decrypt_id
+from .json_provider import FastJSONProvider